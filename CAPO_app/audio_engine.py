@@ -1,100 +1,762 @@
 # kelvi_app/audio_engine.py
 
 import os
+import time
+import atexit
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 import librosa
 import soundfile as sf
 
+from .pipeline import AnalysisPipeline
+from . import cqt
+from .shift_renderer import ChunkedShiftRenderer
+
+
+HOP_LENGTH = 512
+
+# Coarse first pass: quarter-rate audio and STFT chroma (see get_coarse_analysis)
+COARSE_SR = 11025
+COARSE_HOP = 512
+
+# Key changes render the playhead chunk plus this many after it before playing;
+# the rest is filled in behind (in front of) the playhead
+SHIFT_LOOKAHEAD_CHUNKS = 1
+
+PITCHES = ['C', 'C#', 'D', 'D#', 'E', 'F',
+           'F#', 'G', 'G#', 'A', 'A#', 'B']
+
+# Chord qualities: name suffix -> intervals above the root (semitones)
+CHORD_QUALITIES = {
+    "":     (0, 4, 7),
+    "m":    (0, 3, 7),
+    "7":    (0, 4, 7, 10),
+    "maj7": (0, 4, 7, 11),
+    "m7":   (0, 3, 7, 10),
+}
+
+# Beginner = triads only; Advanced adds 7ths
+VOCABULARIES = {
+    "beginner": ("", "m"),
+    "advanced": ("", "m", "7", "maj7", "m7"),
+}
+
+DEFAULT_ANALYSIS_PARAMS = {
+    "hop_length": HOP_LENGTH,
+    "per_bar": False,
+    "beats_per_bar": 4,
+    "vocabulary": "beginner",
+    "smoothing": 0.5,  # self-transition probability for chord decoding
+    "key_window": 16,  # beat columns per local key estimate (modulations)
+    "hpss": False,     # harmonic part -> chroma, percussive part -> onsets
+    "recognizer": "templates",  # chord classifier, a key of RECOGNIZERS
+}
+
+# Krumhansl-Kessler key profiles, tonic first
+MAJOR_PROFILE = (6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88)
+MINOR_PROFILE = (6.33, 2.68, 3.52, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17)
+
+
+def split_chord_name(name: str):
+    """
+    "C#m7" -> ("C#", "m7"); names without a known root -> (name, "").
+    """
+    root = name[:2] if name[1:2] == "#" else name[:1]
+    if root in PITCHES:
+        return root, name[len(root):]
+    return name, ""
+
+
+def chord_templates(vocabulary: str):
+    """
+    Unit-norm binary chroma templates (n_chords, 12) and their names.
+    """
+    names, rows = [], []
+    for suffix in VOCABULARIES[vocabulary]:
+        intervals = CHORD_QUALITIES[suffix]
+        for root in range(12):
+            row = np.zeros(12)
+            row[[(root + i) % 12 for i in intervals]] = 1.0
+            rows.append(row / np.linalg.norm(row))
+            names.append(PITCHES[root] + suffix)
+    return np.array(rows), names
+
+
+def key_templates():
+    """
+    Zero-mean, unit-norm key profiles (24, 12): 12 major keys then 12 minor,
+    named like chords ("C" ... "B", "Cm" ... "Bm").
+    """
+    rows, names = [], []
+    for profile, suffix in ((MAJOR_PROFILE, ""), (MINOR_PROFILE, "m")):
+        base = np.array(profile) - np.mean(profile)
+        base /= np.linalg.norm(base)
+        for tonic in range(12):
+            rows.append(np.roll(base, tonic))
+            names.append(PITCHES[tonic] + suffix)
+    return np.array(rows), names
+
+
+def key_correlations(chroma):
+    """
+    Pearson correlation of every chroma column with every key profile (24, n),
+    as a single matrix product.
+    """
+    templates, _ = key_templates()
+    centered = chroma - chroma.mean(axis=0, keepdims=True)
+    norms = np.linalg.norm(centered, axis=0)
+    return templates @ (centered / np.maximum(norms, 1e-9))
+
+
+def viterbi_loop(prob, p_self: float):
+    """
+    Most likely state path under a uniform self-loop transition model.
+    Plain NumPy (no numba JIT warm-up): one vectorized max per step.
+    """
+    n_states, n_steps = prob.shape
+    log_prob = np.log(prob + 1e-12)
+    log_t = np.full((n_states, n_states), np.log((1.0 - p_self) / max(n_states - 1, 1)))
+    np.fill_diagonal(log_t, np.log(p_self))
+
+    backptr = np.zeros((n_steps, n_states), dtype=int)
+    value = log_prob[:, 0] - np.log(n_states)
+    for t in range(1, n_steps):
+        cand = value[:, None] + log_t
+        backptr[t] = np.argmax(cand, axis=0)
+        value = cand[backptr[t], np.arange(n_states)] + log_prob[:, t]
+
+    path = np.zeros(n_steps, dtype=int)
+    path[-1] = int(np.argmax(value))
+    for t in range(n_steps - 1, 0, -1):
+        path[t - 1] = backptr[t, path[t]]
+    return path
+
+
+def hpss_blockwise(y, sr: int, block_sec: float = 30.0, n_fft: int = 1024,
+                   hop_length: int = HOP_LENGTH, kernel_size: int = 17,
+                   max_freq: float = 4200.0, cancel_event=None):
+    """
+    Median-filter harmonic/percussive separation, one block at a time.
+
+    Each block is processed with enough context on both sides for the
+    median filters, then trimmed, so memory stays bounded by the block size
+    and near-silent blocks are skipped outright. Only bins up to `max_freq`
+    (the top of the chroma CQT range) are median-filtered; everything above
+    goes to the percussive part, which only feeds onset detection.
+    Returns (harmonic, percussive).
+    """
+    n = len(y)
+    block = max(hop_length, int(block_sec * sr) // hop_length * hop_length)
+    context = (kernel_size // 2 + n_fft // hop_length) * hop_length
+    n_bins = min(n_fft // 2 + 1, int(max_freq * n_fft / sr) + 1)
+    harmonic = np.zeros_like(y)
+    percussive = np.zeros_like(y)
+
+    for a in range(0, n, block):
+        if cancel_event is not None and cancel_event.is_set():
+            raise AnalysisCancelled()
+        b = min(n, a + block)
+        if np.max(np.abs(y[a:b]), initial=0.0) < 1e-4:
+            continue
+        lo, hi = max(0, a - context), min(n, b + context)
+        D = librosa.stft(y[lo:hi], n_fft=n_fft, hop_length=hop_length)
+        H = np.zeros_like(D)
+        P = D.copy()
+        H[:n_bins], P[:n_bins] = librosa.decompose.hpss(D[:n_bins], kernel_size=kernel_size)
+        harmonic[a:b] = librosa.istft(H, n_fft=n_fft, hop_length=hop_length, length=hi - lo)[a - lo:b - lo]
+        percussive[a:b] = librosa.istft(P, n_fft=n_fft, hop_length=hop_length, length=hi - lo)[a - lo:b - lo]
+    return harmonic, percussive
+
+
+# ----------------- CHUNKED CHROMA -----------------
+
+_chroma_pool = None
+
+
+def chroma_pool(workers: int | None = None):
+    """
+    Shared process pool for chunked chroma, started on first use (spawn:
+    fresh interpreters, never a fork of a process running Qt threads).
+    """
+    global _chroma_pool
+    if _chroma_pool is None:
+        workers = workers or os.cpu_count() or 1
+        _chroma_pool = ProcessPoolExecutor(max_workers=workers,
+                                           mp_context=multiprocessing.get_context("spawn"))
+        atexit.register(_chroma_pool.shutdown, wait=False, cancel_futures=True)
+    return _chroma_pool
+
+
+def _chroma_chunk(y, sr: int, hop_length: int, tuning: float):
+    # Worker processes load the parent's kernels from the disk cache
+    return cqt.chroma_cqt(y, sr, hop_length, tuning=tuning)
+
+
+def chroma_chunked(y, sr: int, hop_length: int = HOP_LENGTH, workers: int | None = None,
+                   min_chunk_sec: float = 15.0, pad_sec: float = 2.0, tuning: float | None = None,
+                   cancel_event=None):
+    """
+    chroma_cqt over overlapping time chunks on the shared process pool.
+
+    Chunk starts sit on the frame grid, and each chunk carries `pad_sec` of
+    real neighbouring audio on both sides (longer than half the lowest CQT
+    filter), which is trimmed after the transform. Since chroma is
+    normalized per frame, the stitched result matches a single-shot
+    chroma_cqt to within resampling noise. Tuning is estimated once for the
+    whole track (unless given), so every chunk uses the same kernels. Tracks
+    too short to split run in-process.
+    """
+    if tuning is None:
+        tuning = cqt.estimate_tuning(y, sr)
+    workers = workers or os.cpu_count() or 1
+    n_frames = 1 + len(y) // hop_length
+    n_chunks = min(workers, int(len(y) / sr // min_chunk_sec))
+    if n_chunks < 2:
+        return _chroma_chunk(y, sr, hop_length, tuning)
+
+    pad = int(pad_sec * sr) // hop_length  # in frames
+    bounds = np.linspace(0, n_frames, n_chunks + 1).astype(int)
+    pool = chroma_pool(workers)
+    futures = []
+    for f0, f1 in zip(bounds[:-1], bounds[1:]):
+        lo = max(0, f0 - pad)
+        hi = min(n_frames, f1 + pad)
+        end = len(y) if hi == n_frames else (hi - 1) * hop_length + 1
+        futures.append((f0 - lo, f1 - f0, pool.submit(
+            _chroma_chunk, y[lo * hop_length:end], sr, hop_length, tuning)))
+
+    parts = []
+    try:
+        for skip, count, future in futures:
+            if cancel_event is not None and cancel_event.is_set():
+                raise AnalysisCancelled()
+            parts.append(future.result()[:, skip:skip + count])
+    finally:
+        for _, _, future in futures:
+            future.cancel()
+    return np.concatenate(parts, axis=1)
+
+
+def merge_segments(times, labels):
+    """
+    Collapse consecutive identical labels into (start, end, name) segments.
+    `times` holds len(labels) + 1 boundaries in seconds.
+    """
+    segments = []
+    for i, name in enumerate(labels):
+        start, end = float(times[i]), float(times[i + 1])
+        if end <= start:
+            continue
+        if segments and segments[-1][2] == name:
+            segments[-1] = (segments[-1][0], end, name)
+        else:
+            segments.append((start, end, name))
+    return segments
+
+
+class AnalysisCancelled(Exception):
+    """Raised at a checkpoint when the owning job has been cancelled."""
+
+
+# ----------------- CHORD RECOGNIZERS -----------------
+
+class TemplateRecognizer:
+    """
+    Cosine similarity of each beat's median chroma with binary chord
+    templates, softened into probabilities.
+    """
+    name = "templates"
+
+    def available(self) -> bool:
+        return True
+
+    def score(self, chroma, beat_chroma, sr: int, hop_length: int, vocabulary: str):
+        """
+        Per-beat chord probabilities (n_chords, n_beats), chord names, and a
+        mask of beats without a chord.
+        """
+        _, synced = beat_chroma
+        templates, names = chord_templates(vocabulary)
+        norms = np.linalg.norm(synced, axis=0)
+        scores = templates @ (synced / np.maximum(norms, 1e-9))
+        prob = np.exp(20.0 * (scores - scores.max(axis=0, keepdims=True)))
+        return prob / prob.sum(axis=0, keepdims=True), names, norms <= 1e-6
+
+
+RECOGNIZERS = {r.name: r for r in (TemplateRecognizer(),)}
+
+
+# ----------------- DECODERS -----------------
+
+class SoundfileDecoder:
+    """
+    Fast path: libsndfile decodes straight into a float32 buffer, with no
+    resampling or format conversion (WAV/FLAC/OGG/AIFF, and MP3 on
+    libsndfile >= 1.1).
+    """
+    name = "soundfile"
+
+    FORMAT_EXTENSIONS = {
+        "WAV": (".wav",), "WAVEX": (".wav",), "RF64": (".wav",), "W64": (".w64",),
+        "FLAC": (".flac",), "OGG": (".ogg", ".oga", ".opus"), "AIFF": (".aif", ".aiff"),
+        "CAF": (".caf",), "AU": (".au", ".snd"), "MP3": (".mp3",),
+    }
+
+    def __init__(self, block_frames: int = 1 << 18):
+        self.block_frames = block_frames
+
+    def extensions(self):
+        formats = sf.available_formats()
+        return {ext for fmt, exts in self.FORMAT_EXTENSIONS.items() if fmt in formats for ext in exts}
+
+    def can_decode(self, path: str) -> bool:
+        return os.path.splitext(path)[1].lower() in self.extensions()
+
+    def decode(self, path: str, out=None, cancel_event=None):
+        """
+        Returns (y, sr) in librosa layout. `out` may be a preallocated float32
+        (channels, frames) buffer; blocks are copied into it channel-major.
+        """
+        with sf.SoundFile(path) as f:
+            sr, channels, frames = f.samplerate, f.channels, f.frames
+            if out is None or out.shape != (channels, frames) or out.dtype != np.float32:
+                out = np.empty((channels, frames), dtype=np.float32)
+            block = np.empty((min(self.block_frames, max(frames, 1)), channels), dtype=np.float32)
+            pos = 0
+            while pos < frames:
+                if cancel_event is not None and cancel_event.is_set():
+                    raise AnalysisCancelled()
+                n = min(len(block), frames - pos)
+                n = len(f.read(frames=n, dtype="float32", out=block[:n]))
+                if n == 0:
+                    break
+                out[:, pos:pos + n] = block[:n].T
+                pos += n
+        y = out[:, :pos]
+        return (y[0] if channels == 1 else y), sr
+
+
+class LibrosaDecoder:
+    """
+    Fallback: librosa.load (audioread / ffmpeg) for everything else (M4A, AAC, WMA, ...).
+    """
+    name = "librosa"
+
+    def extensions(self):
+        return {".mp3", ".m4a", ".aac", ".wma", ".ogg", ".opus", ".flac", ".wav", ".aif", ".aiff"}
+
+    def can_decode(self, path: str) -> bool:
+        return os.path.splitext(path)[1].lower() in self.extensions()
+
+    def decode(self, path: str, out=None, cancel_event=None):
+        y, sr = librosa.load(path, sr=None, mono=False)
+        return y.astype(np.float32, copy=False), sr
+
+
+DECODERS = [SoundfileDecoder(), LibrosaDecoder()]
+
+
+def supported_extensions():
+    """Every file extension some decoder backend can open."""
+    exts = set()
+    for decoder in DECODERS:
+        exts |= decoder.extensions()
+    return sorted(exts)
+
+
+def decode_audio(path: str, decoders=None, out=None, cancel_event=None):
+    """
+    Try each capable backend in order; returns (y, sr, backend name).
+    """
+    errors = []
+    for decoder in decoders or DECODERS:
+        if not decoder.can_decode(path):
+            continue
+        try:
+            y, sr = decoder.decode(path, out=out, cancel_event=cancel_event)
+            return y, sr, decoder.name
+        except AnalysisCancelled:
+            raise
+        except Exception as e:
+            print(f"Decoder {decoder.name} failed on {os.path.basename(path)}: {e}")
+            errors.append(f"{decoder.name}: {e}")
+    raise RuntimeError(f"No decoder could open {path} ({'; '.join(errors) or 'unsupported format'})")
+
 
 class AudioEngine:
-    def __init__(self):
+    def __init__(self, pcm_cache=None, cancel_event=None, workspace=None, chroma_workers=None):
         # Always keep the ORIGINAL audio here (stereo if available)
         self.y_stereo = None
         self.sr = None
         self.duration = 0.0
 
         self.original_path = None
-        self.temp_path = None  # path to temp_shifted.wav
+        self.temp_path = None  # current pitch-shifted temp WAV
+        self.temp_paths = []   # every temp WAV not yet removed
+        self.workspace = workspace  # per-session scratch folder (Workspace)
+        self.shift_renderer = None  # ChunkedShiftRenderer, per loaded track
+        self.shift_files = {}  # semitones -> complete pre-rendered file, kept across key switches
+
+        # Optional PCMCache: decoded copies of compressed files
+        self.pcm_cache = pcm_cache
+        self.playback_path = None  # what QMediaPlayer should open (PCM copy or original)
+
+        # threading.Event set by the owning job; checked between stages
+        self.cancel_event = cancel_event
+
+        # Processes for chunked chroma (None: all cores; 1: single-shot in-process)
+        self.chroma_workers = chroma_workers
+
+        # Pre-rendered A/B loop buffers: (start, end, semitones, rate) -> samples
+        self.region_cache = {}
+
+        # Beat grid from get_tempo (frames at hop_length, and seconds)
+        self.beat_frames = None
+        self.beat_times = None
+        self.key_segments = []
+
+        # decode -> mono -> hpss -> chroma / onset -> beats -> beat_chroma
+        #   -> chord_scores (recognizer; the model also reads frame chroma) -> chord_path -> segments
+        #   -> key (local keys share the beat-synced chroma)
+        self.pipeline = AnalysisPipeline(before_stage=self.check_cancelled)
+        self.pipeline.set_params(path=None, **DEFAULT_ANALYSIS_PARAMS)
+        self._build_pipeline()
+
+    def check_cancelled(self):
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise AnalysisCancelled()
+
+    def set_analysis_params(self, **params):
+        """
+        Update analysis parameters; only downstream stages recompute on next use.
+        """
+        unknown = set(params) - set(DEFAULT_ANALYSIS_PARAMS)
+        if unknown:
+            raise ValueError(f"Unknown analysis parameters: {sorted(unknown)}")
+        self.pipeline.set_params(**params)
+
+    # ----------------- PIPELINE STAGES -----------------
+
+    def _build_pipeline(self):
+        p = self.pipeline
+        p.add_stage("decode", self._stage_decode, params=("path",), keep=1)
+        p.add_stage("mono", self._stage_mono, inputs=("decode",), keep=1)
+        p.add_stage("hpss", self._stage_hpss, inputs=("mono",), params=("hpss",), keep=1)
+        p.add_stage("chroma", self._stage_chroma, inputs=("hpss",), params=("hop_length",), keep=2)
+        p.add_stage("onset", self._stage_onset, inputs=("hpss",), params=("hop_length",), keep=2)
+        p.add_stage("beats", self._stage_beats, inputs=("onset",), params=("hop_length",))
+        p.add_stage("beat_chroma", self._stage_beat_chroma, inputs=("mono", "chroma", "beats"),
+                    params=("hop_length", "per_bar", "beats_per_bar"))
+        p.add_stage("chord_scores", self._stage_chord_scores, inputs=("chroma", "beat_chroma"),
+                    params=("vocabulary", "recognizer", "hop_length"))
+        p.add_stage("chord_path", self._stage_chord_path, inputs=("chord_scores",),
+                    params=("smoothing",))
+        p.add_stage("segments", self._stage_segments, inputs=("beat_chroma", "chord_scores", "chord_path"))
+        p.add_stage("key", self._stage_key, inputs=("beat_chroma",), params=("key_window",))
+        # Provisional results from the same scoring stages, on a cheap front end
+        p.add_stage("coarse", self._stage_coarse, inputs=("mono",),
+                    params=("per_bar", "beats_per_bar", "vocabulary", "smoothing", "key_window"), keep=1)
+
+    def _stage_decode(self, path):
+        cached = self.pcm_cache.load(path) if self.pcm_cache else None
+        if cached is not None:
+            return cached
+        y, sr, backend = decode_audio(path, cancel_event=self.cancel_event)
+        print(f"Decoded with {backend}")
+        self.check_cancelled()
+        playback_path = None
+        if self.pcm_cache:
+            playback_path = self.pcm_cache.store(path, y, sr)
+        return y, sr, playback_path
+
+    def _stage_mono(self, decoded):
+        y, sr, _ = decoded
+        y_mono = librosa.to_mono(y) if y.ndim > 1 else y
+        return y_mono, sr
+
+    def _stage_hpss(self, mono, hpss):
+        """
+        (harmonic, percussive, sr); both are the plain mix when hpss is off.
+        """
+        y_mono, sr = mono
+        if not hpss:
+            return y_mono, y_mono, sr
+        harmonic, percussive = hpss_blockwise(y_mono, sr, cancel_event=self.cancel_event)
+        return harmonic, percussive, sr
+
+    def _stage_chroma(self, separated, hop_length):
+        harmonic, _, sr = separated
+        # Setup (tuning estimate + CQT kernel lookup) is timed on its own:
+        # kernels are built once per (sr, hop, bins, tuning) and reused
+        t0 = time.perf_counter()
+        tuning = cqt.estimate_tuning(harmonic, sr)
+        kernel_cache = cqt.get_kernel_cache()
+        kernel_cache.get(sr, hop_length, tuning=tuning)
+        setup = time.perf_counter() - t0
+        self.pipeline.timings["chroma_setup"] = setup
+        print(f"Stage chroma setup: {setup * 1000:.1f} ms "
+              f"(tuning {tuning:+.2f} bins, kernels {kernel_cache.last_source})")
+        return chroma_chunked(harmonic, sr, hop_length, workers=self.chroma_workers,
+                              tuning=tuning, cancel_event=self.cancel_event)
+
+    def _stage_onset(self, separated, hop_length):
+        _, percussive, sr = separated
+        return librosa.onset.onset_strength(y=percussive, sr=sr, hop_length=hop_length)
+
+    def _stage_beats(self, onset_env, hop_length):
+        tempo, beats = librosa.beat.beat_track(
+            onset_envelope=onset_env, sr=self.sr, hop_length=hop_length
+        )
+        return float(np.atleast_1d(tempo)[0]), np.asarray(beats, dtype=int)
+
+    def _stage_beat_chroma(self, mono, chroma, beats, hop_length, per_bar, beats_per_bar):
+        """
+        Median chroma per beat (or bar): (boundary times in sec, synced chroma).
+        """
+        y_mono, sr = mono
+        n_frames = chroma.shape[1]
+        _, beat_frames = beats
+        if len(beat_frames) > 1:
+            if per_bar:
+                beat_frames = beat_frames[::beats_per_bar]
+        else:
+            # No beat grid: fall back to one-second windows
+            frames_per_sec = sr / hop_length
+            n_seconds = int(len(y_mono) / sr)
+            beat_frames = (np.arange(1, n_seconds + 1) * frames_per_sec).astype(int)
+
+        bounds = librosa.util.fix_frames(beat_frames, x_min=0, x_max=n_frames)
+        synced = librosa.util.sync(chroma, bounds, aggregate=np.median)
+        times = librosa.frames_to_time(bounds, sr=sr, hop_length=hop_length)
+        times[-1] = len(y_mono) / sr
+        return times, synced
+
+    def _stage_chord_scores(self, chroma, beat_chroma, vocabulary, recognizer, hop_length):
+        """
+        Per-beat chord probabilities from the selected recognizer (templates
+        when it is unknown or can't be used), names, and the no-chord mask.
+        """
+        engine = RECOGNIZERS.get(recognizer)
+        if engine is None or not engine.available():
+            print(f"Recognizer {recognizer!r} unavailable, using templates")
+            engine = RECOGNIZERS["templates"]
+        return engine.score(chroma, beat_chroma, self.sr, hop_length, vocabulary)
+
+    def _stage_chord_path(self, chord_scores, smoothing):
+        """
+        Viterbi decode over beats; `smoothing` is the self-transition probability.
+        """
+        prob, names, _ = chord_scores
+        if prob.shape[1] == 0:
+            return np.zeros(0, dtype=int)
+        if not smoothing:
+            return np.argmax(prob, axis=0)
+        return viterbi_loop(prob, smoothing)
+
+    def _stage_segments(self, beat_chroma, chord_scores, chord_path):
+        times, _ = beat_chroma
+        _, names, silent = chord_scores
+        labels = ["N.C." if silent[i] else names[s] for i, s in enumerate(chord_path)]
+        return merge_segments(times, labels)
+
+    def _stage_key(self, beat_chroma, key_window):
+        """
+        Global key from the duration-weighted chroma sum, plus local keys over
+        a sliding window of `key_window` columns, decoded with a sticky
+        Viterbi so only sustained changes count as modulations.
+        Returns (key name, [(start_sec, end_sec, key name), ...]).
+        """
+        times, synced = beat_chroma
+        if synced.shape[1] == 0:
+            return None, []
+        _, names = key_templates()
+        weighted = synced * np.diff(times)[None, :]
+
+        global_key = names[int(np.argmax(key_correlations(weighted.sum(axis=1, keepdims=True))[:, 0]))]
+
+        # Sliding window sums via a cumulative sum: one pass for all columns
+        n = weighted.shape[1]
+        csum = np.concatenate([np.zeros((12, 1)), np.cumsum(weighted, axis=1)], axis=1)
+        half = max(1, key_window // 2)
+        idx = np.arange(n)
+        local = csum[:, np.minimum(idx + half + 1, n)] - csum[:, np.maximum(idx - half, 0)]
+        scores = key_correlations(local)
+        prob = np.exp(10.0 * (scores - scores.max(axis=0, keepdims=True)))
+        prob /= prob.sum(axis=0, keepdims=True)
+        path = viterbi_loop(prob, 0.995)
+        return global_key, merge_segments(times, [names[k] for k in path])
+
+    def _stage_coarse(self, mono, per_bar, beats_per_bar, vocabulary, smoothing, key_window):
+        """
+        Quick look at the whole track: audio at COARSE_SR, STFT chroma without
+        tuning estimation, then the regular beat-sync/scoring/decoding stages.
+        Returns (bpm, beat times, segments, key, key segments).
+        """
+        y_mono, sr = mono
+        y = librosa.resample(y_mono, orig_sr=sr, target_sr=COARSE_SR, res_type="soxr_mq")
+        self.check_cancelled()
+        chroma = librosa.feature.chroma_stft(y=y, sr=COARSE_SR, n_fft=2048, hop_length=COARSE_HOP, tuning=0.0)
+        onset_env = librosa.onset.onset_strength(y=y, sr=COARSE_SR, hop_length=COARSE_HOP)
+        tempo, beats = librosa.beat.beat_track(onset_envelope=onset_env, sr=COARSE_SR, hop_length=COARSE_HOP)
+        beats = np.asarray(beats, dtype=int)
+
+        beat_chroma = self._stage_beat_chroma((y, COARSE_SR), chroma, (tempo, beats),
+                                              COARSE_HOP, per_bar, beats_per_bar)
+        # Templates only: the model is trained on the full-resolution CQT chroma
+        scores = RECOGNIZERS["templates"].score(chroma, beat_chroma, COARSE_SR, COARSE_HOP, vocabulary)
+        segments = self._stage_segments(beat_chroma, scores, self._stage_chord_path(scores, smoothing))
+        key, key_segments = self._stage_key(beat_chroma, key_window)
+        beat_times = librosa.frames_to_time(beats, sr=COARSE_SR, hop_length=COARSE_HOP)
+        return float(np.atleast_1d(tempo)[0]), beat_times, segments, key, key_segments
 
     # ----------------- LOADING -----------------
 
     def load_track(self, file_path: str) -> bool:
         """
         Load audio, keep full-quality stereo, no resampling.
+        Compressed files go through the PCM cache when one is attached.
         """
         try:
             print(f"Loading {file_path}...")
-            y, sr = librosa.load(file_path, sr=None, mono=False)
+            self.check_cancelled()
+            self.pipeline.set_params(path=file_path)
+            y, sr, playback_path = self.pipeline.get("decode")
             self.y_stereo = y
             self.sr = sr
             self.duration = librosa.get_duration(y=y, sr=sr)
             self.original_path = file_path
+            self.playback_path = playback_path or file_path
+            self.beat_frames = None
+            self.beat_times = None
+            self.key_segments = []
+            self.region_cache.clear()
+            self.shift_renderer = None
             self.cleanup_temp_file()
+            self.clear_prerendered()
 
             print(f"Loaded: sr={sr}, duration={self.duration:.2f}s")
             return True
+        except AnalysisCancelled:
+            raise
         except Exception as e:
             print(f"Error loading track: {e}")
             return False
 
+    def fork_analysis(self):
+        """
+        A twin engine on the same loaded track, for analysis on another
+        thread while this one is in use elsewhere (playback, shifting,
+        renders). It shares the decoded audio (never written) and starts
+        from a copy of the memoized stages and parameters, but nothing it
+        computes touches this engine until adopt_analysis().
+        """
+        twin = AudioEngine(pcm_cache=self.pcm_cache, cancel_event=self.cancel_event,
+                           workspace=self.workspace, chroma_workers=self.chroma_workers)
+        twin.y_stereo, twin.sr, twin.duration = self.y_stereo, self.sr, self.duration
+        twin.original_path, twin.playback_path = self.original_path, self.playback_path
+        twin.pipeline.set_params(**self.pipeline.params)
+        twin.pipeline.adopt_memo(self.pipeline)
+        return twin
+
+    def adopt_analysis(self, twin):
+        """
+        Take over the memoized stages of a finished fork_analysis() twin,
+        and its beat grid and local keys if it computed them.
+        """
+        self.pipeline.adopt_memo(twin.pipeline)
+        if twin.beat_times is not None:
+            self.beat_frames, self.beat_times = twin.beat_frames, twin.beat_times
+        if twin.key_segments:
+            self.key_segments = twin.key_segments
+
     # ----------------- TEMPO / CHORDS -----------------
 
     def get_tempo(self) -> float:
+        """
+        Estimate BPM and keep the beat grid (self.beat_frames / self.beat_times).
+        """
         if self.y_stereo is None:
             return 0.0
 
         print("Analyzing tempo...")
-        if self.y_stereo.ndim > 1:
-            y_mono = librosa.to_mono(self.y_stereo)
-        else:
-            y_mono = self.y_stereo
-
-        onset_env = librosa.onset.onset_strength(y=y_mono, sr=self.sr)
-        tempo, _ = librosa.beat.beat_track(onset_envelope=onset_env, sr=self.sr)
-        tempo = float(np.atleast_1d(tempo)[0])
-        print(f"Detected tempo: {tempo:.1f} BPM")
+        tempo, beats = self.pipeline.get("beats")
+        hop_length = self.pipeline.params["hop_length"]
+        self.beat_frames = beats
+        self.beat_times = librosa.frames_to_time(beats, sr=self.sr, hop_length=hop_length)
+        print(f"Detected tempo: {tempo:.1f} BPM ({len(beats)} beats)")
         return tempo
 
-    def get_chords(self):
+    def get_key(self):
+        """
+        Estimated song key ("A", "F#m", ...) or None; local keys (modulation
+        points) are kept in self.key_segments as (start_sec, end_sec, key).
+        """
+        if self.y_stereo is None:
+            return None
+        key, self.key_segments = self.pipeline.get("key")
+        changes = len(self.key_segments) - 1
+        print(f"Detected key: {key} ({max(changes, 0)} modulations)")
+        return key
+
+    def get_beat_grid(self):
+        """
+        Beat times in seconds (runs beat tracking on first use).
+        """
+        if self.beat_times is None:
+            self.get_tempo()
+        return self.beat_times if self.beat_times is not None else np.zeros(0)
+
+    def get_chords(self, **params):
+        """
+        Beat-synchronous chord segments: list of (start_sec, end_sec, name).
+
+        Chroma is reduced per beat (or per bar) before classification, so the
+        classifier scores one column per beat instead of ~86 frames a second.
+        Keyword arguments update analysis parameters (vocabulary, smoothing,
+        per_bar, ...); cached upstream stages are reused.
+        """
         if self.y_stereo is None:
             return []
 
+        if params:
+            self.set_analysis_params(**params)
         print("Analyzing chords...")
-        if self.y_stereo.ndim > 1:
-            y_analyze = librosa.to_mono(self.y_stereo)
-        else:
-            y_analyze = self.y_stereo
-
-        hop = 512
-        chroma = librosa.feature.chroma_cqt(y=y_analyze, sr=self.sr, hop_length=512)
-        frames_per_sec = self.sr / hop
-        num_seconds = int(self.duration)
-
-        pitches = ['C', 'C#', 'D', 'D#', 'E', 'F',
-                   'F#', 'G', 'G#', 'A', 'A#', 'B']
-
-        detected = []
-        for i in range(num_seconds):
-            start = int(i * frames_per_sec)
-            end = int((i + 1) * frames_per_sec)
-            segment = chroma[:, start:end]
-            if segment.size == 0:
-                detected.append("N.C.")
-                continue
-            avg = np.mean(segment, axis=1)
-            idx = int(np.argmax(avg))
-            root = pitches[idx]
-            detected.append(f"{root} Maj")
+        return self.pipeline.get("segments")
 
-        return detected
+    def get_coarse_analysis(self):
+        """
+        Provisional (bpm, beat times, segments, key, key segments) from a fast,
+        low-resolution pass, for showing something usable while get_tempo /
+        get_chords / get_key run at full quality.
+        """
+        if self.y_stereo is None:
+            return 0.0, np.zeros(0), [], None, []
+        print("Coarse analysis...")
+        return self.pipeline.get("coarse")
 
     # ----------------- PITCH SHIFTING -----------------
 
-    def generate_shifted_file(self, semitones: int) -> str | None:
+    def get_shift_renderer(self):
+        if self.shift_renderer is None and self.y_stereo is not None:
+            self.shift_renderer = ChunkedShiftRenderer(self.y_stereo, self.sr)
+        return self.shift_renderer
+
+    def shift_complete(self, semitones: int) -> bool:
+        return (semitones == 0 or semitones in self.shift_files
+                or self.get_shift_renderer().is_complete(semitones))
+
+    def generate_shifted_file(self, semitones: int, start_sec: float | None = None,
+                              cancel_event=None) -> str | None:
         """
-        Create a stereo temp WAV with pitch shifted by `semitones`.
-        Returns path to the new file (or original file if semitones==0),
-        or None on error.
+        Create a stereo temp WAV with pitch shifted by `semitones` and make
+        it the current temp file (GUI thread). Returns path to the new file
+        (or original file if semitones==0), or None on error.
+
+        With start_sec (the playhead) only the chunk under it and the next
+        SHIFT_LOOKAHEAD_CHUNKS are rendered now; the rest of the file is
+        silent until fill_shifted_file() patches it in, in playback order.
         """
         if self.y_stereo is None or self.original_path is None:
             return None
@@ -103,36 +765,212 @@ class AudioEngine:
             # No shift requested – just use the original file
             return self.original_path
 
+        prerendered = self.shift_files.get(semitones)
+        if prerendered is not None and os.path.exists(prerendered):
+            print(f"Using pre-rendered {semitones:+d} file")
+            return prerendered
+
         try:
-            print(f"Shifting pitch by {semitones} semitones (stereo)...")
-            y = self.y_stereo
-
-            if y.ndim > 1:
-                # y: (channels, samples)
-                left = librosa.effects.pitch_shift(y[0], sr=self.sr, n_steps=semitones)
-                right = librosa.effects.pitch_shift(y[1], sr=self.sr, n_steps=semitones)
-                min_len = min(len(left), len(right))
-                data = np.stack([left[:min_len], right[:min_len]], axis=1)  # (samples, 2)
+            renderer = self.get_shift_renderer()
+            if start_sec is not None:
+                indices = renderer.playback_order(start_sec)[:1 + SHIFT_LOOKAHEAD_CHUNKS]
             else:
-                shifted = librosa.effects.pitch_shift(y, sr=self.sr, n_steps=semitones)
-                data = shifted
-
-            folder = os.path.dirname(self.original_path)
-            self.temp_path = os.path.join(folder, "temp_shifted.wav")
-            sf.write(self.temp_path, data, self.sr)
-            print(f"Temp shifted file written to {self.temp_path}")
-            return self.temp_path
+                indices = renderer.priority_order()
+            todo = [i for i in indices if not renderer.has_chunk(semitones, i)]
+            print(f"Shifting pitch by {semitones} semitones "
+                  f"({len(todo)} of {renderer.n_chunks} chunks to render)...")
+            for i in todo:
+                if renderer.render_chunk(semitones, i, cancel_event) is None:
+                    raise AnalysisCancelled()
+
+            path = self.write_shifted_file(semitones)
+            if path is not None:
+                self.adopt_shifted_file(path)
+            return path
+        except AnalysisCancelled:
+            raise
         except Exception as e:
             print(f"Error during pitch shifting: {e}")
             return None
 
-    # ----------------- CLEANUP -----------------
+    def write_shifted_file(self, semitones: int) -> str | None:
+        """
+        Write the chunks rendered so far to a new workspace file and return
+        its path (None without scratch space). Leaves temp_path alone.
+        """
+        renderer = self.get_shift_renderer()
+        nbytes = renderer.n_samples * renderer.y.shape[0] * 2
+        if self.workspace is not None and not self.workspace.has_room(nbytes):
+            print(f"Not enough scratch space for the shifted track ({nbytes / 1e6:.0f} MB)")
+            return None
+        path = self._new_temp_path()
+        renderer.write_file(semitones, path)
+        if self.workspace is not None:
+            self.workspace.register(path)
+        return path
+
+    def adopt_shifted_file(self, path: str):
+        """
+        Make `path` the current temp file (GUI thread only). The previous one
+        stays until the next switch, since the player may still be reading it.
+        """
+        self.cleanup_temp_file(keep=self.temp_path)
+        self.temp_path = path
+        self.temp_paths.append(path)
+        print(f"Temp shifted file written to {path}")
+
+    def fill_shifted_file(self, semitones: int, path: str, start_sec: float = 0.0,
+                          cancel_event=None, limit: int | None = None) -> bool:
+        """
+        Go through the chunks in playback order from start_sec, rendering the
+        missing ones, and patch each into `path` (a file from
+        write_shifted_file) as soon as it's ready, so playback keeps running
+        into rendered audio. Chunks already cached are patched too: they may
+        have been rendered after the file was written. Only the chunk cache
+        and the file are touched, so this is safe on a worker thread.
+        `limit` stops after that many chunks. Returns False if cancelled.
+        """
+        renderer = self.get_shift_renderer()
+        for i in renderer.playback_order(start_sec)[:limit]:
+            if cancel_event is not None and cancel_event.is_set():
+                return False
+            data = renderer.render_chunk(semitones, i, cancel_event)
+            if data is None:
+                return False
+            renderer.patch_file(semitones, path, i, data)
+        return True
+
+    def prerender_key(self, semitones: int, gate=None, cancel_event=None, max_bytes: int | None = None):
+        """
+        Render the complete shifted track for `semitones` into the workspace
+        and keep it in self.shift_files, so switching to that key later is
+        just a source change. Chunks are rendered one at a time (bounded
+        memory) and only while `gate` is set. Returns the path, or None when
+        the pre-render budget (`max_bytes` across all keys) or the scratch
+        disk is full.
+        """
+        if semitones == 0 or semitones in self.shift_files:
+            return self.shift_files.get(semitones)
+        renderer = self.get_shift_renderer()
+        nbytes = renderer.n_samples * renderer.y.shape[0] * 2
+        if max_bytes is not None and self.prerendered_bytes() + nbytes > max_bytes:
+            return None
+        if self.workspace is not None and not self.workspace.has_room(nbytes):
+            return None
+
+        path = self._new_temp_path()
+        if not renderer.render_file(semitones, path, cancel_event, gate):
+            self._remove_file(path)
+            raise AnalysisCancelled()
+        if self.workspace is not None:
+            self.workspace.register(path)
+        self.shift_files[semitones] = path
+        print(f"Pre-rendered {semitones:+d} semitones")
+        return path
+
+    def prerendered_bytes(self) -> int:
+        renderer = self.shift_renderer
+        if renderer is None:
+            return 0
+        return len(self.shift_files) * renderer.n_samples * renderer.y.shape[0] * 2
 
-    def cleanup_temp_file(self):
-        if self.temp_path and os.path.exists(self.temp_path):
+    def clear_prerendered(self):
+        for path in self.shift_files.values():
+            self._remove_file(path)
+        self.shift_files.clear()
+
+    def _remove_file(self, path: str):
+        if self.workspace is not None:
+            self.workspace.release(path)
+        elif os.path.exists(path):
             try:
-                os.remove(self.temp_path)
-                print(f"Removed temp file: {self.temp_path}")
-            except Exception as e:
+                os.remove(path)
+            except OSError as e:
                 print(f"Could not remove temp file: {e}")
-        self.temp_path = None
+
+    def _new_temp_path(self) -> str:
+        # Local scratch space, never the song's folder (read-only media, shares)
+        if self.workspace is not None:
+            return self.workspace.new_path("shifted", ".wav")
+        fd, path = tempfile.mkstemp(prefix="capo_shifted_", suffix=".wav")
+        os.close(fd)
+        return path
+
+    # ----------------- LOOP REGIONS -----------------
+
+    def render_region(self, start_sec: float, end_sec: float, semitones: int = 0,
+                      rate: float = 1.0, crossfade_sec: float = 0.01, cancel_event=None):
+        """
+        Render [start_sec, end_sec) at the given key and tempo for gapless looping.
+        Returns float32 (samples, channels). The tail is crossfaded into the
+        audio just before start_sec, so wrapping from B back to A is seamless.
+        Only the region (plus a little context padding) is processed.
+        """
+        if self.y_stereo is None:
+            return None
+
+        key = (round(start_sec, 4), round(end_sec, 4), semitones, round(rate, 4))
+        if key in self.region_cache:
+            return self.region_cache[key]
+
+        print(f"Rendering loop {start_sec:.2f}-{end_sec:.2f}s "
+              f"(key {semitones:+d}, rate {rate:.2f})...")
+        y = self.y_stereo if self.y_stereo.ndim > 1 else self.y_stereo[None, :]
+        n = y.shape[1]
+        a = max(0, min(n, int(round(start_sec * self.sr))))
+        b = max(a, min(n, int(round(end_sec * self.sr))))
+        pad = int(0.25 * self.sr)  # STFT context on both sides, trimmed below
+        lo, hi = max(0, a - pad), min(n, b + pad)
+
+        rendered = []
+        for channel in y:
+            seg = channel[lo:hi]
+            if rate != 1.0:
+                seg = librosa.effects.time_stretch(seg, rate=rate)
+            if semitones:
+                seg = librosa.effects.pitch_shift(seg, sr=self.sr, n_steps=semitones)
+            rendered.append(seg)
+            if cancel_event is not None and cancel_event.is_set():
+                raise AnalysisCancelled()
+
+        # Original sample offsets -> rendered timeline
+        head = int(round((a - lo) / rate))
+        length = int(round((b - a) / rate))
+        out_len = min(len(r) for r in rendered)
+        length = max(0, min(length, out_len - head))
+        data = np.stack([r[head:head + length] for r in rendered], axis=1).astype(np.float32)
+
+        n_xf = min(int(crossfade_sec * self.sr), head, length // 2)
+        if n_xf > 0:
+            pre = np.stack([r[head - n_xf:head] for r in rendered], axis=1)
+            fade = np.linspace(0.0, 1.0, n_xf, dtype=np.float32)[:, None]
+            data[-n_xf:] = data[-n_xf:] * np.sqrt(1.0 - fade) + pre * np.sqrt(fade)
+
+        if len(self.region_cache) >= 4:
+            self.region_cache.pop(next(iter(self.region_cache)))
+        self.region_cache[key] = data
+        return data
+
+    # ----------------- CLEANUP -----------------
+
+    def cleanup_temp_file(self, keep=None):
+        """
+        Remove shifted temp files; `keep` (the one about to be replaced while
+        the player may still read it) survives until the next cleanup.
+        """
+        for path in list(self.temp_paths):
+            if path == keep:
+                continue
+            if self.workspace is not None:
+                if not self.workspace.release(path):
+                    continue
+            elif os.path.exists(path):
+                try:
+                    os.remove(path)
+                    print(f"Removed temp file: {path}")
+                except Exception as e:
+                    print(f"Could not remove temp file: {e}")
+                    continue
+            self.temp_paths.remove(path)
+        if keep is None:
+            self.temp_path = None
@@ -0,0 +1,341 @@
+# CAPO_app/chord_chart.py
+
+import os
+import re
+import json
+import hashlib
+import zipfile
+import numpy as np
+
+from .audio_engine import PITCHES, DEFAULT_ANALYSIS_PARAMS, split_chord_name
+from .paths import user_cache_dir
+
+# Bump when the binary layout changes; older charts are ignored (re-analyzed)
+CHART_VERSION = 1
+
+NO_CHORD = "N.C."
+
+CHORDPRO_EXTENSIONS = (".cho", ".chopro", ".chordpro", ".crd", ".pro")
+
+# Capo suffix <-> Harte shorthand (MIREX .lab files)
+HARTE_QUALITIES = {
+    "": "maj", "m": "min", "7": "7", "maj7": "maj7", "m7": "min7",
+    "dim": "dim", "aug": "aug", "sus2": "sus2", "sus4": "sus4",
+    "6": "maj6", "m6": "min6", "dim7": "dim7", "m7b5": "hdim7", "9": "9",
+}
+CAPO_QUALITIES = {v: k for k, v in HARTE_QUALITIES.items()}
+
+# Slash-bass interval (semitones above the root) <-> Harte degree
+HARTE_DEGREES = {0: "1", 1: "b2", 2: "2", 3: "b3", 4: "3", 5: "4",
+                 6: "b5", 7: "5", 8: "b6", 9: "6", 10: "b7", 11: "7"}
+DEGREE_INTERVALS = {v: k for k, v in HARTE_DEGREES.items()}
+
+FLATS = {"Db": "C#", "Eb": "D#", "Gb": "F#", "Ab": "G#", "Bb": "A#", "Cb": "B", "Fb": "E"}
+
+
+def _note(name: str):
+    name = FLATS.get(name, name)
+    return PITCHES.index(name) if name in PITCHES else None
+
+
+def to_harte(name: str) -> str:
+    """ "Am7" -> "A:min7", "D/F#" -> "D:maj/3", "N.C." -> "N". """
+    if name == NO_CHORD:
+        return "N"
+    chord, _, bass = name.partition("/")
+    root, suffix = split_chord_name(chord)
+    label = f"{root}:{HARTE_QUALITIES.get(suffix, suffix or 'maj')}"
+    if bass and _note(root) is not None and _note(bass) is not None:
+        label += "/" + HARTE_DEGREES[(_note(bass) - _note(root)) % 12]
+    return label
+
+
+def from_harte(label: str) -> str:
+    """ Inverse of to_harte; plain Capo names pass through unchanged. """
+    label = label.strip()
+    if label in ("N", "X", ""):
+        return NO_CHORD
+    if ":" not in label:
+        root, _, bass = label.partition("/")
+        if bass in DEGREE_INTERVALS:  # "C/5": a major chord with a degree bass
+            label = f"{root}:maj/{bass}"
+        else:
+            return label
+    root, rest = label.split(":", 1)
+    quality, _, degree = rest.partition("/")
+    root = FLATS.get(root, root)
+    name = root + CAPO_QUALITIES.get(quality, quality)
+    if degree in DEGREE_INTERVALS and _note(root) is not None:
+        name += "/" + PITCHES[(_note(root) + DEGREE_INTERVALS[degree]) % 12]
+    return name
+
+
+class ChordChart:
+    """
+    One song's analysis result: chord segments plus the tempo and beat grid.
+
+    On disk it is a pair of files sharing a base path: `<base>.npz` with the
+    arrays (segment times, chord ids into the name table, beat times) and a
+    small `<base>.json` sidecar with the version, name table and metadata.
+    Loading it takes about a millisecond, so a song that has a chart needs
+    no audio analysis at all.
+    """
+
+    def __init__(self, segments, bpm: float = 0.0, beat_times=(), vocabulary: str = "beginner",
+                 title: str = "", fingerprint: str | None = None, key: str | None = None,
+                 key_segments=(), peaks=None):
+        self.segments = [(float(s), float(e), str(n)) for s, e, n in segments]
+        self.bpm = float(bpm)
+        self.beat_times = np.asarray(beat_times, dtype=np.float64)
+        self.vocabulary = vocabulary
+        self.title = title
+        self.fingerprint = fingerprint
+        self.key = key
+        self.key_segments = [(float(s), float(e), str(k)) for s, e, k in key_segments]
+        self.peaks = peaks  # optional (times, values, duration) from compute_peaks, for thumbnails
+
+    @property
+    def duration(self) -> float:
+        return self.segments[-1][1] if self.segments else 0.0
+
+    # ----------------- BINARY -----------------
+
+    def save(self, base_path: str):
+        names = sorted({name for _, _, name in self.segments})
+        index = {name: i for i, name in enumerate(names)}
+        starts = np.array([s for s, _, _ in self.segments], dtype=np.float64)
+        ends = np.array([e for _, e, _ in self.segments], dtype=np.float64)
+        ids = np.array([index[n] for _, _, n in self.segments], dtype=np.int16)
+
+        # Arrays first, sidecar last: a chart only counts once its sidecar exists
+        tmp = base_path + ".partial.npz"
+        arrays = dict(starts=starts, ends=ends, chord_ids=ids, beat_times=self.beat_times)
+        if self.peaks is not None:
+            times, values, _ = self.peaks
+            arrays.update(peak_times=np.asarray(times, np.float32), peak_values=np.asarray(values, np.float16))
+        np.savez(tmp, **arrays)
+        os.replace(tmp, base_path + ".npz")
+        meta = {
+            "version": CHART_VERSION,
+            "names": names,
+            "bpm": self.bpm,
+            "vocabulary": self.vocabulary,
+            "title": self.title,
+            "fingerprint": self.fingerprint,
+            "key": self.key,
+            "key_segments": self.key_segments,
+            "duration": self.peaks[2] if self.peaks is not None else self.duration,
+        }
+        with open(base_path + ".json.partial", "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=1)
+        os.replace(base_path + ".json.partial", base_path + ".json")
+
+    @classmethod
+    def load(cls, base_path: str):
+        """
+        Returns None if the chart is missing, unreadable or from another version.
+        """
+        try:
+            with open(base_path + ".json", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("version") != CHART_VERSION:
+                return None
+            with np.load(base_path + ".npz") as arrays:
+                names = meta["names"]
+                segments = [(s, e, names[i]) for s, e, i in zip(
+                    arrays["starts"].tolist(), arrays["ends"].tolist(), arrays["chord_ids"].tolist())]
+                beat_times = arrays["beat_times"]
+                peaks = None
+                if "peak_values" in arrays:
+                    peaks = (arrays["peak_times"], arrays["peak_values"].astype(np.float32),
+                             meta.get("duration", 0.0))
+        except (OSError, ValueError, KeyError, IndexError, EOFError, zipfile.BadZipFile) as e:
+            if not isinstance(e, FileNotFoundError):
+                print(f"Error reading chord chart {base_path}: {e}")
+                drop_chart(base_path)  # corrupt / truncated: re-analyze and save a fresh one
+            return None
+        return cls(segments, meta.get("bpm", 0.0), beat_times, meta.get("vocabulary", "beginner"),
+                   meta.get("title", ""), meta.get("fingerprint"), meta.get("key"),
+                   meta.get("key_segments", ()), peaks)
+
+    # ----------------- TEXT FORMATS -----------------
+
+    def to_lab(self) -> str:
+        """MIREX .lab: "start end label" per line, Harte chord labels."""
+        return "".join(f"{s:.3f}\t{e:.3f}\t{to_harte(n)}\n" for s, e, n in self.segments)
+
+    @classmethod
+    def from_lab(cls, text: str, **meta):
+        segments = []
+        for line in text.splitlines():
+            parts = line.split()
+            if len(parts) >= 3 and not line.lstrip().startswith("#"):
+                segments.append((float(parts[0]), float(parts[1]), from_harte(" ".join(parts[2:]))))
+        return cls(segments, **meta)
+
+    def to_chordpro(self, per_line: int = 4) -> str:
+        """
+        ChordPro chord chart, `per_line` chords per line. Each line is preceded
+        by an `x_capo_times` directive with its chord start times, so Capo can
+        re-import the chart with its timing; other readers ignore it.
+        """
+        lines = []
+        if self.title:
+            lines.append(f"{{title: {self.title}}}")
+        if self.key:
+            lines.append(f"{{key: {self.key}}}")
+        if self.bpm:
+            lines.append(f"{{tempo: {round(self.bpm)}}}")
+        lines.append(f"{{x_capo_end: {self.duration:.3f}}}")
+        for i in range(0, len(self.segments), per_line):
+            row = self.segments[i:i + per_line]
+            lines.append("{x_capo_times: " + " ".join(f"{s:.3f}" for s, _, _ in row) + "}")
+            lines.append(" ".join(f"[{n}]" for _, _, n in row))
+        return "\n".join(lines) + "\n"
+
+    @classmethod
+    def from_chordpro(cls, text: str, duration: float | None = None, **meta):
+        """
+        Charts without Capo timing get one bar per chord at the {tempo}
+        (or 2 s per chord), stretched to `duration` when it is known.
+        """
+        directive = re.compile(r"\{\s*([\w-]+)\s*:?\s*(.*?)\s*\}")
+        chord = re.compile(r"\[([^\]]+)\]")
+        names, starts, end = [], [], None
+        title, tempo, song_key = meta.pop("title", ""), 0.0, meta.pop("key", None)
+        pending_times = None
+        for line in text.splitlines():
+            if line.lstrip().startswith("#"):
+                continue
+            for name, value in directive.findall(line):
+                name = name.lower()
+                if name in ("title", "t"):
+                    title = value
+                elif name == "key":
+                    song_key = value
+                elif name == "tempo":
+                    tempo = float(value or 0)
+                elif name == "x_capo_end":
+                    end = float(value)
+                elif name == "x_capo_times":
+                    pending_times = [float(v) for v in value.split()]
+            found = chord.findall(directive.sub("", line))
+            if found:
+                names.extend(found)
+                if pending_times is not None and len(pending_times) == len(found):
+                    starts.extend(pending_times)
+                else:
+                    starts.extend([None] * len(found))
+                pending_times = None
+
+        if names and None in starts:
+            step = 4 * 60.0 / tempo if tempo > 0 else 2.0
+            if duration:
+                step = duration / len(names)
+            starts = [i * step for i in range(len(names))]
+            end = len(names) * step
+        if end is None:
+            end = duration or (starts[-1] + 2.0 if starts else 0.0)
+
+        bounds = starts + [end]
+        segments = [(bounds[i], bounds[i + 1], n) for i, n in enumerate(names) if bounds[i + 1] > bounds[i]]
+        return cls(segments, bpm=meta.pop("bpm", tempo), title=title, key=song_key, **meta)
+
+    # ----------------- FILES -----------------
+
+    def export(self, path: str):
+        """Write the chart in the format implied by the file extension."""
+        ext = os.path.splitext(path)[1].lower()
+        if ext == ".lab":
+            text = self.to_lab()
+        elif ext in CHORDPRO_EXTENSIONS:
+            text = self.to_chordpro()
+        elif ext in (".json", ".npz"):
+            self.save(os.path.splitext(path)[0])
+            return
+        else:
+            raise ValueError(f"Unknown chart format: {ext}")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+def import_chart(path: str, duration: float | None = None):
+    """
+    Read a chart written by ChordChart.export (or by another tool).
+    Returns a ChordChart, or None on failure.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    try:
+        if ext in (".json", ".npz"):
+            return ChordChart.load(os.path.splitext(path)[0])
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+        if ext == ".lab":
+            return ChordChart.from_lab(text)
+        return ChordChart.from_chordpro(text, duration=duration)
+    except (OSError, ValueError) as e:
+        print(f"Error importing chord chart: {e}")
+        return None
+
+
+def drop_chart(base_path: str):
+    for ext in (".json", ".npz"):
+        try:
+            os.remove(base_path + ext)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Error removing chord chart {base_path}{ext}: {e}")
+
+
+def analysis_tag(params: dict | None = None) -> str:
+    """
+    Short hash of the analysis settings a chart was made with (hpss,
+    recognizer, smoothing, ...), the vocabulary aside. Only the keys of
+    DEFAULT_ANALYSIS_PARAMS count: per-file pipeline params such as `path`
+    are left out, so a moved or renamed song still finds its chart.
+    Unset keys take their default value.
+    """
+    params = params or {}
+    settings = {k: params.get(k, v) for k, v in DEFAULT_ANALYSIS_PARAMS.items() if k != "vocabulary"}
+    blob = json.dumps(settings, sort_keys=True, default=str)
+    return hashlib.sha1(blob.encode("utf-8")).hexdigest()[:8]
+
+
+class ChordChartStore:
+    """
+    Saved analysis results in the user cache, keyed by audio fingerprint,
+    chord vocabulary (Beginner and Advanced charts differ) and the other
+    analysis settings (analysis_tag), so changing e.g. the recognizer or
+    HPSS re-analyzes instead of serving the old chart. With a `library`
+    (library.Library), every saved chart is also indexed for search.
+    """
+
+    def __init__(self, cache_dir: str | None = None, library=None):
+        self.cache_dir = cache_dir or user_cache_dir("charts")
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.library = library
+
+    def base_path(self, fingerprint: str, vocabulary: str, params: dict | None = None) -> str:
+        return os.path.join(self.cache_dir, f"{fingerprint}-{vocabulary}-{analysis_tag(params)}")
+
+    def load(self, fingerprint: str, vocabulary: str, params: dict | None = None):
+        """The chart analyzed with `params` (engine pipeline params), or None."""
+        chart = ChordChart.load(self.base_path(fingerprint, vocabulary, params))
+        if chart is not None:
+            print(f"Chord chart found ({vocabulary}): skipping analysis")
+        return chart
+
+    def save(self, chart: ChordChart, path: str | None = None, params: dict | None = None):
+        if not chart.fingerprint:
+            return
+        try:
+            chart.save(self.base_path(chart.fingerprint, chart.vocabulary, params))
+        except Exception as e:
+            print(f"Error saving chord chart: {e}")
+        self.index(chart, path)
+
+    def index(self, chart: ChordChart, path: str | None = None):
+        """Add the chart to the library index (a no-op if it is unchanged)."""
+        if self.library is not None:
+            self.library.upsert(chart, path)
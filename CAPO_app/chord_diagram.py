@@ -1,7 +1,11 @@
+import numpy as np
 from PyQt6.QtWidgets import QWidget
 from PyQt6.QtGui import QPainter, QPen, QColor, QBrush, QFont
 from PyQt6.QtCore import Qt
 
+from .audio_engine import PITCHES, split_chord_name
+from .voicings import get_voicing_index
+
 # Dictionary for Standard Open Chords (Beginner)
 CHORD_SHAPES_BEGINNER = {
     "C":  [(5, 3), (4, 2), (2, 1)],
@@ -63,15 +67,196 @@ CHORD_SHAPES_ADVANCED = {
     "Em":  [(5, 7), (4, 9), (3, 9), (2, 8), (1, 7)],         
 }
 
+
+def _is_open_shape(shape) -> bool:
+    # Open-position shapes: at most three fretted notes, all within the first three frets
+    fretted = [f for _, f in shape if f > 0]
+    return len(fretted) <= 3 and max(fretted, default=0) <= 3
+
+
+# (root, minor?) -> 1.0 if the beginner shape needs a barre / high position
+BARRE_COST = np.array([
+    [0.0 if _is_open_shape(CHORD_SHAPES_BEGINNER[root + suffix]) else 1.0 for suffix in ("", "m")]
+    for root in PITCHES
+])
+
+# CAPO_SHIFT[capo, root] = shape root played with that capo
+CAPO_SHIFT = (np.arange(12)[None, :] - np.arange(12)[:, None]) % 12
+
+
+def chord_histogram(segments, semitones: int = 0):
+    """
+    Seconds of each (root, major/minor) over the song, as a (12, 2) array.
+    7ths count as their triad; N.C. and unknown names are skipped.
+    """
+    hist = np.zeros((12, 2))
+    for start, end, name in segments:
+        root, suffix = split_chord_name(name.split("/")[0])
+        if root in PITCHES:
+            minor = suffix.startswith("m") and not suffix.startswith("maj")
+            hist[(PITCHES.index(root) + semitones) % 12, int(minor)] += end - start
+    return hist
+
+
+def rank_capo_positions(hist, key_shift: int = 0, max_capo: int = 7):
+    """
+    Capo positions ordered by the share of playing time spent on barre /
+    high-position beginner shapes (lowest capo first on ties), for a song
+    transposed by `key_shift`. Returns (positions, costs); one small array
+    product, no Python loops.
+    """
+    hist = np.roll(hist, key_shift, axis=0)
+    total = max(hist.sum(), 1e-9)
+    costs = (BARRE_COST[CAPO_SHIFT[:max_capo + 1]] * hist[None]).sum(axis=(1, 2)) / total
+    order = np.lexsort((np.arange(len(costs)), np.round(costs, 6)))
+    return order, costs[order]
+
+
+def lookup_shape(chord_name, mode="beginner", near=None):
+    """
+    Diagram positions for a chord: the hand-written shapes first, then the
+    voicing index (closest to fret `near` when given).
+    """
+    if not chord_name:
+        return []
+    shapes = CHORD_SHAPES_ADVANCED if mode == 'advanced' else CHORD_SHAPES_BEGINNER
+    shape = shapes.get(chord_name)
+    if shape is None:
+        # Anything else: indexed voicing closest to where the hand already is
+        # (beginners stay in the first five frets when possible)
+        voicings = get_voicing_index()
+        voicing = voicings.best(chord_name, near=near, max_fret=5 if mode == 'beginner' else None)
+        shape = voicings.shape(voicing)
+    if not shape:
+        # Unknown symbols: fall back to the underlying triad (G7 -> G, Am7 -> Am)
+        root, suffix = split_chord_name(chord_name)
+        shape = shapes.get(root + ("m" if suffix.startswith("m") and not suffix.startswith("maj") else ""))
+    return shape or []
+
+
+def paint_chord_diagram(painter, w, h, chord_name, positions, mode="beginner"):
+    """
+    Draw one fretboard diagram into a w x h area at the painter's origin.
+    Used by ChordDiagramWidget and by offscreen chord sheets (QImage).
+    """
+    # --- FIX 1: ADJUSTED MARGINS FOR TEXT SPACE ---
+    margin_left = 25   
+    margin_right = 60  # Increased to prevent number overlap
+    margin_top = 25  
+    margin_bottom = 55 
+    
+    board_w = w - margin_left - margin_right
+    board_h = h - margin_top - margin_bottom 
+    
+    
+    base_fret = 1
+    if positions:
+        frets_used = [p[1] for p in positions if p[1] > 0]
+        if frets_used:
+            max_fret_in_chord = max(frets_used)
+            min_fret_in_chord = min(frets_used)
+            if max_fret_in_chord > 5: 
+                base_fret = min_fret_in_chord
+    
+    num_frets_shown = 6 # Showing 6 frets is standard
+    
+    # 1. Fretboard Background
+    painter.setBrush(QBrush(QColor("#1a100c")))
+    painter.setPen(Qt.PenStyle.NoPen)
+    painter.drawRoundedRect(margin_left - 5, margin_top - 5, board_w + 10, board_h + 10, 5, 5)
+
+    # 2. Nut (The White Line Fix)
+    # Only draw the white nut if we are at fret 1 AND in beginner mode.
+    # Advanced/Barre chords look better with just fret lines.
+    is_beginner_at_start = (base_fret == 1 and mode == 'beginner')
+    
+    if is_beginner_at_start:
+        nut_pen = QPen(QColor("#e0e0e0"), 6)
+        painter.setPen(nut_pen)
+        painter.drawLine(margin_left, margin_top, margin_left + board_w, margin_top)
+    else:
+        # Draw normal fret line for top
+        top_pen = QPen(QColor("#8d6e63"), 2)
+        painter.setPen(top_pen)
+        painter.drawLine(margin_left, margin_top, margin_left + board_w, margin_top)
+
+    # 3. Frets
+    fret_pen = QPen(QColor("#8d6e63"), 2) 
+    painter.setPen(fret_pen)
+    fret_spacing = board_h / num_frets_shown
+    
+    for i in range(1, num_frets_shown + 1):
+        y = margin_top + (i * fret_spacing)
+        painter.drawLine(margin_left, int(y), margin_left + board_w, int(y))
+
+    # 4. Strings
+    string_pen = QPen(QColor("#5d4037"), 2)
+    painter.setPen(string_pen)
+    num_strings = 6
+    string_spacing = board_w / (num_strings - 1)
+    string_x_pos = []
+    
+    for i in range(num_strings):
+        x = margin_left + (i * string_spacing)
+        string_x_pos.append(x)
+        painter.drawLine(int(x), margin_top, int(x), margin_top + int(board_h))
+
+    # 5. Fingers
+    painter.setBrush(QBrush(QColor("#00E676"))) 
+    painter.setPen(Qt.PenStyle.NoPen)
+    
+    if positions:
+        for string_num, fret_num in positions:
+            s_idx = 6 - string_num 
+            
+            if 0 <= s_idx < 6:
+                x = string_x_pos[s_idx]
+                
+                if fret_num == 0:
+                    # Open String
+                    painter.setBrush(Qt.BrushStyle.NoBrush)
+                    painter.setPen(QPen(QColor("#00E676"), 2))
+                    painter.drawEllipse(int(x) - 6, margin_top - 18, 12, 12)
+                    painter.setBrush(QBrush(QColor("#00E676"))) 
+                    painter.setPen(Qt.PenStyle.NoPen)
+                else:
+                    # Fretted Note
+                    rel_fret = fret_num - base_fret + 1
+                    if 1 <= rel_fret <= num_frets_shown:
+                        y = margin_top + (rel_fret * fret_spacing) - (fret_spacing / 2)
+                        painter.drawEllipse(int(x) - 9, int(y) - 9, 18, 18)
+
+    # 6. Fret Label (e.g. "5fr")
+    if base_fret > 1:
+        painter.setPen(QColor("#8d6e63"))
+        font = QFont("Segoe UI", 12, QFont.Weight.Bold)
+        painter.setFont(font)
+        # Draw well outside the board now that we have margin_right=60
+        painter.drawText(margin_left + board_w + 15, margin_top + int(fret_spacing/2) + 5, f"{base_fret}fr")
+
+    # 7. Chord Name
+    if chord_name:
+        painter.setPen(QColor("#e09f53"))
+        font = QFont("Segoe UI", 18, QFont.Weight.Bold)
+        painter.setFont(font)
+        
+        text_rect_y = margin_top + board_h + 5
+        painter.drawText(0, int(text_rect_y), w, 40, Qt.AlignmentFlag.AlignCenter, chord_name)
+
+
 class ChordDiagramWidget(QWidget):
     def __init__(self):
         super().__init__()
         self.setMinimumSize(220, 280) 
         self.current_chord = "" 
         self.mode = "beginner" 
+        self.positions = []
+        self.hand_position = None  # mean fretted fret of the last shape shown
+        get_voicing_index()  # build/load the voicing table up front, not on the first chord
 
     def set_mode(self, mode):
         self.mode = mode
+        self.positions = self.get_shape()
         self.update() 
 
     def set_chord(self, chord_name):
@@ -83,124 +268,18 @@ class ChordDiagramWidget(QWidget):
                 self.current_chord = parts[0]
             else:
                 self.current_chord = ""
+        # Resolve the shape here, once per chord change, not on every repaint
+        self.positions = self.get_shape()
+        frets = [f for _, f in self.positions if f > 0]
+        if frets:
+            self.hand_position = sum(frets) / len(frets)
         self.update() 
 
     def get_shape(self):
-        if not self.current_chord:
-            return []
-        if self.mode == 'advanced':
-            return CHORD_SHAPES_ADVANCED.get(self.current_chord, [])
-        else:
-            return CHORD_SHAPES_BEGINNER.get(self.current_chord, [])
+        return lookup_shape(self.current_chord, self.mode, self.hand_position)
 
     def paintEvent(self, event):
         painter = QPainter(self)
         painter.setRenderHint(QPainter.RenderHint.Antialiasing)
-
-        w = self.width()
-        h = self.height()
-
-        # --- FIX 1: ADJUSTED MARGINS FOR TEXT SPACE ---
-        margin_left = 25   
-        margin_right = 60  # Increased to prevent number overlap
-        margin_top = 25  
-        margin_bottom = 55 
-        
-        board_w = w - margin_left - margin_right
-        board_h = h - margin_top - margin_bottom 
-        
-        positions = self.get_shape()
-        
-        base_fret = 1
-        if positions:
-            frets_used = [p[1] for p in positions if p[1] > 0]
-            if frets_used:
-                max_fret_in_chord = max(frets_used)
-                min_fret_in_chord = min(frets_used)
-                if max_fret_in_chord > 5: 
-                    base_fret = min_fret_in_chord
-        
-        num_frets_shown = 6 # Showing 6 frets is standard
-        
-        # 1. Fretboard Background
-        painter.setBrush(QBrush(QColor("#1a100c")))
-        painter.setPen(Qt.PenStyle.NoPen)
-        painter.drawRoundedRect(margin_left - 5, margin_top - 5, board_w + 10, board_h + 10, 5, 5)
-
-        # 2. Nut (The White Line Fix)
-        # Only draw the white nut if we are at fret 1 AND in beginner mode.
-        # Advanced/Barre chords look better with just fret lines.
-        is_beginner_at_start = (base_fret == 1 and self.mode == 'beginner')
-        
-        if is_beginner_at_start:
-            nut_pen = QPen(QColor("#e0e0e0"), 6)
-            painter.setPen(nut_pen)
-            painter.drawLine(margin_left, margin_top, margin_left + board_w, margin_top)
-        else:
-            # Draw normal fret line for top
-            top_pen = QPen(QColor("#8d6e63"), 2)
-            painter.setPen(top_pen)
-            painter.drawLine(margin_left, margin_top, margin_left + board_w, margin_top)
-
-        # 3. Frets
-        fret_pen = QPen(QColor("#8d6e63"), 2) 
-        painter.setPen(fret_pen)
-        fret_spacing = board_h / num_frets_shown
-        
-        for i in range(1, num_frets_shown + 1):
-            y = margin_top + (i * fret_spacing)
-            painter.drawLine(margin_left, int(y), margin_left + board_w, int(y))
-
-        # 4. Strings
-        string_pen = QPen(QColor("#5d4037"), 2)
-        painter.setPen(string_pen)
-        num_strings = 6
-        string_spacing = board_w / (num_strings - 1)
-        string_x_pos = []
-        
-        for i in range(num_strings):
-            x = margin_left + (i * string_spacing)
-            string_x_pos.append(x)
-            painter.drawLine(int(x), margin_top, int(x), margin_top + int(board_h))
-
-        # 5. Fingers
-        painter.setBrush(QBrush(QColor("#00E676"))) 
-        painter.setPen(Qt.PenStyle.NoPen)
-        
-        if positions:
-            for string_num, fret_num in positions:
-                s_idx = 6 - string_num 
-                
-                if 0 <= s_idx < 6:
-                    x = string_x_pos[s_idx]
-                    
-                    if fret_num == 0:
-                        # Open String
-                        painter.setBrush(Qt.BrushStyle.NoBrush)
-                        painter.setPen(QPen(QColor("#00E676"), 2))
-                        painter.drawEllipse(int(x) - 6, margin_top - 18, 12, 12)
-                        painter.setBrush(QBrush(QColor("#00E676"))) 
-                        painter.setPen(Qt.PenStyle.NoPen)
-                    else:
-                        # Fretted Note
-                        rel_fret = fret_num - base_fret + 1
-                        if 1 <= rel_fret <= num_frets_shown:
-                            y = margin_top + (rel_fret * fret_spacing) - (fret_spacing / 2)
-                            painter.drawEllipse(int(x) - 9, int(y) - 9, 18, 18)
-
-        # 6. Fret Label (e.g. "5fr")
-        if base_fret > 1:
-            painter.setPen(QColor("#8d6e63"))
-            font = QFont("Segoe UI", 12, QFont.Weight.Bold)
-            painter.setFont(font)
-            # Draw well outside the board now that we have margin_right=60
-            painter.drawText(margin_left + board_w + 15, margin_top + int(fret_spacing/2) + 5, f"{base_fret}fr")
-
-        # 7. Chord Name
-        if self.current_chord:
-            painter.setPen(QColor("#e09f53"))
-            font = QFont("Segoe UI", 18, QFont.Weight.Bold)
-            painter.setFont(font)
-            
-            text_rect_y = margin_top + board_h + 5
-            painter.drawText(0, int(text_rect_y), w, 40, Qt.AlignmentFlag.AlignCenter, self.current_chord)
\ No newline at end of file
+        paint_chord_diagram(painter, self.width(), self.height(),
+                            self.current_chord, self.positions, self.mode)
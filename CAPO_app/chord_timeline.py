@@ -0,0 +1,203 @@
+# CAPO_app/chord_timeline.py
+
+import bisect
+from collections import OrderedDict
+
+from PyQt6.QtWidgets import QListView, QStyledItemDelegate, QAbstractItemView, QFrame
+from PyQt6.QtCore import Qt, QAbstractListModel, QModelIndex, QSize, QRectF, pyqtSignal
+from PyQt6.QtGui import QPainter, QPixmap, QColor, QFont, QPen, QLinearGradient
+
+from .textures import TextureManager, STRETCH
+
+CHIP_SIZE = QSize(88, 40)
+CHIP_SPACING = 6
+CHIP_CACHE_SIZE = 256  # (name, active, size, dpr) pixmaps; a song uses a few dozen
+
+StartRole = Qt.ItemDataRole.UserRole + 1
+EndRole = Qt.ItemDataRole.UserRole + 2
+ActiveRole = Qt.ItemDataRole.UserRole + 3
+
+
+def format_time(sec: float) -> str:
+    return f"{int(sec // 60)}:{int(sec % 60):02d}"
+
+
+class ChordTimelineModel(QAbstractListModel):
+    """
+    One row per (start_sec, end_sec, name) chord segment, in song order,
+    plus the row under the playhead. Capo / key changes keep the segment
+    times, so they arrive as a dataChanged on the names instead of a reset.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.segments = []
+        self.starts = []
+        self.active = -1
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.segments)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or not 0 <= index.row() < len(self.segments):
+            return None
+        start, end, name = self.segments[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return name
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return f"{name}  {format_time(start)} - {format_time(end)}"
+        if role == StartRole:
+            return start
+        if role == EndRole:
+            return end
+        if role == ActiveRole:
+            return index.row() == self.active
+        return None
+
+    def set_segments(self, segments):
+        segments = list(segments)
+        if [s[:2] for s in segments] == [s[:2] for s in self.segments]:
+            # Same timeline, new names (capo / key / chord type)
+            changed = [i for i, (old, new) in enumerate(zip(self.segments, segments)) if old[2] != new[2]]
+            self.segments = segments
+            if changed:
+                self.dataChanged.emit(self.index(changed[0]), self.index(changed[-1]),
+                                      [Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.ToolTipRole])
+            return
+        self.beginResetModel()
+        self.segments = segments
+        self.starts = [start for start, _, _ in segments]
+        self.active = -1
+        self.endResetModel()
+
+    def row_at(self, time_sec: float) -> int:
+        """Row playing at time_sec, or -1 (before the first chord / in a gap)."""
+        i = bisect.bisect_right(self.starts, time_sec) - 1
+        if 0 <= i < len(self.segments) and time_sec < self.segments[i][1]:
+            return i
+        return -1
+
+    def set_active(self, row: int) -> bool:
+        """Move the playhead highlight; repaints only the two rows involved."""
+        if row == self.active:
+            return False
+        old, self.active = self.active, row
+        for r in (old, row):
+            if 0 <= r < len(self.segments):
+                idx = self.index(r)
+                self.dataChanged.emit(idx, idx, [ActiveRole])
+        return True
+
+
+class ChordChipDelegate(QStyledItemDelegate):
+    """
+    Paints each row as a chord chip from a small cache of finished pixmaps:
+    the chip texture scaled to the cell and the name drawn on top, built
+    once per (name, active, size, device pixel ratio). A repaint is then a
+    single drawPixmap per visible row.
+    """
+
+    def __init__(self, textures: TextureManager | None = None, parent=None):
+        super().__init__(parent)
+        self.textures = textures
+        self.font = QFont("Segoe UI", 13)
+        self.font.setPixelSize(13)
+        self.font.setWeight(QFont.Weight.Black)
+        self.cache = OrderedDict()
+
+    def sizeHint(self, option, index):
+        return CHIP_SIZE
+
+    def paint(self, painter, option, index):
+        if option.rect.isEmpty():
+            return
+        dpr = painter.device().devicePixelRatioF()
+        active = bool(index.data(ActiveRole))
+        chip = self.chip(index.data() or "", active, option.rect.size(), dpr)
+        painter.drawPixmap(option.rect.topLeft(), chip)
+
+    def chip(self, name: str, active: bool, size: QSize, dpr: float) -> QPixmap:
+        key = (name, active, size.width(), size.height(), dpr)
+        pixmap = self.cache.get(key)
+        if pixmap is not None:
+            self.cache.move_to_end(key)
+            return pixmap
+
+        pixmap = QPixmap(size * dpr)
+        pixmap.setDevicePixelRatio(dpr)
+        pixmap.fill(Qt.GlobalColor.transparent)
+        p = QPainter(pixmap)
+        p.setRenderHint(QPainter.RenderHint.Antialiasing)
+        p.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
+        rect = QRectF(0, 0, size.width(), size.height())
+        texture = self.textures.pixmap("chord_chip.png", size, dpr, STRETCH) if self.textures else None
+        if texture is not None:
+            p.drawPixmap(0, 0, texture)
+        else:
+            gradient = QLinearGradient(0, 0, 0, rect.height())
+            gradient.setColorAt(0.0, QColor("#5a341c"))
+            gradient.setColorAt(1.0, QColor("#2e1a0e"))
+            p.setBrush(gradient)
+            p.setPen(QPen(QColor("#d2ad61"), 2))
+            p.drawRoundedRect(rect.adjusted(1, 1, -1, -1), 8, 8)
+        if active:
+            # Playhead chord: light the chip up instead of swapping textures
+            p.setBrush(QColor(242, 212, 138, 70))
+            p.setPen(QPen(QColor("#f2d48a"), 3))
+            p.drawRoundedRect(rect.adjusted(1.5, 1.5, -1.5, -1.5), 8, 8)
+
+        p.setFont(self.font)
+        p.setPen(QColor(0, 0, 0, 200))
+        p.drawText(rect.translated(1, 1), Qt.AlignmentFlag.AlignCenter, name)
+        p.setPen(QColor("#fff4cf") if active else QColor("#f2d48a"))
+        p.drawText(rect, Qt.AlignmentFlag.AlignCenter, name)
+        p.end()
+
+        self.cache[key] = pixmap
+        if len(self.cache) > CHIP_CACHE_SIZE:
+            self.cache.popitem(last=False)
+        return pixmap
+
+
+class ChordTimelineView(QListView):
+    """
+    Whole-song chord sheet: chips wrap left to right in song order. All
+    cells share one size, so the view lays rows out arithmetically and
+    only paints the ones in the viewport. Clicking a chip asks for a seek.
+    """
+
+    seek_requested = pyqtSignal(float)
+
+    def __init__(self, textures: TextureManager | None = None, parent=None):
+        super().__init__(parent)
+        self.timeline = ChordTimelineModel(self)
+        self.setModel(self.timeline)
+        self.setItemDelegate(ChordChipDelegate(textures, self))
+
+        self.setViewMode(QListView.ViewMode.ListMode)
+        self.setFlow(QListView.Flow.LeftToRight)
+        self.setWrapping(True)
+        self.setResizeMode(QListView.ResizeMode.Adjust)
+        self.setUniformItemSizes(True)
+        self.setLayoutMode(QListView.LayoutMode.Batched)
+        self.setSpacing(CHIP_SPACING // 2)
+        self.setMovement(QListView.Movement.Static)
+        self.setSelectionMode(QAbstractItemView.SelectionMode.NoSelection)
+        self.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.setFocusPolicy(Qt.FocusPolicy.NoFocus)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        self.setFrameShape(QFrame.Shape.NoFrame)
+        self.setStyleSheet("QListView { background: transparent; }")
+        self.viewport().setAutoFillBackground(False)
+
+        self.clicked.connect(lambda index: self.seek_requested.emit(float(index.data(StartRole))))
+
+    def set_chords(self, segments):
+        self.timeline.set_segments(segments)
+
+    def set_position(self, time_sec: float):
+        """Highlight the chord under the playhead, scrolling only if it's out of view."""
+        row = self.timeline.row_at(time_sec)
+        if self.timeline.set_active(row) and row >= 0:
+            self.scrollTo(self.timeline.index(row), QAbstractItemView.ScrollHint.EnsureVisible)
@@ -0,0 +1,224 @@
+# CAPO_app/cqt.py
+
+import os
+import time
+import threading
+import numpy as np
+import librosa
+import scipy.sparse
+
+from .paths import user_cache_dir
+
+# Bump when kernel construction changes, so persisted kernels are rebuilt
+KERNEL_VERSION = 1
+
+# chroma_cqt defaults: 7 octaves from C1, 3 bins per semitone
+N_OCTAVES = 7
+BINS_PER_OCTAVE = 36
+
+# Tuning is quantized so a handful of kernel sets covers every recording
+TUNING_STEP = 0.1  # fraction of a CQT bin (1/360 octave, ~3 cents)
+
+
+class CQTKernels:
+    """
+    Frequency-domain constant-Q filter bank for one (sr, hop, bins, tuning)
+    configuration, built the way librosa.cqt builds it on every call:
+    one sparse FFT basis per octave, applied to a signal halved in rate for
+    each lower octave. Building it is the expensive part of a CQT; applying
+    it is a few STFTs and sparse products, so one instance serves every track
+    with the same configuration.
+    """
+
+    def __init__(self, sr: int, hop_length: int, n_bins: int = N_OCTAVES * BINS_PER_OCTAVE,
+                 bins_per_octave: int = BINS_PER_OCTAVE, tuning: float = 0.0, sparsity: float = 0.01,
+                 _bases=None):
+        self.sr = sr
+        self.hop_length = hop_length
+        self.n_bins = n_bins
+        self.bins_per_octave = bins_per_octave
+        self.tuning = tuning
+        self.n_octaves = int(np.ceil(n_bins / bins_per_octave))
+        # Each lower octave halves the rate and the hop; the bases assume sr / 2**octave
+        if hop_length <= 0 or hop_length % 2 ** (self.n_octaves - 1):
+            raise librosa.util.exceptions.ParameterError(
+                f"hop_length={hop_length} must be a positive integer multiple of "
+                f"2^{self.n_octaves - 1} for a {self.n_octaves}-octave CQT")
+
+        fmin = librosa.note_to_hz("C1") * 2.0 ** (tuning / bins_per_octave)
+        self.freqs = librosa.cqt_frequencies(n_bins=n_bins, fmin=fmin, bins_per_octave=bins_per_octave)
+        # Equal-tempered bins: the same relative bandwidth everywhere
+        step = 2.0 ** (2.0 / bins_per_octave)
+        self.alpha = np.full(n_bins, (step - 1) / (step + 1))
+        _, cutoff = librosa.filters.wavelet_lengths(freqs=self.freqs, sr=sr, alpha=self.alpha)
+
+        # Early downsampling while the top filter stays below Nyquist and the hop stays whole
+        twos = (hop_length & -hop_length).bit_length() - 1
+        self.early = max(0, min(int(np.ceil(np.log2(sr / 2.0 / cutoff)) - 1) - 1,
+                                twos - self.n_octaves + 1))
+        self.lengths, _ = librosa.filters.wavelet_lengths(freqs=self.freqs, sr=sr / 2 ** self.early,
+                                                          alpha=self.alpha)
+
+        self.chroma_map = librosa.filters.cq_to_chroma(n_bins, bins_per_octave=bins_per_octave)
+        self.bases = _bases if _bases is not None else self._build(sparsity)
+
+    def _build(self, sparsity):
+        """[(sparse basis (bins, n_fft//2+1), n_fft), ...], top octave first."""
+        bases = []
+        my_sr = self.sr / 2 ** self.early
+        n = self.bins_per_octave
+        for i in range(self.n_octaves):
+            sl = slice(-n, None) if i == 0 else slice(-n * (i + 1), -n * i)
+            basis, lengths = librosa.filters.wavelet(freqs=self.freqs[sl], sr=my_sr, alpha=self.alpha[sl],
+                                                     norm=1, pad_fft=True)
+            n_fft = basis.shape[1]
+            basis *= lengths[:, None] / float(n_fft)
+            fft_basis = np.fft.fft(basis, n=n_fft, axis=1)[:, :n_fft // 2 + 1]
+            fft_basis = librosa.util.sparsify_rows(fft_basis, quantile=sparsity, dtype=np.complex64)
+            fft_basis *= np.sqrt(self.sr / 2 ** self.early / my_sr)
+            bases.append((scipy.sparse.csr_matrix(fft_basis), n_fft))
+            my_sr /= 2.0
+        return bases
+
+    # ----------------- APPLYING -----------------
+
+    def magnitude(self, y):
+        """|CQT| of mono `y` (n_bins, frames), matching librosa.cqt with these settings."""
+        hop = self.hop_length
+        if self.early:
+            y = librosa.resample(y, orig_sr=2 ** self.early, target_sr=1, res_type="soxr_hq", scale=True)
+            hop //= 2 ** self.early
+
+        responses = []
+        for i, (basis, n_fft) in enumerate(self.bases):
+            D = librosa.stft(y, n_fft=n_fft, hop_length=hop, window="ones", pad_mode="constant")
+            responses.append(basis.dot(D))
+            if i + 1 < len(self.bases):
+                hop //= 2
+                y = librosa.resample(y, orig_sr=2, target_sr=1, res_type="soxr_hq", scale=True)
+
+        n_frames = min(r.shape[1] for r in responses)
+        C = np.empty((self.n_bins, n_frames), dtype=np.float32)
+        end = self.n_bins
+        for r in responses:
+            take = min(end, r.shape[0])
+            C[end - take:end] = np.abs(r[-take:, :n_frames])
+            end -= take
+        C /= np.sqrt(self.lengths)[:, None].astype(np.float32)
+        return C
+
+    def chroma(self, y):
+        """Max-normalized chroma (12, frames), as librosa.feature.chroma_cqt."""
+        chroma = self.chroma_map @ self.magnitude(y)
+        return librosa.util.normalize(chroma, norm=np.inf, axis=0)
+
+    # ----------------- PERSISTENCE -----------------
+
+    def save(self, path: str):
+        arrays = {}
+        for i, (basis, n_fft) in enumerate(self.bases):
+            arrays[f"data{i}"] = basis.data
+            arrays[f"indices{i}"] = basis.indices
+            arrays[f"indptr{i}"] = basis.indptr
+            arrays[f"shape{i}"] = np.array(basis.shape)
+            arrays[f"nfft{i}"] = np.array(n_fft)
+        tmp = path + ".partial.npz"
+        np.savez(tmp, **arrays)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str, sr, hop_length, n_bins, bins_per_octave, tuning):
+        bases = []
+        with np.load(path) as arrays:
+            i = 0
+            while f"data{i}" in arrays:
+                basis = scipy.sparse.csr_matrix(
+                    (arrays[f"data{i}"], arrays[f"indices{i}"], arrays[f"indptr{i}"]),
+                    shape=tuple(arrays[f"shape{i}"]))
+                bases.append((basis, int(arrays[f"nfft{i}"])))
+                i += 1
+        return cls(sr, hop_length, n_bins, bins_per_octave, tuning, _bases=bases)
+
+
+class KernelCache:
+    """
+    CQTKernels by (sr, hop, bins, bins per octave, quantized tuning): built
+    once per process, and (with `disk_dir`) loaded from disk in later
+    sessions and in worker processes. `last_setup` holds the seconds the most
+    recent lookup took (build, load or hit), so per-file setup cost can be
+    reported separately from the transform itself.
+    """
+
+    def __init__(self, disk_dir: str | None = None):
+        self.disk_dir = disk_dir
+        self.kernels = {}
+        self.lock = threading.Lock()
+        self.last_setup = 0.0
+        self.last_source = None  # "memory", "disk" or "built"
+
+    @staticmethod
+    def quantize_tuning(tuning: float) -> float:
+        return round(round(tuning / TUNING_STEP) * TUNING_STEP, 3)
+
+    def get(self, sr: int, hop_length: int, n_bins: int = N_OCTAVES * BINS_PER_OCTAVE,
+            bins_per_octave: int = BINS_PER_OCTAVE, tuning: float = 0.0) -> CQTKernels:
+        t0 = time.perf_counter()
+        tuning = self.quantize_tuning(tuning)
+        key = (int(sr), int(hop_length), int(n_bins), int(bins_per_octave), tuning)
+        with self.lock:
+            kernels = self.kernels.get(key)
+            source = "memory"
+            if kernels is None:
+                kernels, source = self._load_or_build(key)
+                self.kernels[key] = kernels
+            self.last_setup = time.perf_counter() - t0
+            self.last_source = source
+        return kernels
+
+    def _path(self, key) -> str:
+        sr, hop, n_bins, bpo, tuning = key
+        return os.path.join(self.disk_dir, f"cqt-v{KERNEL_VERSION}-{sr}-{hop}-{n_bins}-{bpo}-{tuning:+.3f}.npz")
+
+    def _load_or_build(self, key):
+        if self.disk_dir:
+            path = self._path(key)
+            if os.path.exists(path):
+                try:
+                    return CQTKernels.load(path, *key), "disk"
+                except Exception as e:
+                    print(f"CQT kernels unreadable, rebuilding: {e}")
+        kernels = CQTKernels(*key)
+        if self.disk_dir:
+            try:
+                kernels.save(self._path(key))
+            except Exception as e:
+                print(f"Could not save CQT kernels: {e}")
+        return kernels, "built"
+
+
+_cache = None
+
+
+def get_kernel_cache() -> KernelCache:
+    """Shared per-process cache, persisted in the user cache folder."""
+    global _cache
+    if _cache is None:
+        _cache = KernelCache(disk_dir=user_cache_dir("cqt"))
+    return _cache
+
+
+def estimate_tuning(y, sr: int) -> float:
+    """Deviation from A440 in fractions of a CQT bin (per-file, before kernel lookup)."""
+    return float(librosa.estimate_tuning(y=y, sr=sr, bins_per_octave=BINS_PER_OCTAVE))
+
+
+def chroma_cqt(y, sr: int, hop_length: int, tuning: float | None = None, cache: KernelCache | None = None):
+    """
+    Drop-in for librosa.feature.chroma_cqt(y=y, sr=sr, hop_length=hop_length)
+    that reuses cached kernels. Pass `tuning` when it is already known (e.g.
+    for chunks of one track, which must share the track's tuning).
+    """
+    if tuning is None:
+        tuning = estimate_tuning(y, sr)
+    kernels = (cache or get_kernel_cache()).get(sr, hop_length, tuning=tuning)
+    return kernels.chroma(y)
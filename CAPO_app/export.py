@@ -0,0 +1,259 @@
+# CAPO_app/export.py
+
+import os
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import soundfile as sf
+import soxr
+
+from .audio_engine import AnalysisCancelled
+
+EXPORT_FORMATS = {".wav": "PCM_16", ".flac": "PCM_16", ".ogg": "VORBIS"}
+EXPORT_FILTER = "WAV audio (*.wav);;FLAC audio (*.flac);;Ogg Vorbis (*.ogg)"
+
+BLOCK_FRAMES = 1 << 16  # read / write granularity (~1.5 s at 44.1 kHz)
+
+
+class StreamingStretcher:
+    """
+    Phase-vocoder time stretch over a stream of blocks, for any number of
+    channels at once. Output frames are overlap-added every `hop` samples
+    while the analysis position advances by `rate * hop`; the phase of each
+    bin is carried from frame to frame (and so from block to block), which
+    is what makes block boundaries inaudible. Holds one FFT window of input
+    and one of output, whatever the track length.
+
+    The classic vocoder of librosa.effects.time_stretch (Hann window,
+    n_fft / 4 hop), except that each output frame takes the frame pair at
+    the rounded analysis position instead of interpolating magnitudes, and
+    there is no whole-track STFT.
+    """
+
+    def __init__(self, channels: int, rate: float, n_fft: int = 2048):
+        self.channels = channels
+        self.rate = rate
+        self.n_fft = n_fft
+        self.hop = n_fft // 4
+        self.window = np.hanning(n_fft + 1)[:-1].astype(np.float32)
+        # Periodic Hann^2 at 75 % overlap sums to 1.5
+        self.gain = np.float32(1.0 / 1.5)
+
+        # Centered frames, as librosa.stft(center=True)
+        self.buf = np.zeros((channels, n_fft // 2), dtype=np.float32)
+        self.pos = 0.0  # analysis position inside buf
+        self.ola = np.zeros((channels, n_fft), dtype=np.float32)
+        self.phase = None
+        self.trim = n_fft // 2  # leading output samples that precede time 0
+        self.n_in = 0
+        self.n_out = 0
+
+    def process(self, block):
+        """block: float32 (channels, frames). Returns the output ready so far."""
+        self.n_in += block.shape[1]
+        self.buf = np.concatenate([self.buf, block], axis=1)
+        return self._run()
+
+    def flush(self):
+        """Remaining output, trimmed to the stretched length of everything pushed."""
+        self.buf = np.concatenate([self.buf, np.zeros((self.channels, self.n_fft + self.hop), np.float32)],
+                                  axis=1)
+        out = self._run()
+        expected = int(round(self.n_in / self.rate))
+        keep = max(0, expected - (self.n_out - out.shape[1]))
+        return out[:, :keep]
+
+    def _run(self):
+        n, hop = self.n_fft, self.hop
+        outputs = []
+        while int(self.pos) + hop + n <= self.buf.shape[1]:
+            p = int(self.pos)
+            first = np.fft.rfft(self.buf[:, p:p + n] * self.window)
+            second = np.fft.rfft(self.buf[:, p + hop:p + hop + n] * self.window)
+            if self.phase is None:
+                self.phase = np.angle(first)
+            frame = np.fft.irfft(np.abs(first) * np.exp(1j * self.phase), n=n)
+            # Advance each bin by its measured phase change over one hop
+            self.phase = np.remainder(self.phase + np.angle(second) - np.angle(first), 2 * np.pi)
+
+            self.ola[:, :n - hop] = self.ola[:, hop:]
+            self.ola[:, n - hop:] = 0.0
+            self.ola += frame * self.window
+            ready = self.ola[:, :hop] * self.gain
+            if self.trim:
+                cut = min(self.trim, hop)
+                ready = ready[:, cut:]
+                self.trim -= cut
+            outputs.append(ready)
+
+            self.pos += self.rate * hop
+            drop = int(self.pos)
+            self.buf = self.buf[:, drop:]
+            self.pos -= drop
+
+        out = np.concatenate(outputs, axis=1) if outputs else np.zeros((self.channels, 0), np.float32)
+        self.n_out += out.shape[1]
+        return out
+
+
+class StreamingShifter:
+    """
+    Tempo change and transposition in one pass: stretch by
+    rate / 2**(semitones / 12), then resample by 2**(semitones / 12) with a
+    soxr stream (filter state kept across blocks). Passes audio through
+    untouched at the original key and tempo.
+    """
+
+    def __init__(self, sr: int, channels: int, semitones: int = 0, rate: float = 1.0):
+        ratio = 2.0 ** (semitones / 12.0)
+        self.stretcher = None
+        self.resampler = None
+        if rate != 1.0 or semitones:
+            self.stretcher = StreamingStretcher(channels, rate / ratio)
+        if semitones:
+            self.resampler = soxr.ResampleStream(sr * ratio, sr, channels, dtype="float32", quality="HQ")
+
+    def process(self, block):
+        if self.stretcher is not None:
+            block = self.stretcher.process(block)
+        return self._resample(block, last=False)
+
+    def flush(self):
+        if self.stretcher is None:
+            return None
+        return self._resample(self.stretcher.flush(), last=True)
+
+    def _resample(self, block, last: bool):
+        if self.resampler is None:
+            return block
+        # soxr works on (frames, channels)
+        return self.resampler.resample_chunk(np.ascontiguousarray(block.T), last=last).T
+
+
+# ----------------- COUNT-IN -----------------
+
+def count_in_clicks(sr: int, channels: int, bpm: float, beats: int):
+    """`beats` clicks at `bpm` (first one accented), as float32 (channels, frames)."""
+    period = int(round(60.0 / bpm * sr))
+    out = np.zeros((channels, period * beats), dtype=np.float32)
+    t = np.arange(int(0.03 * sr)) / sr
+    envelope = np.exp(-t / 0.006)
+    for beat in range(beats):
+        freq, level = (1500.0, 0.6) if beat == 0 else (1000.0, 0.4)
+        click = (level * envelope * np.sin(2 * np.pi * freq * t)).astype(np.float32)
+        out[:, beat * period:beat * period + len(click)] += click
+    return out
+
+
+# ----------------- EXPORT -----------------
+
+def source_blocks(f, start: int, end: int, repeats: int, block_frames: int, fade: int):
+    """
+    (channels, frames) blocks of frames [start, end) of an open SoundFile,
+    `repeats` times over. With a loop, each pass is faded in and out over
+    `fade` frames so the jump back to A doesn't click.
+    """
+    buf = np.empty((block_frames, f.channels), dtype=np.float32)
+    length = end - start
+    for _ in range(repeats):
+        f.seek(start)
+        pos = start
+        while pos < end:
+            want = min(block_frames, end - pos)
+            n = len(f.read(frames=want, dtype="float32", out=buf[:want]))
+            if n == 0:
+                break
+            block = buf[:n].T.copy()
+            if fade and (pos - start < fade or pos + n > end - fade):
+                rel = np.arange(pos - start, pos - start + n)
+                block *= np.minimum(1.0, np.minimum(rel, length - 1 - rel) / fade).astype(np.float32)
+            pos += n
+            yield block
+
+
+def export_practice(source_path: str, out_path: str, semitones: int = 0, rate: float = 1.0,
+                    loop=None, repeats: int = 1, count_in: int = 0, bpm: float | None = None,
+                    block_frames: int = BLOCK_FRAMES, cancel_event=None) -> bool:
+    """
+    Write a practice version of `source_path` to `out_path` (format from the
+    extension): transposed by `semitones`, at `rate` times the tempo,
+    optionally only the `loop` region (start_sec, end_sec) played `repeats`
+    times, after `count_in` clicks at the (adjusted) tempo `bpm`.
+
+    Audio is read, processed and written one block at a time, so memory use
+    doesn't grow with the track length. Writes to a temp name and renames on
+    success. Raises AnalysisCancelled when `cancel_event` is set; returns
+    False on errors.
+    """
+    tmp = out_path + ".partial" + os.path.splitext(out_path)[1]
+    try:
+        with sf.SoundFile(source_path) as src:
+            sr, channels = src.samplerate, src.channels
+            start, end = 0, src.frames
+            fade = 0
+            if loop is not None:
+                start = max(0, min(src.frames, int(round(loop[0] * sr))))
+                end = max(start, min(src.frames, int(round(loop[1] * sr))))
+                fade = min(int(0.005 * sr), (end - start) // 2)
+            else:
+                repeats = 1
+
+            ext = os.path.splitext(out_path)[1].lower()
+            subtype = EXPORT_FORMATS.get(ext, "PCM_16")
+            shifter = StreamingShifter(sr, channels, semitones, rate)
+            with sf.SoundFile(tmp, "w", samplerate=sr, channels=channels, subtype=subtype) as dst:
+                if count_in and bpm:
+                    dst.write(count_in_clicks(sr, channels, bpm * rate, count_in).T)
+                for block in source_blocks(src, start, end, repeats, block_frames, fade):
+                    if cancel_event is not None and cancel_event.is_set():
+                        raise AnalysisCancelled()
+                    out = shifter.process(block)
+                    if out.shape[1]:
+                        dst.write(np.clip(out.T, -1.0, 1.0))
+                out = shifter.flush()
+                if out is not None and out.shape[1]:
+                    dst.write(np.clip(out.T, -1.0, 1.0))
+        os.replace(tmp, out_path)
+        return True
+    except AnalysisCancelled:
+        _remove(tmp)
+        raise
+    except Exception as e:
+        print(f"Error exporting {out_path}: {e}")
+        _remove(tmp)
+        return False
+
+
+def _remove(path: str):
+    if os.path.exists(path):
+        try:
+            os.remove(path)
+        except OSError as e:
+            print(f"Could not remove partial export: {e}")
+
+
+# ----------------- BATCH EXPORT -----------------
+
+def _export_task(kwargs):
+    t0 = time.perf_counter()
+    ok = export_practice(**kwargs)
+    return kwargs["out_path"], ok, time.perf_counter() - t0
+
+
+def export_batch(tasks, workers: int | None = None):
+    """
+    Run many exports (each a dict of export_practice arguments) across a
+    process pool; each worker holds only its own blocks in memory.
+    Returns a list of (out_path, ok, seconds) in task order.
+    """
+    tasks = list(tasks)
+    if not tasks:
+        return []
+    workers = workers or max(1, min(len(tasks), (os.cpu_count() or 2) - 1))
+    if workers == 1:
+        return [_export_task(task) for task in tasks]
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+        return list(pool.map(_export_task, tasks))
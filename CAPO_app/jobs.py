@@ -0,0 +1,344 @@
+# CAPO_app/jobs.py
+
+import os
+import threading
+from PyQt6.QtCore import QObject, QRunnable, QThread, QThreadPool, pyqtSignal
+
+from .audio_engine import AudioEngine, AnalysisCancelled
+from .chord_chart import ChordChart
+from .export import export_practice
+from .pcm_cache import file_fingerprint
+from .waveform_view import compute_peaks
+
+
+# QThreadPool runs higher numbers first
+PRIORITY_INTERACTIVE = 10
+PRIORITY_BACKGROUND = 0
+
+
+class JobSignals(QObject):
+    # QRunnable is not a QObject, so signals live on this helper.
+    # It is created on the GUI thread, so emits from workers are queued there.
+    finished = pyqtSignal(object)
+    provisional = pyqtSignal(object)  # AnalysisJob: coarse results ready, full pass running
+
+
+class Job(QRunnable):
+    """
+    Base class for pool work. Subclasses implement execute(); long stages
+    should call check_cancelled() (or pass cancel_event to an AudioEngine).
+    """
+
+    def __init__(self, priority: int = PRIORITY_BACKGROUND):
+        super().__init__()
+        self.setAutoDelete(False)  # the scheduler owns the Python object
+        self.priority = priority
+        self.group = None
+        self.cancel_event = threading.Event()
+        self.signals = JobSignals()
+        self.result = None
+        self.error = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def check_cancelled(self):
+        if self.cancel_event.is_set():
+            raise AnalysisCancelled()
+
+    def run(self):
+        # Background work yields the CPU to playback and interactive jobs
+        thread = QThread.currentThread()
+        if self.priority < PRIORITY_INTERACTIVE:
+            thread.setPriority(QThread.Priority.LowPriority)
+        try:
+            if not self.cancelled:
+                self.result = self.execute()
+        except AnalysisCancelled:
+            print(f"Job cancelled: {self}")
+        except Exception as e:
+            print(f"Job failed: {e}")
+            self.error = e
+        finally:
+            thread.setPriority(QThread.Priority.NormalPriority)
+            self.signals.finished.emit(self)
+
+    def execute(self):
+        raise NotImplementedError
+
+
+class AnalysisJob(Job):
+    """
+    Load + analyze one file on its own AudioEngine, so concurrent jobs never
+    share mutable engine state. The GUI adopts job.engine when it finishes,
+    or already at signals.provisional: the full pass then runs on
+    `analysis_engine`, a fork_analysis() twin, and the GUI takes its results
+    back with engine.adopt_analysis() once the job is done.
+    """
+
+    def __init__(self, file_path: str, pcm_cache=None, priority: int = PRIORITY_INTERACTIVE,
+                 analysis_params=None, chart_store=None, workspace=None, progressive: bool = True):
+        super().__init__(priority)
+        self.file_path = file_path
+        self.engine = AudioEngine(pcm_cache=pcm_cache, cancel_event=self.cancel_event,
+                                  workspace=workspace)
+        if analysis_params:
+            self.engine.set_analysis_params(**analysis_params)
+        self.analysis_engine = self.engine  # a twin once the GUI has self.engine
+        self.chart_store = chart_store  # saved charts skip tempo/chord analysis
+        self.fingerprint = None
+        self.vocabulary = self.engine.pipeline.params["vocabulary"]
+        self.from_chart = False
+        self.progressive = progressive  # coarse pass first, announced via signals.provisional
+        self.provisional = False        # detected_* currently hold coarse results
+        self.success = False
+        self.detected_bpm = 0.0
+        self.detected_chords = []  # (start_sec, end_sec, name) segments
+        self.detected_key = None
+        self.key_segments = []     # (start_sec, end_sec, key) local keys
+        self.beat_times = []
+        self.peaks = None  # (times, values, duration) for WaveformView.plot_peaks
+
+    def __repr__(self):
+        return f"AnalysisJob({os.path.basename(self.file_path)})"
+
+    def execute(self):
+        print(f"Worker: Loading {os.path.basename(self.file_path)}...")
+        self.success = self.engine.load_track(self.file_path)
+
+        if self.success:
+            chart = None
+            if self.chart_store is not None:
+                self.fingerprint = file_fingerprint(self.file_path)
+                chart = self.chart_store.load(self.fingerprint, self.vocabulary,
+                                              self.engine.pipeline.params)
+
+            if chart is not None:
+                self.from_chart = True
+                self.detected_bpm = chart.bpm
+                self.detected_chords = chart.segments
+                self.beat_times = chart.beat_times
+                self.engine.beat_times = chart.beat_times
+                self.detected_key = chart.key
+                self.key_segments = chart.key_segments
+            else:
+                if self.progressive:
+                    self.run_coarse_pass()
+                engine = self.analysis_engine
+                print("Worker: Analyzing tempo/chords...")
+                bpm = engine.get_tempo()
+                chords = engine.get_chords()
+                beat_times = engine.get_beat_grid()
+                key = engine.get_key()
+                # Swap in the full-quality results together
+                self.detected_bpm, self.detected_chords, self.beat_times = bpm, chords, beat_times
+                self.detected_key, self.key_segments = key, engine.key_segments
+                self.provisional = False
+            if self.peaks is None:
+                self.peaks = compute_peaks(self.engine.y_stereo, self.engine.sr)
+            if chart is None and self.chart_store is not None:
+                self.chart_store.save(ChordChart(
+                    self.detected_chords, self.detected_bpm, self.beat_times, self.vocabulary,
+                    os.path.splitext(os.path.basename(self.file_path))[0], self.fingerprint,
+                    self.detected_key, self.key_segments, self.peaks),
+                    self.file_path, self.analysis_engine.pipeline.params)
+            elif chart is not None:
+                self.chart_store.index(chart, self.file_path)  # new or moved file
+
+        print("Worker: Done!")
+        return self.success
+
+    def run_coarse_pass(self):
+        """
+        Fill detected_* from the fast pass and announce them, so the GUI can
+        open the song while the full analysis continues on this thread, on a
+        twin engine: the GUI owns self.engine from here on.
+        """
+        print("Worker: Coarse pass...")
+        (self.detected_bpm, self.beat_times, self.detected_chords,
+         self.detected_key, self.key_segments) = self.engine.get_coarse_analysis()
+        self.peaks = compute_peaks(self.engine.y_stereo, self.engine.sr)
+        self.analysis_engine = self.engine.fork_analysis()
+        self.provisional = True
+        self.check_cancelled()
+        self.signals.provisional.emit(self)
+
+
+class ChordRescoreJob(Job):
+    """
+    Chord segments for another vocabulary (Beginner / Advanced) of the song
+    on screen. Runs on a fork_analysis() twin of `engine`, so the GUI's
+    engine is untouched until it adopts the result (engine.adopt_analysis).
+    Chroma and beats are reused when the engine has them, computed here
+    when it doesn't (songs opened from a saved chart). result = segments.
+    """
+
+    def __init__(self, engine, vocabulary, priority=PRIORITY_INTERACTIVE):
+        super().__init__(priority)
+        self.engine = engine
+        self.vocabulary = vocabulary
+        self.analysis_engine = engine.fork_analysis()
+        self.analysis_engine.cancel_event = self.cancel_event
+
+    def __repr__(self):
+        return f"ChordRescoreJob({self.vocabulary})"
+
+    def execute(self):
+        return self.analysis_engine.get_chords(vocabulary=self.vocabulary)
+
+
+class RegionRenderJob(Job):
+    """
+    Render an A/B loop region at a key/tempo (AudioEngine.render_region).
+    """
+
+    def __init__(self, engine, start_sec, end_sec, semitones, rate, priority=PRIORITY_INTERACTIVE):
+        super().__init__(priority)
+        self.engine = engine
+        self.start_sec = start_sec
+        self.end_sec = end_sec
+        self.semitones = semitones
+        self.rate = rate
+
+    def __repr__(self):
+        return f"RegionRenderJob({self.start_sec:.2f}-{self.end_sec:.2f})"
+
+    def execute(self):
+        return self.engine.render_region(
+            self.start_sec, self.end_sec, self.semitones, self.rate,
+            cancel_event=self.cancel_event,
+        )
+
+
+class ShiftFillJob(Job):
+    """
+    Render the remaining pitch-shift chunks in playback order from
+    `start_sec` and patch them into `path`, the shifted file the player is
+    already on (AudioEngine.fill_shifted_file). Never touches the engine's
+    temp-file bookkeeping. result = path once it is complete.
+    """
+
+    def __init__(self, engine, semitones, path, start_sec=0.0, priority=PRIORITY_BACKGROUND):
+        super().__init__(priority)
+        self.engine = engine
+        self.semitones = semitones
+        self.path = path
+        self.start_sec = start_sec
+
+    def __repr__(self):
+        return f"ShiftFillJob({self.semitones:+d})"
+
+    def execute(self):
+        if not self.engine.fill_shifted_file(self.semitones, self.path, self.start_sec, self.cancel_event):
+            raise AnalysisCancelled()
+        return self.path
+
+
+class PrerenderJob(Job):
+    """
+    Background render of one whole transposition (AudioEngine.prerender_key).
+    Runs only while `gate` is set; the GUI clears it during playback.
+    result = path, or None if over budget.
+    """
+
+    def __init__(self, engine, semitones, gate, max_bytes=None, priority=PRIORITY_BACKGROUND):
+        super().__init__(priority)
+        self.engine = engine
+        self.semitones = semitones
+        self.gate = gate
+        self.max_bytes = max_bytes
+
+    def __repr__(self):
+        return f"PrerenderJob({self.semitones:+d})"
+
+    def execute(self):
+        return self.engine.prerender_key(self.semitones, self.gate, self.cancel_event, self.max_bytes)
+
+
+class ExportJob(Job):
+    """
+    Stream one practice version to disk (export.export_practice). Reads the
+    audio file itself, so any number can queue and run side by side without
+    touching the engine. result = out_path, or None on error.
+    """
+
+    def __init__(self, source_path, out_path, semitones=0, rate=1.0, loop=None, repeats=1,
+                 count_in=0, bpm=None, priority=PRIORITY_BACKGROUND):
+        super().__init__(priority)
+        self.source_path = source_path
+        self.out_path = out_path
+        self.options = dict(semitones=semitones, rate=rate, loop=loop, repeats=repeats,
+                            count_in=count_in, bpm=bpm)
+
+    def __repr__(self):
+        return f"ExportJob({os.path.basename(self.out_path)})"
+
+    def execute(self):
+        if export_practice(self.source_path, self.out_path, cancel_event=self.cancel_event, **self.options):
+            return self.out_path
+        return None
+
+
+class JobScheduler(QObject):
+    """
+    Fixed-size worker pool with priorities and cancellation.
+
+    Jobs submitted with a `group` replace whatever is still pending or running
+    in that group (e.g. "load": opening a new song abandons the previous one),
+    unless replace=False (e.g. "prefetch", where jobs accumulate).
+    """
+    job_finished = pyqtSignal(object)
+
+    def __init__(self, max_workers: int | None = None):
+        super().__init__()
+        if max_workers is None:
+            max_workers = max(2, min(4, (os.cpu_count() or 2) - 1))
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(max_workers)
+        self.active = set()  # submitted, not yet finished (keeps jobs alive)
+
+    def submit(self, job: Job, group: str | None = None, replace: bool = True) -> Job:
+        if group is not None and replace:
+            self.cancel_group(group)
+        job.group = group
+        job.signals.finished.connect(self._on_job_finished)
+        self.active.add(job)
+        self.pool.start(job, job.priority)
+        return job
+
+    def promote(self, job: Job, priority: int = PRIORITY_INTERACTIVE):
+        """
+        Move a still-queued job to the front. Running jobs keep going as is.
+        """
+        if job.priority >= priority:
+            return
+        if self.pool.tryTake(job):
+            job.priority = priority
+            self.pool.start(job, priority)
+
+    def cancel_group(self, group: str):
+        for job in list(self.active):
+            if job.group == group:
+                self.cancel_job(job)
+
+    def cancel_job(self, job: Job):
+        job.cancel()
+        # Still queued: drop it without ever running it
+        if self.pool.tryTake(job):
+            self.active.discard(job)
+
+    def cancel_all(self):
+        for job in list(self.active):
+            self.cancel_job(job)
+
+    def _on_job_finished(self, job: Job):
+        self.active.discard(job)
+        self.job_finished.emit(job)
+
+    def shutdown(self, timeout_ms: int = 3000):
+        self.cancel_all()
+        self.pool.waitForDone(timeout_ms)
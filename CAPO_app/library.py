@@ -0,0 +1,359 @@
+# CAPO_app/library.py
+
+import os
+import re
+import glob
+import sqlite3
+import threading
+from collections import Counter
+import numpy as np
+
+from .chord_chart import ChordChart, NO_CHORD
+from .paths import user_cache_dir
+from .voicings import parse_chord, pitch_class
+
+# Bump when the schema or token encoding changes; the index is then rebuilt
+LIBRARY_VERSION = 2
+
+MAX_GRAM = 4  # progressions up to this length are a single index lookup
+
+# Chord quality -> family used in progression tokens (sevenths, sixths,
+# suspensions etc. search like the triad they decorate)
+MINOR_FAMILY = {"m", "m7", "m6"}
+DIM_FAMILY = {"dim", "dim7", "m7b5"}
+
+MAJOR_STEPS = (0, 2, 4, 5, 7, 9, 11)
+MINOR_STEPS = (0, 2, 3, 5, 7, 8, 10)
+NUMERALS = ("I", "II", "III", "IV", "V", "VI", "VII")
+ROMAN = re.compile(r"^([b#]?)(VII|VI|V|IV|III|II|I)(°|o|dim|\+|aug|7|maj7|m7)?$", re.IGNORECASE)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tracks (
+    id INTEGER PRIMARY KEY,
+    fingerprint TEXT,
+    vocabulary TEXT,
+    path TEXT,
+    title TEXT,
+    bpm REAL,
+    key TEXT,
+    key_pc INTEGER,
+    key_minor INTEGER,
+    duration REAL,
+    signature TEXT,
+    tokens BLOB,
+    token_times BLOB,
+    UNIQUE (fingerprint, vocabulary)
+);
+CREATE INDEX IF NOT EXISTS tracks_bpm ON tracks (key_minor, bpm);
+CREATE INDEX IF NOT EXISTS tracks_path ON tracks (path);
+CREATE TABLE IF NOT EXISTS segments (
+    track_id INTEGER,
+    start REAL,
+    end REAL,
+    chord TEXT
+);
+CREATE INDEX IF NOT EXISTS segments_track ON segments (track_id);
+CREATE TABLE IF NOT EXISTS ngrams (
+    gram INTEGER,
+    track_id INTEGER,
+    count INTEGER,
+    PRIMARY KEY (gram, track_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ngrams_track ON ngrams (track_id);
+"""
+
+
+# ----------------- TOKENS -----------------
+
+def parse_key(key: str | None):
+    """ "F#m" -> (6, True); None for unknown keys. """
+    if not key:
+        return None
+    minor = key.endswith("m")
+    tonic = pitch_class(key[:-1] if minor else key)
+    return None if tonic is None else (tonic, minor)
+
+
+def chord_token(name: str, tonic: int):
+    """
+    Scale-degree token for a chord relative to the key tonic: 1..36
+    (degree * 3 + family + 1), or None for N.C. and unknown symbols.
+    """
+    parsed = parse_chord(name) if name and name != NO_CHORD else None
+    if parsed is None:
+        return None
+    root, suffix, _ = parsed
+    family = 1 if suffix in MINOR_FAMILY else 2 if suffix in DIM_FAMILY else 0
+    return ((root - tonic) % 12) * 3 + family + 1
+
+
+def roman_token(numeral: str, minor: bool = False):
+    """ "V" -> token of a major chord on the fifth degree; "bVII", "vi", "ii°" ... """
+    m = ROMAN.match(numeral.strip())
+    if m is None:
+        return None
+    accidental, degree, quality = m.groups()
+    steps = MINOR_STEPS if minor else MAJOR_STEPS
+    semitones = steps[NUMERALS.index(degree.upper())] + {"b": -1, "#": 1}.get(accidental, 0)
+    quality = (quality or "").lower()
+    if quality in ("°", "o", "dim"):
+        family = 2
+    elif degree.islower() or quality == "m7":
+        family = 1
+    else:
+        family = 0
+    return (semitones % 12) * 3 + family + 1
+
+
+def pack(tokens) -> int:
+    """n-gram of up to MAX_GRAM tokens as one integer (6 bits per token)."""
+    gram = 0
+    for i, token in enumerate(tokens):
+        gram |= token << (6 * i)
+    return gram
+
+
+def token_sequence(segments, tonic: int):
+    """
+    (tokens, start times): one token per chord change. Repeats after family
+    reduction are merged; N.C. and unknown chords end a phrase (token 0), so
+    no n-gram spans them.
+    """
+    tokens, times = [], []
+    for start, _, name in segments:
+        token = chord_token(name, tonic) or 0
+        if tokens and tokens[-1] == token:
+            continue
+        tokens.append(token)
+        times.append(start)
+    return tokens, times
+
+
+def ngram_counts(tokens):
+    counts = Counter()
+    for n in range(1, MAX_GRAM + 1):
+        for i in range(len(tokens) - n + 1):
+            window = tokens[i:i + n]
+            if 0 not in window:
+                counts[pack(window)] += 1
+    return counts
+
+
+class Library:
+    """
+    Local index of analyzed songs in SQLite: BPM, key, duration and chord
+    segments per track, plus an inverted index from chord n-grams to tracks.
+
+    Chords are indexed as scale degrees relative to the track's key, so
+    "I-V-vi-IV" finds the progression in every key with a single primary-key
+    lookup (longer progressions intersect their 4-gram windows, then are
+    verified against the stored token sequence). Tracks are keyed by audio
+    fingerprint and chord vocabulary, like the saved charts (a song has a
+    Beginner and an Advanced row); upsert() replaces one track's rows in a
+    single transaction and skips tracks whose analysis hasn't changed.
+    """
+
+    def __init__(self, db_path: str | None = None):
+        self.db_path = db_path or os.path.join(user_cache_dir(), f"library-v{LIBRARY_VERSION}.sqlite")
+        self.local = threading.local()  # one connection per thread (jobs upsert, GUI searches)
+        with self.connection() as db:
+            db.executescript(SCHEMA)
+
+    def connection(self) -> sqlite3.Connection:
+        db = getattr(self.local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.db_path, timeout=10.0)
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self.local.db = db
+        return db
+
+    def close(self):
+        db = getattr(self.local, "db", None)
+        if db is not None:
+            db.close()
+            self.local.db = None
+
+    def __len__(self):
+        return self.connection().execute("SELECT COUNT(*) FROM tracks").fetchone()[0]
+
+    # ----------------- UPDATES -----------------
+
+    @staticmethod
+    def signature(chart: ChordChart) -> str:
+        return f"{chart.bpm:.2f}|{chart.key}|{len(chart.segments)}|" + ",".join(n for _, _, n in chart.segments)
+
+    def upsert(self, chart: ChordChart, path: str | None = None):
+        """
+        Add or refresh one analyzed track. Returns its id, or None if the
+        chart has no fingerprint or no usable key.
+        """
+        key = parse_key(chart.key)
+        if not chart.fingerprint or key is None:
+            return None
+        tonic, minor = key
+        signature = self.signature(chart)
+        db = self.connection()
+        row = db.execute("SELECT id, signature, path FROM tracks WHERE fingerprint = ? AND vocabulary = ?",
+                         (chart.fingerprint, chart.vocabulary)).fetchone()
+        if row is not None and row["signature"] == signature:
+            if path and path != row["path"]:
+                with db:
+                    db.execute("UPDATE tracks SET path = ? WHERE id = ?", (path, row["id"]))
+            return row["id"]
+
+        tokens, times = token_sequence(chart.segments, tonic)
+        values = (path or (row["path"] if row else None), chart.title, chart.bpm, chart.key, tonic,
+                  int(minor), chart.duration, signature,
+                  np.array(tokens, np.uint8).tobytes(), np.array(times, np.float32).tobytes())
+        try:
+            with db:
+                if row is None:
+                    track_id = db.execute(
+                        "INSERT INTO tracks (path, title, bpm, key, key_pc, key_minor, duration, signature, "
+                        "tokens, token_times, fingerprint, vocabulary) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        values + (chart.fingerprint, chart.vocabulary)).lastrowid
+                else:
+                    track_id = row["id"]
+                    db.execute(
+                        "UPDATE tracks SET path = ?, title = ?, bpm = ?, key = ?, key_pc = ?, key_minor = ?, "
+                        "duration = ?, signature = ?, tokens = ?, token_times = ? WHERE id = ?",
+                        values + (track_id,))
+                    db.execute("DELETE FROM segments WHERE track_id = ?", (track_id,))
+                    db.execute("DELETE FROM ngrams WHERE track_id = ?", (track_id,))
+                db.executemany("INSERT INTO segments VALUES (?, ?, ?, ?)",
+                               [(track_id, s, e, n) for s, e, n in chart.segments])
+                db.executemany("INSERT INTO ngrams VALUES (?, ?, ?)",
+                               [(g, track_id, c) for g, c in ngram_counts(tokens).items()])
+        except sqlite3.Error as e:
+            print(f"Error updating library: {e}")
+            return None
+        return track_id
+
+    def remove(self, fingerprint: str, vocabulary: str | None = None):
+        """Drop a track's rows for one vocabulary, or for all of them."""
+        db = self.connection()
+        sql, args = "SELECT id FROM tracks WHERE fingerprint = ?", [fingerprint]
+        if vocabulary is not None:
+            sql += " AND vocabulary = ?"
+            args.append(vocabulary)
+        ids = [(row["id"],) for row in db.execute(sql, args)]
+        if not ids:
+            return
+        with db:
+            for table in ("segments", "ngrams"):
+                db.executemany(f"DELETE FROM {table} WHERE track_id = ?", ids)
+            db.executemany("DELETE FROM tracks WHERE id = ?", ids)
+
+    def import_charts(self, cache_dir: str) -> int:
+        """Index every chart already saved by ChordChartStore. Returns the number indexed."""
+        count = 0
+        for sidecar in glob.glob(os.path.join(cache_dir, "*.json")):
+            chart = ChordChart.load(sidecar[:-len(".json")])
+            if chart is not None and self.upsert(chart) is not None:
+                count += 1
+        return count
+
+    # ----------------- QUERIES -----------------
+
+    def parse_progression(self, progression, key: str | None = None):
+        """
+        Tokens for a progression given as Roman numerals ("I V vi IV",
+        "i-VI-III-VII") or, with a key, as chord names ("G D Em C").
+        Returns (tokens, minor mode).
+        """
+        if isinstance(progression, str):
+            progression = [p for p in re.split(r"[\s,\-–]+", progression) if p]
+        parsed_key = parse_key(key)
+        if parsed_key is not None:
+            minor = parsed_key[1]
+        else:
+            # Without a key, a lowercase tonic numeral asks for minor-key songs
+            minor = any(re.fullmatch(r"i(7|m7)?", p) for p in progression)
+
+        tokens = []
+        for item in progression:
+            token = roman_token(item, minor)
+            if token is None and parsed_key is not None:
+                token = chord_token(item, parsed_key[0])
+            if token is None:
+                raise ValueError(f"Not a chord or Roman numeral: {item!r}")
+            tokens.append(token)
+        return tokens, minor
+
+    def search(self, progression, key: str | None = None, bpm: float | None = None,
+               bpm_tol: float = 6.0, limit: int = 50, vocabulary: str | None = "beginner"):
+        """
+        Tracks containing `progression`, optionally in `key` and within
+        `bpm_tol` of `bpm` (closest tempo first). Only charts of `vocabulary`
+        are searched (None: every vocabulary, so a song can match twice).
+        Each result is a dict with the track fields plus `match_time`, where
+        the progression first starts.
+        """
+        tokens, minor = self.parse_progression(progression, key)
+        if not tokens:
+            return []
+        grams = sorted({pack(tokens[i:i + MAX_GRAM])
+                        for i in range(max(1, len(tokens) - MAX_GRAM + 1))})
+
+        sql = [f"SELECT t.* FROM tracks t JOIN (SELECT track_id FROM ngrams WHERE gram IN "
+               f"({','.join('?' * len(grams))}) GROUP BY track_id HAVING COUNT(*) = ?) m "
+               f"ON m.track_id = t.id WHERE t.key_minor = ?"]
+        args = grams + [len(grams), int(minor)]
+        if vocabulary is not None:
+            sql.append("AND t.vocabulary = ?")
+            args.append(vocabulary)
+        parsed_key = parse_key(key)
+        if parsed_key is not None:
+            sql.append("AND t.key_pc = ?")
+            args.append(parsed_key[0])
+        if bpm is not None:
+            sql.append("AND t.bpm BETWEEN ? AND ? ORDER BY ABS(t.bpm - ?)")
+            args += [bpm - bpm_tol, bpm + bpm_tol, bpm]
+        if len(tokens) <= MAX_GRAM:
+            sql.append("LIMIT ?")
+            args.append(limit)
+
+        results = []
+        for row in self.connection().execute(" ".join(sql), args):
+            match = self._find(row, tokens)
+            if match is None:
+                continue  # 4-gram windows present, but not in sequence
+            result = {k: row[k] for k in ("fingerprint", "vocabulary", "path", "title", "bpm", "key", "duration")}
+            result["match_time"] = match
+            results.append(result)
+            if len(results) >= limit:
+                break
+        return results
+
+    @staticmethod
+    def _find(row, tokens):
+        seq = np.frombuffer(row["tokens"], np.uint8)
+        times = np.frombuffer(row["token_times"], np.float32)
+        n = len(tokens)
+        if len(seq) < n:
+            return None
+        windows = np.lib.stride_tricks.sliding_window_view(seq, n)
+        hits = np.flatnonzero((windows == np.array(tokens, np.uint8)).all(axis=1))
+        return float(times[hits[0]]) if len(hits) else None
+
+    def segments(self, fingerprint: str, vocabulary: str = "beginner"):
+        rows = self.connection().execute(
+            "SELECT s.start, s.end, s.chord FROM segments s JOIN tracks t ON t.id = s.track_id "
+            "WHERE t.fingerprint = ? AND t.vocabulary = ? ORDER BY s.start", (fingerprint, vocabulary))
+        return [(r[0], r[1], r[2]) for r in rows]
+
+
+_library = None
+
+
+def get_library() -> Library | None:
+    """Shared library index in the user cache (None if it can't be opened)."""
+    global _library
+    if _library is None:
+        try:
+            _library = Library()
+        except sqlite3.Error as e:
+            print(f"Could not open library index: {e}")
+    return _library
@@ -0,0 +1,411 @@
+# CAPO_app/live_input.py
+
+import threading
+import time
+from collections import deque
+
+import numpy as np
+import librosa
+from scipy.signal import butter, sosfilt
+from PyQt6.QtCore import QObject, pyqtSignal
+
+from .audio_engine import chord_templates, decode_audio
+
+LIVE_SR = 22050
+
+
+class RingBuffer:
+    """
+    Fixed-size mono sample history. Writes overwrite the oldest samples;
+    `total` counts every sample ever written, so readers can tell how far
+    behind they are.
+    """
+
+    def __init__(self, capacity: int):
+        self.data = np.zeros(capacity, dtype=np.float32)
+        self.capacity = capacity
+        self.total = 0
+        self.lock = threading.Lock()
+
+    def write(self, samples):
+        samples = np.asarray(samples, dtype=np.float32)[-self.capacity:]
+        n = len(samples)
+        with self.lock:
+            pos = self.total % self.capacity
+            first = min(n, self.capacity - pos)
+            self.data[pos:pos + first] = samples[:first]
+            self.data[:n - first] = samples[first:]
+            self.total += n
+
+    def latest(self, n: int, end: int | None = None):
+        """The `n` samples ending at absolute sample `end` (default: newest)."""
+        with self.lock:
+            end = self.total if end is None else end
+            start = end - n
+            if start < max(0, self.total - self.capacity):
+                start = max(0, self.total - self.capacity)
+            idx = np.arange(start, end) % self.capacity
+            out = self.data[idx]
+        if len(out) < n:
+            out = np.concatenate([np.zeros(n - len(out), dtype=np.float32), out])
+        return out
+
+
+# ----------------- DETECTOR -----------------
+
+class LiveChordDetector:
+    """
+    Streaming chord detection over a sliding window.
+
+    Every `hop` samples the newest `window` samples are windowed, FFT'd and
+    folded to chroma with a precomputed filterbank (no CQT: one rfft and one
+    small matrix product). Template scores are smoothed incrementally, and a
+    new chord must win by `margin` for `hold` consecutive hops before it is
+    reported, so the display doesn't flicker between neighbours.
+
+    At the defaults (371 ms window, 46 ms hop at 22.05 kHz) one hop costs well
+    under a millisecond; `stats()` reports the measured per-hop times against
+    `budget_ms`. If delivery gets ahead of processing, stale hops are skipped
+    rather than queued, so latency never builds up.
+
+    push() runs on the source's thread while the GUI may call
+    set_vocabulary() / reset(); `lock` keeps names, templates and scores
+    consistent across a hop.
+    """
+
+    def __init__(self, sr: int = LIVE_SR, window: int = 8192, hop: int = 1024,
+                 vocabulary: str = "beginner", smoothing: float = 0.6, margin: float = 0.02,
+                 hold: int = 2, silence_rms: float = 0.005, budget_ms: float = 10.0):
+        self.sr = sr
+        self.window = window
+        self.hop = hop
+        self.smoothing = smoothing
+        self.margin = margin
+        self.hold = hold
+        self.silence_rms = silence_rms
+        self.budget_ms = budget_ms
+
+        self.buffer = RingBuffer(window + 8 * hop)
+        self.taper = np.hanning(window).astype(np.float32)
+        fb = librosa.filters.chroma(sr=sr, n_fft=window)
+        # Drop the rumble below ~55 Hz (handling noise, hum)
+        fb[:, :int(55 * window / sr)] = 0.0
+        self.filterbank = fb.astype(np.float32)
+        self.lock = threading.Lock()
+        self.set_vocabulary(vocabulary)
+
+        self.processed = 0  # absolute sample index of the last processed hop end
+        self.timings = deque(maxlen=512)
+        self.skipped = 0
+
+    def set_vocabulary(self, vocabulary: str):
+        templates, names = chord_templates(vocabulary)
+        templates = templates.astype(np.float32)
+        with self.lock:
+            self.names, self.templates = names, templates
+            self._reset()
+
+    def reset(self):
+        with self.lock:
+            self._reset()
+
+    def _reset(self):
+        self.scores = np.zeros(len(self.names), dtype=np.float32)
+        self.current = None
+        self.candidate = None
+        self.candidate_hops = 0
+
+    def push(self, samples):
+        """
+        Append mono samples; runs every complete hop (newest first if behind).
+        Returns the chord name if it changed during this call, else None.
+        """
+        self.buffer.write(samples)
+        pending = (self.buffer.total - self.processed) // self.hop
+        if pending <= 0:
+            return None
+        if pending > 2:
+            # Behind: jump to the newest two hops instead of catching up
+            self.skipped += pending - 2
+            self.processed += (pending - 2) * self.hop
+            pending = 2
+        changed = None
+        with self.lock:
+            for _ in range(pending):
+                self.processed += self.hop
+                name = self.process_hop(self.processed)
+                if name is not None:
+                    changed = name
+        return changed
+
+    def chroma_at(self, end: int):
+        frame = self.buffer.latest(self.window, end)
+        if np.sqrt(np.mean(frame * frame)) < self.silence_rms:
+            return None
+        spectrum = np.abs(np.fft.rfft(frame * self.taper))
+        chroma = self.filterbank @ spectrum
+        return chroma / max(float(np.linalg.norm(chroma)), 1e-9)
+
+    def process_hop(self, end: int):
+        t0 = time.perf_counter()
+        chroma = self.chroma_at(end)
+        changed = None
+        if chroma is None:
+            self.scores *= self.smoothing
+            if self.current != "N.C.":
+                self.current, self.candidate, self.candidate_hops = "N.C.", None, 0
+                changed = self.current
+        else:
+            a = self.smoothing
+            self.scores = a * self.scores + (1.0 - a) * (self.templates @ chroma)
+            best = int(np.argmax(self.scores))
+            name = self.names[best]
+            if name != self.current:
+                current_score = self.scores[self.names.index(self.current)] if self.current in self.names else -1.0
+                if self.scores[best] - current_score >= self.margin:
+                    self.candidate_hops = self.candidate_hops + 1 if name == self.candidate else 1
+                    self.candidate = name
+                    if self.candidate_hops >= self.hold:
+                        self.current, self.candidate, self.candidate_hops = name, None, 0
+                        changed = name
+            else:
+                self.candidate, self.candidate_hops = None, 0
+        self.timings.append(time.perf_counter() - t0)
+        return changed
+
+    def latency(self) -> float:
+        """Seconds from a change in the input to its detection, at the earliest."""
+        return (self.window / 2 + self.hop * self.hold) / self.sr
+
+    def stats(self):
+        """(mean ms, worst ms, hops over budget, hops skipped) over recent hops."""
+        if not self.timings:
+            return 0.0, 0.0, 0, self.skipped
+        ms = np.array(self.timings) * 1000.0
+        return float(ms.mean()), float(ms.max()), int((ms > self.budget_ms).sum()), self.skipped
+
+
+# ----------------- SOURCES -----------------
+
+class StreamResampler:
+    """
+    Block-by-block sample rate conversion for live input: a low-pass
+    (when downsampling) and linear interpolation, both carrying state
+    across blocks so block edges don't click.
+    """
+
+    def __init__(self, orig_sr: int, target_sr: int):
+        self.step = orig_sr / target_sr  # input samples per output sample
+        self.sos = butter(8, 0.45 * target_sr, fs=orig_sr, output="sos") if orig_sr > target_sr else None
+        self.zi = np.zeros((self.sos.shape[0], 2)) if self.sos is not None else None
+        self.pos = 0.0   # next output position; index 0 is the previous block's last sample
+        self.last = 0.0
+
+    def process(self, x):
+        x = np.asarray(x, dtype=np.float64)
+        if len(x) == 0:
+            return np.zeros(0, dtype=np.float32)
+        if self.sos is not None:
+            x, self.zi = sosfilt(self.sos, x, zi=self.zi)
+        ext = np.concatenate([[self.last], x])
+        n = int((len(x) - self.pos) // self.step) + 1 if self.pos <= len(x) else 0
+        t = self.pos + self.step * np.arange(n)
+        i = np.minimum(t.astype(int), len(x) - 1)
+        frac = t - i
+        out = ext[i] * (1.0 - frac) + ext[i + 1] * frac
+        self.pos += self.step * n - len(x)
+        self.last = x[-1]
+        return out.astype(np.float32)
+
+
+class FileReplaySource:
+    """
+    Plays an audio file into a callback in `block`-sample pieces at real-time
+    pace (or `speed` times faster), from a background thread. Stands in for a
+    sound card when testing without input hardware.
+    """
+
+    def __init__(self, path: str, sr: int = LIVE_SR, block: int = 512, speed: float = 1.0,
+                 start_sec: float = 0.0):
+        self.path = path
+        self.sr = sr
+        self.block = block
+        self.speed = speed
+        self.start_sec = start_sec
+        self.thread = None
+        self.stop_event = threading.Event()
+
+    def start(self, callback, on_error=None):
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, args=(callback, on_error), daemon=True)
+        self.thread.start()
+
+    def _run(self, callback, on_error=None):
+        try:
+            y, sr, _ = decode_audio(self.path, cancel_event=self.stop_event)
+        except Exception as e:
+            print(f"Live replay: could not decode {self.path}: {e}")
+            if on_error is not None and not self.stop_event.is_set():
+                on_error("Could not replay this song")
+            return
+        y = librosa.to_mono(y)
+        if sr != self.sr:
+            y = librosa.resample(y, orig_sr=sr, target_sr=self.sr)
+        y = y[int(self.start_sec * self.sr):].astype(np.float32)
+
+        t0 = time.perf_counter()
+        for i, pos in enumerate(range(0, len(y), self.block)):
+            # Deliver each block when it would have been captured
+            due = t0 + (i + 1) * self.block / self.sr / self.speed
+            delay = due - time.perf_counter()
+            if delay > 0 and self.stop_event.wait(delay):
+                return
+            if self.stop_event.is_set():
+                return
+            callback(y[pos:pos + self.block])
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+            self.thread = None
+
+
+class MicrophoneSource:
+    """
+    Default audio input through QAudioSource. Asks for mono 16-bit at the
+    detector rate; devices that can't do that are opened in their preferred
+    format, and the blocks are converted (downmix + StreamResampler) before
+    they reach the callback. Blocks are delivered from the Qt event loop as
+    the device fills.
+    """
+
+    def __init__(self, sr: int = LIVE_SR):
+        self.sr = sr
+        self.source = None
+        self.io = None
+        self.fmt = None
+        self.decode = None
+        self.resampler = None
+        self.on_error = None
+
+    @staticmethod
+    def available() -> bool:
+        from PyQt6.QtMultimedia import QMediaDevices
+        return not QMediaDevices.defaultAudioInput().isNull()
+
+    def start(self, callback, on_error=None):
+        from PyQt6.QtMultimedia import QAudioFormat, QAudioSource, QMediaDevices
+        self.callback = callback
+        self.on_error = on_error
+        device = QMediaDevices.defaultAudioInput()
+        if device.isNull():
+            self._fail("No audio input found")
+            return
+
+        fmt = QAudioFormat()
+        fmt.setSampleRate(self.sr)
+        fmt.setChannelCount(1)
+        fmt.setSampleFormat(QAudioFormat.SampleFormat.Int16)
+        if not device.isFormatSupported(fmt):
+            fmt = device.preferredFormat()
+            print(f"Live input: {device.description()} can't record mono 16-bit at {self.sr} Hz, "
+                  f"using {fmt.sampleRate()} Hz x {fmt.channelCount()} ({fmt.sampleFormat().name})")
+        # QAudioFormat.SampleFormat -> (numpy dtype, offset, scale) to floats in [-1, 1]
+        sample_formats = {
+            QAudioFormat.SampleFormat.UInt8: ("u1", 128.0, 128.0),
+            QAudioFormat.SampleFormat.Int16: ("<i2", 0.0, 32768.0),
+            QAudioFormat.SampleFormat.Int32: ("<i4", 0.0, 2.0 ** 31),
+            QAudioFormat.SampleFormat.Float: ("<f4", 0.0, 1.0),
+        }
+        if fmt.sampleRate() <= 0 or fmt.channelCount() <= 0 or fmt.sampleFormat() not in sample_formats:
+            self._fail("Audio input format not supported")
+            return
+        self.fmt = fmt
+        self.decode = sample_formats[fmt.sampleFormat()]
+        self.resampler = StreamResampler(fmt.sampleRate(), self.sr) if fmt.sampleRate() != self.sr else None
+
+        self.source = QAudioSource(device, fmt)
+        self.source.setBufferSize(2 * fmt.bytesForDuration(46_000))  # small device buffer: low latency
+        self.source.stateChanged.connect(self._on_state)
+        self.io = self.source.start()
+        if self.io is None:
+            self._fail("Could not open the audio input")
+            return
+        self.io.readyRead.connect(self._on_ready)
+
+    def _on_ready(self):
+        if self.io is None:
+            return
+        data = self.io.readAll().data()
+        frame = self.fmt.bytesPerFrame()
+        data = data[:len(data) - len(data) % frame]
+        if not data:
+            return
+        dtype, offset, scale = self.decode
+        samples = (np.frombuffer(data, dtype=dtype).astype(np.float32) - offset) / scale
+        channels = self.fmt.channelCount()
+        if channels > 1:
+            samples = samples.reshape(-1, channels).mean(axis=1)
+        if self.resampler is not None:
+            samples = self.resampler.process(samples)
+        self.callback(samples)
+
+    def _on_state(self, state):
+        from PyQt6.QtMultimedia import QAudio
+        if self.source is not None and state == QAudio.State.StoppedState \
+                and self.source.error() != QAudio.Error.NoError:
+            self._fail(f"Audio input stopped ({self.source.error().name})")
+
+    def _fail(self, message: str):
+        print(f"Live input: {message}")
+        self.stop()
+        if self.on_error is not None:
+            self.on_error(message)
+
+    def stop(self):
+        if self.source is not None:
+            source, self.source, self.io = self.source, None, None
+            source.stop()
+
+
+# ----------------- QT BRIDGE -----------------
+
+class LiveInput(QObject):
+    """
+    Connects a source to a detector. Sources may call back from their own
+    thread; `chord_detected` and `failed` (the source could not start or
+    stopped with an error) are queued signals, so slots run in the GUI thread.
+    """
+    chord_detected = pyqtSignal(str)
+    failed = pyqtSignal(str)
+
+    def __init__(self, detector: LiveChordDetector | None = None, parent=None):
+        super().__init__(parent)
+        self.detector = detector or LiveChordDetector()
+        self.source = None
+
+    def is_active(self) -> bool:
+        return self.source is not None
+
+    def start(self, source):
+        self.stop()
+        self.detector.reset()
+        self.source = source
+        source.start(self._on_block, self._on_error)
+
+    def _on_block(self, samples):
+        name = self.detector.push(samples)
+        if name is not None:
+            self.chord_detected.emit(name)
+
+    def _on_error(self, message: str):
+        self.failed.emit(message)
+
+    def stop(self):
+        if self.source is not None:
+            self.source.stop()
+            self.source = None
+            mean_ms, worst_ms, over, skipped = self.detector.stats()
+            print(f"Live input: {mean_ms:.2f} ms/hop mean, {worst_ms:.2f} ms worst, "
+                  f"{over} hops over budget, {skipped} skipped")
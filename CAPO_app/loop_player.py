@@ -0,0 +1,130 @@
+# CAPO_app/loop_player.py
+
+import numpy as np
+from PyQt6.QtCore import QObject, QIODevice
+from PyQt6.QtMultimedia import QAudioFormat, QAudioSink, QAudio
+
+
+class LoopDevice(QIODevice):
+    """
+    Endless read-only stream over one PCM buffer. Reads wrap around at the
+    end of the buffer, so the loop boundary is exact to the sample.
+    """
+
+    def __init__(self, data: bytes, frame_bytes: int):
+        super().__init__()
+        self.data = data
+        self.frame_bytes = frame_bytes
+        self.pos = 0  # next byte handed to the audio sink
+
+    def swap(self, data: bytes):
+        """
+        Replace the buffer mid-playback (new tempo/key), keeping the relative
+        position inside the loop.
+        """
+        frac = self.pos / max(1, len(self.data))
+        pos = int(frac * len(data))
+        self.pos = pos - pos % self.frame_bytes
+        self.data = data
+
+    def readData(self, maxlen):
+        maxlen -= maxlen % self.frame_bytes
+        if not self.data or maxlen <= 0:
+            return b""
+        chunks = []
+        remaining = maxlen
+        while remaining > 0:
+            n = min(remaining, len(self.data) - self.pos)
+            chunks.append(self.data[self.pos:self.pos + n])
+            self.pos = (self.pos + n) % len(self.data)
+            remaining -= n
+        return b"".join(chunks)
+
+    def writeData(self, data):
+        return -1
+
+    def bytesAvailable(self):
+        return len(self.data) + super().bytesAvailable()
+
+    def isSequential(self):
+        return True
+
+
+class LoopPlayer(QObject):
+    """
+    Plays a pre-rendered A/B region gaplessly through QAudioSink
+    (QMediaPlayer would need a setPosition seek on every pass).
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.sink = None
+        self.device = None
+        self.sr = None
+        self.channels = 0
+        self.region_start = 0.0
+        self.rate = 1.0
+
+    @staticmethod
+    def to_pcm16(data) -> bytes:
+        return (np.clip(data, -1.0, 1.0) * 32767).astype('<i2').tobytes()
+
+    def is_active(self) -> bool:
+        return self.sink is not None
+
+    def play(self, data, sr: int, region_start: float, rate: float):
+        """
+        data: float32 (samples, channels) from AudioEngine.render_region.
+        If the same format is already playing, the buffer is swapped in place.
+        """
+        pcm = self.to_pcm16(data)
+        channels = data.shape[1]
+        self.region_start = region_start
+        self.rate = rate
+
+        if self.sink is not None and sr == self.sr and channels == self.channels:
+            self.device.swap(pcm)
+            if self.sink.state() == QAudio.State.SuspendedState:
+                self.sink.resume()
+            return
+
+        self.stop()
+        fmt = QAudioFormat()
+        fmt.setSampleRate(sr)
+        fmt.setChannelCount(channels)
+        fmt.setSampleFormat(QAudioFormat.SampleFormat.Int16)
+
+        self.sr = sr
+        self.channels = channels
+        self.device = LoopDevice(pcm, 2 * channels)
+        self.device.open(QIODevice.OpenModeFlag.ReadOnly)
+        self.sink = QAudioSink(fmt)
+        self.sink.start(self.device)
+
+    def pause(self):
+        if self.sink is not None:
+            self.sink.suspend()
+
+    def resume(self):
+        if self.sink is not None:
+            self.sink.resume()
+
+    def stop(self):
+        if self.sink is not None:
+            self.sink.stop()
+            self.sink = None
+        if self.device is not None:
+            self.device.close()
+            self.device = None
+
+    def song_position(self) -> float:
+        """
+        Current position in song seconds: bytes handed to the sink minus the
+        bytes still queued in its buffer, wrapped to the loop length.
+        """
+        if self.sink is None or not self.device.data:
+            return self.region_start
+        queued = max(0, self.sink.bufferSize() - self.sink.bytesFree())
+        played = (self.device.pos - queued) % len(self.device.data)
+        frames = played // self.device.frame_bytes
+        return self.region_start + frames / self.sr * self.rate
@@ -1,19 +1,48 @@
 import sys
 import os
+import atexit
+import bisect
+import threading
 from PyQt6.QtGui import QFontDatabase
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QLabel,
     QVBoxLayout, QHBoxLayout, QGridLayout, QWidget,
-    QPushButton, QFrame, QStyle, QButtonGroup, QFileDialog, QSizePolicy, QSpacerItem
+    QPushButton, QFrame, QStyle, QButtonGroup, QFileDialog, QSizePolicy, QSpacerItem, QMenu
 )
-from PyQt6.QtCore import Qt, QUrl, QTimer, QThread, pyqtSignal, QSize
+from PyQt6.QtCore import Qt, QUrl, QTimer, QSize
 from PyQt6.QtMultimedia import QMediaPlayer, QAudioOutput
-from PyQt6.QtGui import QKeySequence, QShortcut, QIcon, QFont, QColor, QPalette
+from PyQt6.QtGui import QKeySequence, QShortcut, QIcon, QFont, QColor, QPalette, QPainter
 
 # relative imports inside package
-from .audio_engine import AudioEngine
+from .audio_engine import AudioEngine, split_chord_name, supported_extensions, SHIFT_LOOKAHEAD_CHUNKS
+from .pcm_cache import PCMCache
+from .workspace import Workspace
+from .chord_chart import ChordChart, ChordChartStore, import_chart
+from .export import EXPORT_FILTER
+from .library import get_library
+from .jobs import (
+    JobScheduler, AnalysisJob, ChordRescoreJob, RegionRenderJob, ShiftFillJob, PrerenderJob, ExportJob,
+    PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND
+)
+from .loop_player import LoopPlayer
+from .live_input import LiveInput, MicrophoneSource, FileReplaySource
+from .playback_clock import PlaybackClock
+from .setlist import Setlist
 from .waveform_view import WaveformView
-from .chord_diagram import ChordDiagramWidget
+from .chord_diagram import ChordDiagramWidget, chord_histogram, rank_capo_positions
+from .chord_timeline import ChordTimelineView
+from .textures import TextureManager, TexturedFrame
+
+
+CHART_FILTER = "ChordPro (*.cho *.chopro *.chordpro);;MIREX Lab (*.lab);;Capo Chart (*.json)"
+
+# Background pre-render of nearby keys (opt-in): +-1 .. +-PRERENDER_RANGE semitones
+PRERENDER_RANGE = 3
+PRERENDER_MAX_BYTES = 1024 ** 3
+
+# Practice exports: an A/B loop is written this many times, after a one-bar count-in
+EXPORT_LOOP_REPEATS = 4
+EXPORT_COUNT_IN = 4
 
 
 def resource_path(relative_path):
@@ -33,32 +62,6 @@ def resource_path(relative_path):
 
     return os.path.join(base_path, relative_path)
 
-# ---------- Worker for background loading / analysis ----------
-
-class AudioLoaderWorker(QThread):
-    finished_loading = pyqtSignal()
-
-    def __init__(self, engine, file_path):
-        super().__init__()
-        self.engine = engine
-        self.file_path = file_path
-        self.success = False
-        self.detected_bpm = 0.0
-        self.detected_chords = []
-
-    def run(self):
-        print("Worker: Loading track...")
-        self.success = self.engine.load_track(self.file_path)
-
-        if self.success:
-            print("Worker: Analyzing tempo/chords...")
-            self.detected_bpm = self.engine.get_tempo()
-            self.detected_chords = self.engine.get_chords()
-
-        print("Worker: Done!")
-        self.finished_loading.emit()
-
-
 # ---------- Main Window ----------
 
 class RiffStationWindow(QMainWindow):
@@ -76,10 +79,48 @@ class RiffStationWindow(QMainWindow):
             
         # Store it as a class variable (self.assets_path) to use everywhere
         self.assets_path = base_dir.replace("\\", "/")
+        # Wood / shell textures: decoded once, pre-scaled per size (see paintEvent, TexturedFrame)
+        self.textures = TextureManager(self.assets_path, parent=self)
+        self.textures.settled.connect(self.update)
 
         # Engine / audio state
-        self.engine = AudioEngine()
-        self.loader_thread = None
+        self.pcm_cache = PCMCache()
+        # Saved charts skip re-analysis; the library indexes them for search
+        self.chart_store = ChordChartStore(library=get_library())
+        # Scratch files live in a per-session folder; sessions that crashed
+        # are swept before this one starts
+        Workspace.recover_stale()
+        self.workspace = Workspace()
+        atexit.register(self.workspace.cleanup)  # exits that skip closeEvent
+        self.engine = AudioEngine(pcm_cache=self.pcm_cache, workspace=self.workspace)
+
+        # Background analysis: fixed worker pool, one engine per job
+        self.scheduler = JobScheduler()
+        self.scheduler.job_finished.connect(self.on_job_finished)
+        self.load_job = None
+        self.current_job = None  # finished job whose engine/results are on screen
+        self.refining_job = None  # on screen with coarse results, full pass still running
+        self.rescore_job = None   # chords for another vocabulary, being re-scored
+        self.setlist = None
+
+        # A/B loop: region rendered at the current key/tempo, played gaplessly
+        self.loop_a = None
+        self.loop_b = None
+        self.looping = False
+        self.loop_job = None
+        self.loop_player = LoopPlayer()
+        self.shift_stale = False  # key changed while looping; full song not re-rendered yet
+        self.shift_job = None     # background fill of the remaining pitch-shift chunks
+
+        # Pre-rendered transpositions: jobs run only while this is set (not playing)
+        self.prerender_enabled = False
+        self.prerender_gate = threading.Event()
+        self.prerender_gate.set()
+
+        # Live mode: chords detected from the audio input, shown on the diagram
+        self.live_input = LiveInput(parent=self)
+        self.live_input.chord_detected.connect(self.on_live_chord)
+        self.live_input.failed.connect(self.on_live_failed)
 
         self.player = QMediaPlayer()
         self.audio_output = QAudioOutput()
@@ -93,12 +134,21 @@ class RiffStationWindow(QMainWindow):
         self.chord_type_mode = "beginner"
         self.notes = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B']
         self.original_file_path = None
-        self.chords = []
+        self.playback_path = None  # decoded PCM copy (or original) fed to QMediaPlayer
+        self.chords = []          # (start_sec, end_sec, name) segments, original key
+        self.chord_starts = []    # segment start times, for bisect lookup
         self.display_chords = []
+        self.beat_times = []
+        self.song_key = None      # estimated key of the original audio ("A", "F#m", ...)
+        self.key_segments = []    # (start_sec, end_sec, key): modulation points
+        self.chord_hist = None    # seconds per (root, major/minor), for capo ranking
         
-        self.timer = QTimer()
-        self.timer.setInterval(50) 
-        self.timer.timeout.connect(self.update_game_loop)
+        # Playhead / chord scheduling (replaces polling the player every 50 ms)
+        self.clock = PlaybackClock(self)
+        self.clock.tick.connect(self.on_clock_tick)
+        self.clock.boundary.connect(self.on_chord_boundary)
+        self.player.positionChanged.connect(self.on_player_position)
+        self.player.playbackStateChanged.connect(self.on_player_state)
 
         # --- WINDOW SETUP ---
         self.setWindowTitle("Capo | Unlock the Music")
@@ -124,35 +174,13 @@ class RiffStationWindow(QMainWindow):
         self.setFocusPolicy(Qt.FocusPolicy.StrongFocus)
         # --- STYLESHEET ---
         self.setStyleSheet(f"""
+            /* Textured backgrounds (shell, wood, panels, bridge) are painted
+               from self.textures, not background-image */
             QMainWindow {{
                 background-color: #0c0704;
-                background-image: url({self.assets_path}/border_shell.png);
-                background-position: center;
-                background-repeat: no-repeat;
-                background-size: cover;
                 font-family: "Segoe UI", "Helvetica", sans-serif;
             }}
 
-            QWidget#CentralWidget {{
-                background-color: #b86e28;
-                background-image: url({self.assets_path}/bg_main_wood.jpg);
-                background-position: center;
-                background-repeat: no-repeat;
-                background-size: 100% 100%;
-                border: 5px solid #d9b15c; /* Gold Border back */
-                border-radius: 30px;
-            }}
-
-            QFrame[class="panel"] {{
-                background-image: url({self.assets_path}/panel_wood.png);
-                background-position: center;
-                background-repeat: no-repeat;
-                background-size: 100% 100%;
-                border: 3px solid #d2ad61;
-                border-radius: 15px;
-                padding: 4px;
-            }}
-
             QFrame#ControlsPanel {{
                 background: qlineargradient(x1:0, y1:0, x2:0, y2:1,
                     stop:0 #f4c979, stop:0.45 #e0b168, stop:1 #b7773b);
@@ -205,20 +233,6 @@ class RiffStationWindow(QMainWindow):
                 text-shadow: 1px 1px 2px rgba(0,0,0,0.9);
             }}
 
-            QLabel[class="ChordChip"] {{
-                background-image: url({self.assets_path}/chord_chip.png);
-                background-position: center;
-                background-size: 100% 100%;
-                background-repeat: no-repeat;
-                color: #f2d48a;
-                font-weight: 900;
-                font-size: 13px;
-                padding: 10px 8px;
-                min-width: 80px;
-                qproperty-alignment: AlignCenter;
-                text-shadow: 0px 0px 1px rgba(255,255,255,0.4);
-            }}
-
             /* --- CIRCLE BUTTONS --- */
             QPushButton.circle-btn {{
                 background-color: #d9b15c; /* Gold Color */
@@ -289,14 +303,6 @@ class RiffStationWindow(QMainWindow):
             }}
 
             /* --- TRANSPORT BRIDGE --- */
-            QFrame#BridgeFrame {{
-                background-image: url({self.assets_path}/transport_bar.png);
-                background-position: center;
-                background-size: 100% 100%;
-                background-repeat: no-repeat;
-                border: none;
-            }}
-
             QPushButton#TransportButton {{
                 background-color: #f5f1e7;
                 border: 2px solid #5D4037;
@@ -316,8 +322,14 @@ class RiffStationWindow(QMainWindow):
 
     # ---------- UI setup ----------
 
+    def panel_frame(self):
+        return TexturedFrame(self.textures, "panel_wood.png", radius=15, border=3,
+                             border_color="#d2ad61", padding=4)
+
     def init_ui(self):
-        main_widget = QWidget()
+        main_widget = TexturedFrame(self.textures, "bg_main_wood.jpg", radius=30, border=5,
+                                    border_color="#d9b15c", background="#b86e28")
+        main_widget.setContentsMargins(0, 0, 0, 0)  # as a plain QWidget, the border took no layout room
         main_widget.setObjectName("CentralWidget")
         self.setCentralWidget(main_widget)
         
@@ -378,8 +390,7 @@ class RiffStationWindow(QMainWindow):
         left_col = QVBoxLayout()
         left_col.setSpacing(0) 
         
-        self.finder_frame = QFrame()
-        self.finder_frame.setProperty("class", "panel")
+        self.finder_frame = self.panel_frame()
         find_layout = QVBoxLayout()
         find_layout.setContentsMargins(15, 12, 15, 15)
         self.finder_frame.setLayout(find_layout)
@@ -452,8 +463,7 @@ class RiffStationWindow(QMainWindow):
         right_col.setSpacing(10)
 
         # Detected Chords
-        self.detected_frame = QFrame()
-        self.detected_frame.setProperty("class", "panel")
+        self.detected_frame = self.panel_frame()
         det_layout = QVBoxLayout()
         det_layout.setContentsMargins(15, 12, 15, 12)
         self.detected_frame.setLayout(det_layout)
@@ -463,16 +473,15 @@ class RiffStationWindow(QMainWindow):
         lbl_det.setAlignment(Qt.AlignmentFlag.AlignCenter)
         det_layout.addWidget(lbl_det)
         
-        self.chord_grid = QGridLayout()
-        self.chord_grid.setSpacing(6)
-        det_layout.addLayout(self.chord_grid)
-        det_layout.addStretch()
+        # Whole song in order, following the playhead; click a chord to seek
+        self.chord_timeline = ChordTimelineView(self.textures)
+        self.chord_timeline.seek_requested.connect(self.seek_track)
+        det_layout.addWidget(self.chord_timeline, stretch=1)
         right_col.addWidget(self.detected_frame, stretch=3) 
 
         # 2. Performance Controls (Centralized)
         # 2. Performance Controls (Centralized & Shifted Left)
-        self.controls_frame = QFrame()
-        self.controls_frame.setProperty("class", "panel")
+        self.controls_frame = self.panel_frame()
         
         ctrl_layout = QVBoxLayout()
         ctrl_layout.setSpacing(15) 
@@ -564,6 +573,24 @@ class RiffStationWindow(QMainWindow):
         self.btn_capo_up.setProperty("class", "circle-btn")
         self.btn_capo_up.clicked.connect(self.capo_up)
         grid.addWidget(self.btn_capo_up, 2, 3, alignment=Qt.AlignmentFlag.AlignCenter)
+
+        # --- Row 3: SONG KEY (estimated) + suggested capo ---
+        lbl_sk = QLabel("SONG KEY")
+        lbl_sk.setStyleSheet(row_heading_style)
+        grid.addWidget(lbl_sk, 3, 0, alignment=Qt.AlignmentFlag.AlignCenter)
+
+        self.lbl_song_key = QLabel("-")
+        self.lbl_song_key.setObjectName("ValueLabel")
+        self.lbl_song_key.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        grid.addWidget(self.lbl_song_key, 3, 1, 1, 2)
+
+        self.btn_capo_suggest = QPushButton("Capo")
+        self.btn_capo_suggest.setProperty("class", "pill-btn")
+        self.btn_capo_suggest.setFixedSize(90, 36)
+        self.btn_capo_suggest.setEnabled(False)
+        self.btn_capo_suggest.setToolTip("Capo position with the fewest barre chords")
+        self.btn_capo_suggest.clicked.connect(self.apply_suggested_capo)
+        grid.addWidget(self.btn_capo_suggest, 3, 3, alignment=Qt.AlignmentFlag.AlignCenter)
         
         # Add normal stretches to keep it centered within the new margin-constrained area
         center_h.addStretch(1)
@@ -580,13 +607,13 @@ class RiffStationWindow(QMainWindow):
         self.main_layout.addLayout(middle_container)
 
         # BOTTOM: The "Guitar Bridge"
-        self.bridge_frame = QFrame()
+        self.bridge_frame = TexturedFrame(self.textures, "transport_bar.png")
         self.bridge_frame.setObjectName("BridgeFrame")
         self.bridge_frame.setFixedHeight(80) 
         
         bridge_layout = QHBoxLayout()
-        bridge_layout.setContentsMargins(40, 10, 40, 10)
-        bridge_layout.setSpacing(32)
+        bridge_layout.setContentsMargins(30, 10, 30, 10)
+        bridge_layout.setSpacing(16)
         self.bridge_frame.setLayout(bridge_layout)
 
         # Load Button
@@ -595,6 +622,14 @@ class RiffStationWindow(QMainWindow):
         self.btn_load.setFixedSize(130, 36)
         self.btn_load.clicked.connect(self.load_song)
         bridge_layout.addWidget(self.btn_load)
+
+        # Setlist navigation (enabled when several songs are opened at once)
+        self.btn_next_song = QPushButton("Next Song")
+        self.btn_next_song.setProperty("class", "pill-btn")
+        self.btn_next_song.setFixedSize(130, 36)
+        self.btn_next_song.setEnabled(False)
+        self.btn_next_song.clicked.connect(self.next_song)
+        bridge_layout.addWidget(self.btn_next_song)
         
         bridge_layout.addStretch()
 
@@ -617,12 +652,50 @@ class RiffStationWindow(QMainWindow):
         bridge_layout.addWidget(self.btn_play)
         bridge_layout.addWidget(self.btn_pause)
         bridge_layout.addWidget(self.btn_stop)
+
+        # A/B loop ("[" sets A, "]" sets B at the playhead)
+        self.btn_loop = QPushButton("A-B Loop")
+        self.btn_loop.setProperty("class", "pill-btn")
+        self.btn_loop.setCheckable(True)
+        self.btn_loop.setFixedSize(110, 36)
+        self.btn_loop.clicked.connect(self.toggle_loop)
+        bridge_layout.addWidget(self.btn_loop)
+
+        # Secondary actions share one menu, so the bar fits the minimum window width
+        self.btn_more = QPushButton("More")
+        self.btn_more.setProperty("class", "pill-btn")
+        self.btn_more.setFixedSize(100, 36)
+        more_menu = QMenu(self.btn_more)
+
+        # Chord chart files (ChordPro / .lab / Capo chart)
+        more_menu.addAction("Export Chords...", self.export_chart)
+        more_menu.addAction("Import Chords...", self.import_chart)
+        action = more_menu.addAction("Export Audio...", self.export_audio)
+        action.setToolTip("Save a practice version at the current key and tempo (the A-B loop, if set)")
+        more_menu.addSeparator()
+
+        self.action_live = more_menu.addAction("Live Input")
+        self.action_live.setCheckable(True)
+        self.action_live.triggered.connect(self.toggle_live)
+
+        self.action_prerender = more_menu.addAction("Pre-render Keys")
+        self.action_prerender.setCheckable(True)
+        self.action_prerender.setToolTip(
+            f"Render the song in nearby keys (±{PRERENDER_RANGE}) while paused, for instant key changes")
+        self.action_prerender.toggled.connect(self.toggle_prerender)
+        more_menu.setToolTipsVisible(True)
+
+        self.btn_more.setMenu(more_menu)
+        bridge_layout.addWidget(self.btn_more)
         
         bridge_layout.addStretch()
         
         # Status Label
         self.label_info = QLabel("No Song Loaded")
         self.label_info.setStyleSheet("color: #f2e7d0; font-size: 11px; font-style: italic;")
+        # Takes the width that is left; long messages are clipped, never widen the bar
+        self.label_info.setSizePolicy(QSizePolicy.Policy.Ignored, QSizePolicy.Policy.Preferred)
+        self.label_info.setMinimumWidth(80)
         bridge_layout.addWidget(self.label_info)
 
         self.main_layout.addWidget(self.bridge_frame)
@@ -633,6 +706,21 @@ class RiffStationWindow(QMainWindow):
 
         self.shortcut_right = QShortcut(QKeySequence(Qt.Key.Key_Right), self)
         self.shortcut_right.activated.connect(lambda: self.nudge_playhead(1.0))
+
+        self.shortcut_next_song = QShortcut(QKeySequence(Qt.Key.Key_PageDown), self)
+        self.shortcut_next_song.activated.connect(self.next_song)
+
+        self.shortcut_prev_song = QShortcut(QKeySequence(Qt.Key.Key_PageUp), self)
+        self.shortcut_prev_song.activated.connect(self.prev_song)
+
+        self.shortcut_loop_a = QShortcut(QKeySequence(Qt.Key.Key_BracketLeft), self)
+        self.shortcut_loop_a.activated.connect(self.set_loop_a)
+
+        self.shortcut_loop_b = QShortcut(QKeySequence(Qt.Key.Key_BracketRight), self)
+        self.shortcut_loop_b.activated.connect(self.set_loop_b)
+
+        self.shortcut_loop = QShortcut(QKeySequence(Qt.Key.Key_L), self)
+        self.shortcut_loop.activated.connect(self.btn_loop.click)
         
 
     # ---------- Chord helpers ----------
@@ -640,10 +728,184 @@ class RiffStationWindow(QMainWindow):
     def set_chord_type_mode(self, mode: str):
         self.chord_type_mode = mode
         self.diagram_widget.set_mode(mode)
+        if self.live_input.is_active():
+            self.live_input.detector.set_vocabulary(mode)
+        if self.refining_job is not None:
+            return  # the full pass is still running; on_refined applies the mode
+        if self.chords:
+            self.apply_chord_mode(mode)
+
+    def apply_chord_mode(self, mode: str):
+        """
+        Show the chords for `mode`: at once from a saved chart for this
+        vocabulary, otherwise re-scored by a ChordRescoreJob. That is quick
+        when the engine has chroma and beats cached, but a song opened from
+        a saved chart has none, so it runs off the GUI thread either way;
+        on_chords_rescored shows and saves the result.
+        """
+        self.scheduler.cancel_group("chords")
+        self.rescore_job = None
+        fingerprint = self.current_job.fingerprint if self.current_job is not None else None
+        if fingerprint:
+            chart = self.chart_store.load(fingerprint, mode, self.engine.pipeline.params)
+            if chart is not None:
+                self.set_chords(chart.segments)
+                self.refresh_display_chords()
+                return
+        if self.engine.y_stereo is None:
+            return
+        job = ChordRescoreJob(self.engine, mode)
+        self.rescore_job = self.scheduler.submit(job, group="chords")
+
+    def on_chords_rescored(self, job):
+        self.rescore_job = None
+        if job.cancelled or job.result is None or job.vocabulary != self.chord_type_mode:
+            return
+        self.engine.adopt_analysis(job.analysis_engine)
+        self.set_chords(job.result)
+        self.refresh_display_chords()
+        self.on_chord_boundary(self.current_position())
+        if self.current_job is not None and self.current_job.fingerprint:
+            self.chart_store.save(self.current_chart(job.result, job.vocabulary), self.original_file_path,
+                                  self.engine.pipeline.params)
+
+    def current_chart(self, segments=None, mode=None):
+        title = os.path.splitext(os.path.basename(self.original_file_path or ""))[0]
+        job = self.current_job
+        return ChordChart(self.chords if segments is None else segments, self.original_bpm,
+                          self.beat_times, mode or self.chord_type_mode, title,
+                          job.fingerprint if job is not None else None,
+                          self.song_key, self.key_segments,
+                          job.peaks if job is not None else None)
+
+    # ---------- Chord chart import / export ----------
+
+    def export_chart(self):
+        if not self.chords:
+            self.label_info.setText("Nothing to export yet")
+            return
+        title = os.path.splitext(os.path.basename(self.original_file_path or "chart"))[0]
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Export Chords", title + ".cho", CHART_FILTER
+        )
+        if not path:
+            return
+        try:
+            self.current_chart().export(path)
+            self.label_info.setText(f"Exported {os.path.basename(path)}")
+        except Exception as e:
+            print(f"Error exporting chords: {e}")
+            self.label_info.setText("Export failed")
+
+    def export_audio(self):
+        """
+        Queue a practice export of the current song: current key and tempo,
+        only the A/B loop (repeated) when one is set, after a count-in.
+        Exports run in the background and in parallel; playback carries on.
+        """
+        if not self.original_file_path or self.engine.y_stereo is None:
+            self.label_info.setText("Load the song first")
+            return
+        title = os.path.splitext(os.path.basename(self.original_file_path))[0]
+        name = f"{title} ({self.key_shift:+d}, {round(self.playback_rate * 100)}%)"
+        loop = None
+        if self.loop_a is not None and self.loop_b is not None:
+            loop = (self.loop_a, self.loop_b)
+            name += f" loop {self.loop_a:.0f}-{self.loop_b:.0f}s"
+        path, _ = QFileDialog.getSaveFileName(self, "Export Practice Audio", name + ".wav", EXPORT_FILTER)
+        if not path:
+            return
+
+        job = ExportJob(self.engine.playback_path or self.original_file_path, path,
+                        semitones=self.key_shift, rate=self.playback_rate, loop=loop,
+                        repeats=EXPORT_LOOP_REPEATS if loop else 1,
+                        count_in=EXPORT_COUNT_IN if self.original_bpm else 0, bpm=self.original_bpm)
+        self.scheduler.submit(job, group="export", replace=False)
+        self.label_info.setText(f"Exporting {os.path.basename(path)}...")
+
+    def on_audio_exported(self, job):
+        if job.cancelled:
+            return
+        if job.result is None:
+            self.label_info.setText(f"Export failed: {os.path.basename(job.out_path)}")
+        else:
+            self.label_info.setText(f"Exported {os.path.basename(job.out_path)}")
+
+    def import_chart(self):
+        if self.current_job is None:
+            self.label_info.setText("Load the song first")
+            return
+        path, _ = QFileDialog.getOpenFileName(self, "Import Chords", "", CHART_FILTER)
+        if not path:
+            return
+        chart = import_chart(path, duration=self.engine.duration)
+        if chart is None or not chart.segments:
+            self.label_info.setText("Could not read that chart")
+            return
+
+        self.set_chords(chart.segments)
+        if chart.key:
+            self.set_song_key(chart.key)
+        self.refresh_display_chords()
+        # Remember it for this song, so reopening it skips analysis
+        self.chart_store.save(self.current_chart(), self.original_file_path, self.engine.pipeline.params)
+        self.label_info.setText(f"Imported {os.path.basename(path)}")
+
+    def set_chords(self, segments):
+        self.chords = segments
+        self.chord_starts = [start for start, _, _ in segments]
+        self.chord_hist = chord_histogram(segments)
+        self.clock.set_events(self.chord_starts)
+        self.update_key_display()
+
+    # ---------- Song key / capo suggestion ----------
+
+    def set_song_key(self, key, key_segments=()):
+        self.song_key = key
+        self.key_segments = list(key_segments)
+        self.update_key_display()
+
+    def suggested_capo(self):
+        """Best capo for the current key shift (None without chords)."""
+        if self.chord_hist is None or not self.chord_hist.any():
+            return None
+        # Sounding chords move with the key shift; the capo then picks the shapes
+        positions, _ = rank_capo_positions(self.chord_hist, self.key_shift)
+        return int(positions[0])
+
+    def update_key_display(self):
+        if self.song_key:
+            key = self.transpose_chord(self.song_key, self.key_shift)
+            text = key[:-1] + " minor" if key.endswith("m") else key + " major"
+            if len({k for _, _, k in self.key_segments}) > 1:
+                text += " *"
+                changes = ", ".join(f"{self.transpose_chord(k, self.key_shift)} @ {int(s // 60)}:{int(s % 60):02d}"
+                                    for s, _, k in self.key_segments)
+                self.lbl_song_key.setToolTip(f"Key changes: {changes}")
+            else:
+                self.lbl_song_key.setToolTip("")
+            self.lbl_song_key.setText(text)
+        else:
+            self.lbl_song_key.setText("-")
+            self.lbl_song_key.setToolTip("")
+
+        capo = self.suggested_capo()
+        self.btn_capo_suggest.setEnabled(capo is not None)
+        self.btn_capo_suggest.setText(f"Capo {capo}" if capo is not None else "Capo")
+
+    def apply_suggested_capo(self):
+        capo = self.suggested_capo()
+        if capo is not None and capo != self.capo:
+            self.capo = capo
+            self.lbl_capo.setText(str(self.capo))
+            self.refresh_display_chords()
 
     def transpose_chord(self, chord_name, semitone_shift):
-        root = chord_name.split()[0]
-        suffix = chord_name[len(root):]
+        if "/" in chord_name:
+            # Slash chords: move the bass note along with the chord
+            chord, bass = chord_name.split("/", 1)
+            return self.transpose_chord(chord, semitone_shift) + "/" + self.transpose_chord(bass, semitone_shift)
+        root, suffix = split_chord_name(chord_name)
         if root in self.notes:
             idx = self.notes.index(root)
             new_idx = (idx + semitone_shift) % 12
@@ -657,73 +919,232 @@ class RiffStationWindow(QMainWindow):
     def refresh_display_chords(self):
         if not self.chords:
             return
-        self.display_chords = [self.get_display_chord(ch) for ch in self.chords]
+        self.display_chords = [
+            (start, end, self.get_display_chord(name)) for start, end, name in self.chords
+        ]
         self.waveform_widget.plot_chords(self.display_chords)
-        self.populate_chord_grid(self.display_chords)
+        self.chord_timeline.set_chords(self.display_chords)
+
+    def chord_at(self, time_sec):
+        """Original-key chord name playing at time_sec, or None."""
+        i = bisect.bisect_right(self.chord_starts, time_sec) - 1
+        if 0 <= i < len(self.chords) and time_sec < self.chords[i][1]:
+            return self.chords[i][2]
+        return None
 
     # ---------- Load / analysis ----------
 
     def load_song(self):
-        file_path, _ = QFileDialog.getOpenFileName(
-            self, "Open Audio", "", "Audio (*.mp3 *.wav)"
+        # Selecting several files opens them as a setlist
+        patterns = " ".join(f"*{ext}" for ext in supported_extensions())
+        file_paths, _ = QFileDialog.getOpenFileNames(
+            self, "Open Audio", "", f"Audio ({patterns});;All Files (*)"
         )
-        if file_path:
-            self.label_info.setText(f"Loading {os.path.basename(file_path)}...")
-            self.loader_thread = AudioLoaderWorker(self.engine, file_path)
-            self.loader_thread.finished_loading.connect(self.on_load_complete)
-            self.loader_thread.start()
+        if not file_paths:
+            return
+
+        self.scheduler.cancel_group("prefetch")
+        self.setlist = Setlist(file_paths) if len(file_paths) > 1 else None
+        self.btn_next_song.setEnabled(self.setlist is not None)
+        self.open_track(file_paths[0])
+
+    def open_track(self, file_path):
+        self.label_info.setText(f"Loading {os.path.basename(file_path)}...")
+        self.refining_job = None  # a song still refining is cancelled with the "load" group
+
+        if self.setlist is not None:
+            for job in self.setlist.prune():
+                self.scheduler.cancel_job(job)
+
+            prepared = self.setlist.take_prepared(file_path)
+            if prepared is not None:
+                # Analyzed in the background already: just swap it in
+                self.scheduler.cancel_group("load")
+                self.load_job = None
+                self.on_load_complete(prepared)
+                return
+
+            pending = self.setlist.pending.get(file_path)
+            if pending is not None:
+                # Still being prefetched: move it to the front and wait for it
+                self.scheduler.cancel_group("load")
+                self.scheduler.promote(pending)
+                self.load_job = pending
+                return
+
+        # group="load" cancels whatever song was still being analyzed
+        job = AnalysisJob(file_path, self.pcm_cache, PRIORITY_INTERACTIVE,
+                          analysis_params={"vocabulary": self.chord_type_mode},
+                          chart_store=self.chart_store, workspace=self.workspace)
+        job.signals.provisional.connect(self.on_provisional)
+        self.load_job = self.scheduler.submit(job, group="load")
+
+    def next_song(self):
+        if self.setlist is not None:
+            path = self.setlist.move(1)
+            if path:
+                self.open_track(path)
+
+    def prev_song(self):
+        if self.setlist is not None:
+            path = self.setlist.move(-1)
+            if path:
+                self.open_track(path)
+
+    def prefetch_setlist(self):
+        if self.setlist is None:
+            return
+        for job in self.setlist.prune():
+            self.scheduler.cancel_job(job)
+        for path in self.setlist.to_prefetch():
+            job = AnalysisJob(path, self.pcm_cache, PRIORITY_BACKGROUND,
+                              analysis_params={"vocabulary": self.chord_type_mode},
+                              chart_store=self.chart_store, workspace=self.workspace,
+                              progressive=False)
+            self.setlist.add_pending(job)
+            self.scheduler.submit(job, group="prefetch", replace=False)
+
+    def on_job_finished(self, job):
+        if isinstance(job, RegionRenderJob):
+            if job is self.loop_job:
+                self.on_loop_rendered(job)
+            return
+        if isinstance(job, ChordRescoreJob):
+            if job is self.rescore_job and job.engine is self.engine:
+                self.on_chords_rescored(job)
+            return
+        if isinstance(job, ShiftFillJob):
+            if job is self.shift_job and job.engine is self.engine:
+                self.on_shift_filled(job)
+            return
+        if isinstance(job, PrerenderJob):
+            return  # the engine keeps the file; key changes pick it up
+        if isinstance(job, ExportJob):
+            self.on_audio_exported(job)
+            return
 
-    def on_load_complete(self):
-        if not self.loader_thread:
+        if self.setlist is not None:
+            self.setlist.complete(job)
+
+        if job is self.load_job:
+            self.load_job = None
+            if job is self.refining_job:
+                self.refining_job = None
+                if not job.cancelled:
+                    self.on_refined(job)
+            elif not job.cancelled:
+                if self.setlist is not None:
+                    self.setlist.take_prepared(job.file_path)
+                self.on_load_complete(job)
+
+    def on_provisional(self, job):
+        """
+        Coarse results are in: open the song with them now. The job keeps
+        running the full pass; on_refined swaps its results in.
+        """
+        if job is not self.load_job or job.cancelled:
             return
+        self.refining_job = job
+        self.on_load_complete(job)
+        self.label_info.setText("Ready to Rock (refining chords...)")
+
+    def on_refined(self, job):
+        """
+        Full-quality results for the song on screen: replace chords, beats,
+        tempo and key in place. Playback, position, loop, key and capo are
+        left alone.
+        """
+        if job is not self.current_job or not job.success:
+            return
+        if job.engine is self.engine:
+            self.engine.adopt_analysis(job.analysis_engine)
+        self.beat_times = job.beat_times
+        self.original_bpm = job.detected_bpm
+        self.update_tempo_display()
+        self.set_song_key(job.detected_key, job.key_segments)
+        self.set_chords(job.detected_chords)
+        self.waveform_widget.plot_beats(self.beat_times)
+        self.refresh_display_chords()
+        self.on_chord_boundary(self.current_position())
+        if job.vocabulary != self.chord_type_mode:
+            self.apply_chord_mode(self.chord_type_mode)  # switched while refining
+        if self.setlist is not None:
+            self.label_info.setText(f"Ready to Rock {self.setlist.label()}")
+        else:
+            self.label_info.setText("Ready to Rock")
+        self.start_prerender()
 
-        if self.loader_thread.success:
+    def on_load_complete(self, job):
+        if job.success:
             print("Main: Worker finished. UI updating...")
-            self.chords = self.loader_thread.detected_chords
-            self.original_bpm = self.loader_thread.detected_bpm
-            self.original_file_path = self.loader_thread.file_path
+            # Adopt the job's engine; the previous one is dropped with its temp file
+            if self.engine is not job.engine:
+                self.scheduler.cancel_group("prerender")
+                self.scheduler.cancel_group("shift")  # it patches the old song's shifted file
+                self.shift_job = None
+                self.scheduler.cancel_group("chords")
+                self.rescore_job = None
+                self.engine.cleanup_temp_file()
+                self.engine.clear_prerendered()
+                self.engine = job.engine
+
+            # Keep the outgoing track around so stepping back is instant too
+            previous = self.current_job
+            if (self.setlist is not None and previous is not None and previous is not job
+                    and not previous.provisional):
+                if previous.file_path in self.setlist.window():
+                    self.setlist.prepared[previous.file_path] = previous
+            self.current_job = job
+
+            self.beat_times = job.beat_times
+            self.original_bpm = job.detected_bpm
+            self.original_file_path = job.file_path
+            self.set_song_key(job.detected_key, job.key_segments)
+
+            self.set_chords(job.detected_chords)
+            self.playback_path = self.engine.playback_path or self.original_file_path
 
             # reset state
+            self.shift_stale = False
+            self.stop_loop()
+            self.loop_a = self.loop_b = None
             self.playback_rate = 1.0
             self.key_shift = 0
             self.capo = 0
             self.lbl_key.setText("0")
             self.lbl_capo.setText("0")
             self.update_tempo_display()
+            self.update_key_display()
 
-            # ✅ use y_stereo now (WaveformView can handle stereo)
-            if self.engine.y_stereo is not None:
+            # peaks were computed by the worker; fall back to y_stereo
+            if job.peaks is not None:
+                self.waveform_widget.plot_peaks(*job.peaks)
+            elif self.engine.y_stereo is not None:
                 self.waveform_widget.plot_audio(self.engine.y_stereo, self.engine.sr)
 
-            # chords (already in original key)
+            # chords (already in original key) on the beat grid
+            self.waveform_widget.plot_beats(self.beat_times)
             self.refresh_display_chords()
+            # Prefetched jobs may predate a Beginner/Advanced switch (provisional
+            # chords stay as they are: on_refined re-scores once the full pass is in)
+            if job.vocabulary != self.chord_type_mode and not job.provisional:
+                self.apply_chord_mode(self.chord_type_mode)
 
-            # audio player uses the ORIGINAL file path
-            self.player.setSource(QUrl.fromLocalFile(self.original_file_path))
+            # audio player uses the original audio (decoded PCM copy for MP3 etc.)
+            self.player.setSource(QUrl.fromLocalFile(self.playback_path))
             self.player.setPlaybackRate(self.playback_rate)
-            self.label_info.setText("Ready to Rock")
+            self.clock.set_rate(self.playback_rate)
+            if self.setlist is not None:
+                self.label_info.setText(f"Ready to Rock {self.setlist.label()}")
+            else:
+                self.label_info.setText("Ready to Rock")
         else:
             self.label_info.setText("Error loading file.")
 
-    def populate_chord_grid(self, all_chords):
-        unique_chords = sorted(set(all_chords))
-        for i in reversed(range(self.chord_grid.count())):
-            item = self.chord_grid.itemAt(i)
-            if item and item.widget():
-                item.widget().setParent(None)
-
-        row, col = 0, 0
-        max_cols = 4
-        
-        for chord in unique_chords:
-            lbl = QLabel(chord)
-            lbl.setProperty("class", "ChordChip")
-            lbl.setAlignment(Qt.AlignmentFlag.AlignCenter)
-            self.chord_grid.addWidget(lbl, row, col)
-            col += 1
-            if col >= max_cols:
-                col = 0
-                row += 1
+        # Current track is settled: analyze the next ones while it plays
+        self.prefetch_setlist()
+        if job.success and not job.provisional:
+            self.start_prerender()
 
     # ---------- Tempo ----------
 
@@ -735,7 +1156,10 @@ class RiffStationWindow(QMainWindow):
         self.playback_rate = new_bpm / self.original_bpm
         self.playback_rate = max(0.2, min(2.0, self.playback_rate))
         self.player.setPlaybackRate(self.playback_rate)
+        self.clock.set_rate(self.playback_rate)
         self.update_tempo_display()
+        if self.looping:
+            self.render_loop()
 
     def update_tempo_display(self):
         if self.original_bpm > 0:
@@ -755,14 +1179,23 @@ class RiffStationWindow(QMainWindow):
     def key_up(self):
         self.key_shift += 1
         self.lbl_key.setText(f"{self.key_shift:+d}")
-        self.apply_audio_shift()
-        self.refresh_display_chords()
+        self.on_key_changed()
 
     def key_down(self):
         self.key_shift -= 1
         self.lbl_key.setText(f"{self.key_shift:+d}")
-        self.apply_audio_shift()
+        self.on_key_changed()
+
+    def on_key_changed(self):
+        if self.looping:
+            # Only the loop region is re-rendered; the full song catches up
+            # when the loop is switched off
+            self.shift_stale = True
+            self.render_loop()
+        else:
+            self.apply_audio_shift()
         self.refresh_display_chords()
+        self.update_key_display()
 
     def capo_up(self):
         if self.capo < 11:
@@ -776,25 +1209,56 @@ class RiffStationWindow(QMainWindow):
             self.lbl_capo.setText(str(self.capo))
             self.refresh_display_chords()
 
+    # ---------- Background pre-render ----------
+
+    def toggle_prerender(self, checked):
+        self.prerender_enabled = checked
+        if checked:
+            self.start_prerender()
+        else:
+            self.scheduler.cancel_group("prerender")
+
+    def start_prerender(self):
+        """
+        Queue the nearby keys (closest first) for the song on screen. Jobs
+        share the background priority with prefetch and pause during playback.
+        """
+        if not self.prerender_enabled or self.refining_job is not None or self.engine.y_stereo is None:
+            return
+        self.scheduler.cancel_group("prerender")
+        self.engine.get_shift_renderer()  # created here, not raced by the workers
+        for step in range(1, PRERENDER_RANGE + 1):
+            for semitones in (step, -step):
+                if semitones not in self.engine.shift_files:
+                    job = PrerenderJob(self.engine, semitones, self.prerender_gate, PRERENDER_MAX_BYTES)
+                    self.scheduler.submit(job, group="prerender", replace=False)
+
     # ---------- Pitch shift audio switching ----------
 
-    def apply_audio_shift(self):
+    def apply_audio_shift(self, position=None):
         if not self.original_file_path:
             self.label_info.setText("No track loaded")
             return
 
+        self.scheduler.cancel_group("shift")
+        self.shift_job = None
+
         # key_shift 0 => original audio
         if self.key_shift == 0:
             print("Reverting to original audio file (no pitch processing).")
             self.engine.cleanup_temp_file()
-            new_source_path = self.original_file_path
+            new_source_path = self.playback_path
             self.label_info.setText("Back to original key")
         else:
             self.label_info.setText(
                 f"Shifting audio by {self.key_shift:+d} semitones..."
             )
             QApplication.processEvents() # Force UI update before heavy lift
-            temp_file_path = self.engine.generate_shifted_file(self.key_shift)
+            # Render only the playhead chunk and the next one now; the rest is
+            # patched into the same file ahead of the playhead in the background
+            if position is None:
+                position = self.current_position()
+            temp_file_path = self.engine.generate_shifted_file(self.key_shift, start_sec=position)
             if not temp_file_path:
                 self.label_info.setText("Error shifting audio.")
                 return
@@ -802,6 +1266,35 @@ class RiffStationWindow(QMainWindow):
             print(f"Using shifted audio: {new_source_path}")
             self.label_info.setText(f"Key shifted to {self.key_shift:+d}")
 
+            if not self.engine.shift_complete(self.key_shift):
+                self.start_shift_fill(self.key_shift, temp_file_path, position)
+
+        self.switch_source(new_source_path)
+
+    def start_shift_fill(self, semitones, path, start_sec):
+        job = ShiftFillJob(self.engine, semitones, path, start_sec)
+        self.shift_job = self.scheduler.submit(job, group="shift")
+
+    def refocus_shift_fill(self, time_sec):
+        """
+        Seeking while the shifted file is still being filled: make sure the
+        audio at the new position is in the file before the player gets
+        there, then continue the fill from that point.
+        """
+        job = self.shift_job
+        if job is None:
+            return
+        self.scheduler.cancel_group("shift")
+        self.engine.fill_shifted_file(job.semitones, job.path, time_sec, limit=1 + SHIFT_LOOKAHEAD_CHUNKS)
+        self.start_shift_fill(job.semitones, job.path, time_sec)
+
+    def on_shift_filled(self, job):
+        # The player has been reading the file all along; nothing to switch
+        self.shift_job = None
+        if not job.cancelled and job.result is not None:
+            print(f"Pitch shift {job.semitones:+d} complete.")
+
+    def switch_source(self, new_source_path):
         # reload into QMediaPlayer
         current_pos = self.player.position()
         was_playing = self.player.playbackState() == QMediaPlayer.PlaybackState.PlayingState
@@ -814,51 +1307,228 @@ class RiffStationWindow(QMainWindow):
         if was_playing:
             self.player.play()
 
+    # ---------- A/B loop ----------
+
+    def current_position(self):
+        if self.clock.running:
+            return self.clock.now()
+        return self.reported_position()
+
+    def reported_position(self):
+        # Position as last reported by whichever backend is playing
+        if self.looping and self.loop_player.is_active():
+            return self.loop_player.song_position()
+        return self.player.position() / 1000.0
+
+    def set_loop_a(self):
+        self.loop_a = self.current_position()
+        self.loop_b = None
+        self.waveform_widget.set_loop_region(self.loop_a, None)
+        self.label_info.setText(f"Loop A at {self.loop_a:.2f}s")
+
+    def set_loop_b(self):
+        pos = self.current_position()
+        if self.loop_a is None or pos <= self.loop_a:
+            self.label_info.setText("Set A before B")
+            return
+        self.loop_b = pos
+        self.waveform_widget.set_loop_region(self.loop_a, self.loop_b)
+        self.label_info.setText(f"Loop {self.loop_a:.2f}-{self.loop_b:.2f}s")
+        if self.looping:
+            self.render_loop()
+
+    def toggle_loop(self):
+        if self.looping:
+            self.stop_loop()
+        elif self.loop_a is None or self.loop_b is None or not self.original_file_path:
+            self.label_info.setText("Set loop points with [ and ] first")
+            self.btn_loop.setChecked(False)
+        else:
+            self.looping = True
+            self.player.pause()
+            self.render_loop()
+
+    def render_loop(self):
+        self.label_info.setText("Rendering loop...")
+        job = RegionRenderJob(self.engine, self.loop_a, self.loop_b,
+                              self.key_shift, self.playback_rate)
+        self.loop_job = self.scheduler.submit(job, group="loop")
+
+    def on_loop_rendered(self, job):
+        self.loop_job = None
+        if job.cancelled or not self.looping:
+            return
+        if job.result is None or len(job.result) == 0:
+            self.label_info.setText("Error rendering loop.")
+            return
+        self.loop_player.play(job.result, self.engine.sr, job.start_sec, job.rate)
+        # The sink's consumed-sample count drives the clock while looping
+        self.clock.source = self.loop_player.song_position
+        self.clock.set_loop(job.start_sec, job.end_sec)
+        self.clock.set_rate(job.rate)
+        self.clock.start(self.loop_player.song_position())
+        self.label_info.setText(f"Looping {job.start_sec:.2f}-{job.end_sec:.2f}s")
+
+    def stop_loop(self):
+        if not self.looping:
+            return
+        pos = self.current_position()
+        self.looping = False
+        self.btn_loop.setChecked(False)
+        self.scheduler.cancel_group("loop")
+        self.loop_job = None
+        self.loop_player.stop()
+        self.clock.stop()
+        self.clock.source = None
+        self.clock.set_loop(None, None)
+        self.clock.sync(pos)
+        if self.shift_stale:
+            self.shift_stale = False
+            self.apply_audio_shift(position=pos)
+        self.player.setPosition(int(pos * 1000))
+        self.waveform_widget.move_playhead(pos)
+
     # ---------- Playback / navigation ----------
 
     def play_audio(self):
-        self.player.play()
-        self.timer.start()
+        self.prerender_gate.clear()  # no background rendering while the user listens
+        if self.looping:
+            self.loop_player.resume()
+        else:
+            self.player.play()
+        screen = self.screen()
+        if screen is not None:
+            self.clock.set_refresh_rate(screen.refreshRate())
+        self.clock.start(self.reported_position())
 
     def pause_audio(self):
+        self.prerender_gate.set()
+        self.loop_player.pause()
         self.player.pause()
-        self.timer.stop()
+        self.clock.stop()
 
     def stop_audio(self):
+        self.prerender_gate.set()
+        self.stop_loop()
         self.player.stop()
-        self.timer.stop()
+        self.clock.stop()
+        self.clock.sync(0.0)
         self.waveform_widget.move_playhead(0.0)
 
     def seek_track(self, time_sec):
+        self.stop_loop()
+        self.refocus_shift_fill(time_sec)
         self.player.setPosition(int(time_sec * 1000))
-        self.waveform_widget.move_playhead(time_sec)
+        self.clock.sync(time_sec)
+        self.update_game_loop(time_sec)
 
     def nudge_playhead(self, delta_sec):
+        self.stop_loop()
         if self.player.duration() <= 0:
             return
         current_ms = self.player.position()
         target_ms = current_ms + int(delta_sec * 1000)
         target_ms = max(0, min(target_ms, self.player.duration()))
+        self.refocus_shift_fill(target_ms / 1000.0)
         self.player.setPosition(target_ms)
-        self.waveform_widget.move_playhead(target_ms / 1000.0)
-        self.update_game_loop()
+        self.clock.sync(target_ms / 1000.0)
+        self.update_game_loop(target_ms / 1000.0)
 
-    def update_game_loop(self):
-        current_ms = self.player.position()
-        current_sec = current_ms / 1000.0
+    def update_game_loop(self, current_sec=None):
+        # Full refresh of playhead + chord (seek, nudge); playback is driven by the clock
+        if current_sec is None:
+            current_sec = self.current_position()
         self.waveform_widget.move_playhead(current_sec)
+        self.on_chord_boundary(current_sec)
+
+    def on_clock_tick(self, pos):
+        self.waveform_widget.move_playhead(pos)
+        self.clock.set_resolution(self.waveform_widget.seconds_per_pixel())
+        self.clock.set_min_interval(self.waveform_widget.redraw_interval_ms())
 
+    def on_chord_boundary(self, pos):
+        self.chord_timeline.set_position(pos)
         if self.chords:
-            idx = int(current_sec)
-            if 0 <= idx < len(self.chords):
-                raw = self.chords[idx]
+            raw = self.chord_at(pos)
+            if raw:
                 self.diagram_widget.set_chord(self.get_display_chord(raw))
 
+    def on_player_position(self, ms):
+        if not self.looping and self.clock.running:
+            self.clock.sync(ms / 1000.0)
+
+    def on_player_state(self, state):
+        if self.looping:
+            return
+        if state == QMediaPlayer.PlaybackState.PlayingState:
+            self.prerender_gate.clear()
+            if not self.clock.running:
+                self.clock.start(self.player.position() / 1000.0)
+        else:
+            self.prerender_gate.set()
+            self.clock.stop()
+
+    # ---------- Live input ----------
+
+    def toggle_live(self):
+        if self.live_input.is_active():
+            self.live_input.stop()
+            self.action_live.setChecked(False)
+            self.label_info.setText(os.path.basename(self.original_file_path) if self.original_file_path else "No Song Loaded")
+            return
+
+        if MicrophoneSource.available():
+            source = MicrophoneSource()
+            label = "Live: listening"
+        elif self.original_file_path:
+            # No input device: replay the loaded song as if it were played live
+            source = FileReplaySource(self.original_file_path, start_sec=self.current_position())
+            label = "Live: replaying song (no input device)"
+        else:
+            self.label_info.setText("No audio input found")
+            self.action_live.setChecked(False)
+            return
+
+        self.pause_audio()
+        self.live_input.detector.set_vocabulary(self.chord_type_mode)
+        self.live_input.start(source)
+        self.action_live.setChecked(True)
+        self.label_info.setText(label)
+
+    def on_live_chord(self, name):
+        if name == "N.C.":
+            return
+        # The instrument sounds the real chord; with a capo the shape sits lower
+        self.diagram_widget.set_chord(self.transpose_chord(name, -self.capo))
+
+    def on_live_failed(self, message):
+        self.live_input.stop()
+        self.action_live.setChecked(False)
+        self.label_info.setText(message)
+
     # ---------- Cleanup ----------
 
+    def resizeEvent(self, event):
+        if self.isVisible():
+            self.textures.note_resize()
+        super().resizeEvent(event)
+
+    def paintEvent(self, event):
+        # Stylesheet background colour, then the shell texture cropped to the window size
+        super().paintEvent(event)
+        p = QPainter(self)
+        self.textures.paint(p, "border_shell.png", self.size(), self.devicePixelRatioF())
+        p.end()
+
     def closeEvent(self, event):
         try:
+            self.scheduler.shutdown()
+            self.live_input.stop()
+            self.loop_player.stop()
+            self.player.setSource(QUrl())  # release the shifted file before deleting it
             self.engine.cleanup_temp_file()
+            self.pcm_cache.cleanup(keep=self.playback_path)
+            self.workspace.cleanup()
         except Exception as e:
             print(f"Error during cleanup on close: {e}")
         super().closeEvent(event)
@@ -0,0 +1,195 @@
+# CAPO_app/offscreen.py
+
+import os
+import glob
+import time
+import multiprocessing
+
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+from .waveform_view import WAVE_BG, draw_waveform, draw_chord_lane, draw_beat_ticks
+
+
+def decimate_peaks(times, values, duration, width: int):
+    """
+    Min/max envelope with one column per output pixel, so drawing cost
+    depends on the image width, not on the track length.
+    Returns (column times, lows, highs).
+    """
+    values = np.asarray(values, dtype=np.float32)
+    if len(values) == 0 or width <= 0:
+        return np.zeros(0), np.zeros(0), np.zeros(0)
+    edges = np.linspace(0, len(values), width + 1).astype(int)
+    edges = np.maximum.accumulate(np.maximum(edges, 1))
+    starts = np.minimum(edges[:-1], len(values) - 1)
+    lows = np.minimum.reduceat(values, starts)
+    highs = np.maximum.reduceat(values, starts)
+    return np.linspace(0, duration, width), lows, highs
+
+
+# ----------------- WAVEFORM THUMBNAILS (Agg) -----------------
+
+def render_waveform(peaks, segments=(), beat_times=None, width: int = 800, height: int = 160, dpi: int = 100):
+    """
+    Waveform + chord lane as an RGBA array (height, width, 4), drawn with
+    matplotlib's Agg backend: no Qt, no window.
+    """
+    times, values, duration = peaks
+    fig = Figure(figsize=(width / dpi, height / dpi), dpi=dpi, facecolor=WAVE_BG)
+    canvas = FigureCanvasAgg(fig)
+    fig.subplots_adjust(left=0, right=1, top=1, bottom=0)
+    ax = fig.add_subplot(111)
+
+    cols, lows, highs = decimate_peaks(times, values, duration, width)
+    line = draw_waveform(ax, cols, highs, duration)
+    ax.fill_between(cols, lows, highs, color=line.get_color(), linewidth=0)
+
+    if beat_times is not None and len(beat_times):
+        draw_beat_ticks(ax, beat_times)
+    if segments:
+        # Labels only when the average chord box is wide enough to hold one
+        px_per_chord = width * (segments[-1][1] - segments[0][0]) / max(duration, 1e-9) / len(segments)
+        draw_chord_lane(ax, segments, fontsize=7 if px_per_chord >= 24 else 0)
+
+    canvas.draw()
+    return np.asarray(canvas.buffer_rgba()).copy()
+
+
+def save_waveform(path: str, peaks, segments=(), beat_times=None, width: int = 800, height: int = 160):
+    import matplotlib.image
+    matplotlib.image.imsave(path, render_waveform(peaks, segments, beat_times, width, height), format="png")
+
+
+# ----------------- CHORD SHEETS (QImage) -----------------
+
+_gui_app = None
+
+
+def ensure_gui():
+    """
+    QPainter text needs a QGuiApplication; create an offscreen one if this
+    process (e.g. a pool worker) has none. It is kept for the process lifetime.
+    """
+    global _gui_app
+    from PyQt6.QtGui import QGuiApplication
+    if QGuiApplication.instance() is None:
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        _gui_app = QGuiApplication([])
+    return QGuiApplication.instance()
+
+
+def render_chord_sheet(chord_names, mode: str = "beginner", columns: int = 6,
+                       cell_w: int = 160, cell_h: int = 200):
+    """
+    Grid of chord diagrams (one per distinct chord, in order of first
+    appearance) painted into a QImage.
+    """
+    from PyQt6.QtGui import QImage, QPainter, QColor
+    from .chord_diagram import paint_chord_diagram, lookup_shape
+
+    ensure_gui()
+    names = [n for n in dict.fromkeys(chord_names) if n and n != "N.C."]
+    rows = max(1, -(-len(names) // columns))
+    image = QImage(columns * cell_w, rows * cell_h, QImage.Format.Format_ARGB32_Premultiplied)
+    image.fill(QColor(WAVE_BG))
+
+    painter = QPainter(image)
+    painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+    near = None
+    for i, name in enumerate(names):
+        positions = lookup_shape(name, mode, near)
+        frets = [f for _, f in positions if f > 0]
+        if frets:
+            near = sum(frets) / len(frets)
+        painter.save()
+        painter.translate((i % columns) * cell_w, (i // columns) * cell_h)
+        paint_chord_diagram(painter, cell_w, cell_h, name, positions, mode)
+        painter.restore()
+    painter.end()
+    return image
+
+
+# ----------------- BATCH RENDERING -----------------
+
+PART_SUFFIX = ".part"  # images being written; renamed when complete
+POOL_STARTUP_SEC = 10.0  # worker interpreters import numpy/matplotlib/Qt once
+
+def render_chart_images(chart, out_dir: str, mode: str = "beginner", budget_sec: float = 1.0):
+    """
+    Thumbnail (PNG, when the chart has peaks) and chord sheet for one chart.
+    Stops after the thumbnail if it alone used up the time budget. Each PNG
+    is written to a PART_SUFFIX file and renamed when complete, so a worker
+    killed mid-write (render_library) never leaves a truncated image.
+    Returns (title, written paths, seconds, within budget).
+    """
+    t0 = time.perf_counter()
+    base = os.path.join(out_dir, chart.title or chart.fingerprint or "chart")
+    written = []
+    if chart.peaks is not None:
+        path = base + "_waveform.png"
+        save_waveform(path + PART_SUFFIX, chart.peaks, chart.segments, chart.beat_times)
+        os.replace(path + PART_SUFFIX, path)
+        written.append(path)
+
+    if time.perf_counter() - t0 < budget_sec:
+        path = base + "_chords.png"
+        sheet = render_chord_sheet([n for _, _, n in chart.segments], mode)
+        if sheet.save(path + PART_SUFFIX, "PNG"):
+            os.replace(path + PART_SUFFIX, path)
+            written.append(path)
+
+    elapsed = time.perf_counter() - t0
+    return chart.title, written, elapsed, elapsed <= budget_sec
+
+
+def _render_task(base_path: str, out_dir: str, mode: str, budget_sec: float):
+    from .chord_chart import ChordChart
+    chart = ChordChart.load(base_path)
+    if chart is None:
+        return os.path.basename(base_path), [], 0.0, False
+    return render_chart_images(chart, out_dir, mode, budget_sec)
+
+
+def render_library(chart_paths, out_dir: str, mode: str = "beginner", workers: int | None = None,
+                   budget_sec: float = 1.0):
+    """
+    Render images for many saved charts (ChordChart base paths) across a
+    process pool. The batch gets `budget_sec` per image set and worker
+    (plus pool start-up time); charts still unfinished at that deadline are
+    reported as timed out and their workers are terminated, so nothing is
+    written after this returns. Completed images are never lost: each is
+    renamed into place only once fully written.
+    Returns a list of (title, written paths, seconds, within budget).
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    workers = workers or max(1, min(len(chart_paths), (os.cpu_count() or 2) - 1))
+    # spawn: a fresh interpreter per worker, never a forked copy of a Qt app
+    ctx = multiprocessing.get_context("spawn")
+    pool = ctx.Pool(processes=workers)
+    tasks = [(p, pool.apply_async(_render_task, (p, out_dir, mode, budget_sec))) for p in chart_paths]
+    pool.close()
+
+    results = []
+    timed_out = False
+    deadline = time.perf_counter() + POOL_STARTUP_SEC + budget_sec * -(-len(tasks) // workers)
+    for path, task in tasks:
+        try:
+            results.append(task.get(timeout=max(0.0, deadline - time.perf_counter())))
+        except multiprocessing.TimeoutError:
+            timed_out = True
+            results.append((os.path.basename(path), [], budget_sec, False))
+        except Exception as e:
+            print(f"Offscreen render failed for {path}: {e}")
+            results.append((os.path.basename(path), [], 0.0, False))
+    if timed_out:
+        pool.terminate()  # stop renders still running or queued
+    pool.join()
+    if timed_out:
+        for part in glob.glob(os.path.join(glob.escape(out_dir), "*" + PART_SUFFIX)):
+            try:
+                os.remove(part)
+            except OSError:
+                pass
+    return results
@@ -0,0 +1,20 @@
+# CAPO_app/paths.py
+
+import os
+import sys
+import tempfile
+
+
+def user_cache_dir(*parts) -> str:
+    """
+    Per-user cache folder for Capo (created on demand).
+    """
+    if os.name == "nt":
+        base = os.environ.get("LOCALAPPDATA") or tempfile.gettempdir()
+    elif sys.platform == "darwin":
+        base = os.path.expanduser("~/Library/Caches")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    path = os.path.join(base, "capo", *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
@@ -0,0 +1,167 @@
+# CAPO_app/pcm_cache.py
+
+import os
+import hashlib
+import numpy as np
+import soundfile as sf
+
+from .paths import user_cache_dir
+
+
+# Formats whose decode is slow enough (audioread / ffmpeg) to be worth caching.
+COMPRESSED_EXTENSIONS = ('.mp3', '.m4a', '.aac', '.ogg', '.opus', '.wma')
+
+# Entries hold the decoder's float32 samples untouched, so analysis on a cache
+# hit sees exactly what it saw on the miss. The suffix keeps older 16-bit
+# entries from being picked up (they age out through the LRU).
+ENTRY_SUFFIX = "-f32.wav"
+
+
+def file_fingerprint(file_path: str, block_size: int = 64 * 1024) -> str:
+    """
+    Cheap content fingerprint: size + first and last block of the file.
+    Stays valid if the file is moved or renamed.
+    """
+    size = os.path.getsize(file_path)
+    h = hashlib.sha1(str(size).encode())
+    with open(file_path, "rb") as f:
+        h.update(f.read(block_size))
+        if size > block_size:
+            f.seek(max(block_size, size - block_size))
+            h.update(f.read(block_size))
+    return h.hexdigest()
+
+
+class PCMCache:
+    """
+    Decoded-PCM copies of compressed tracks (float WAV, keyed by fingerprint).
+
+    Analysis reads the cached samples instead of re-decoding the MP3, and
+    QMediaPlayer plays the same WAV, so a track is decoded once per cache life.
+    """
+
+    def __init__(self, cache_dir: str | None = None, max_bytes: int = 2 * 1024 ** 3):
+        self.cache_dir = cache_dir or user_cache_dir("pcm")
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.max_bytes = max_bytes
+
+    # ----------------- LOOKUP -----------------
+
+    def is_cacheable(self, file_path: str) -> bool:
+        return os.path.splitext(file_path)[1].lower() in COMPRESSED_EXTENSIONS
+
+    def path_for(self, file_path: str) -> str:
+        return os.path.join(self.cache_dir, file_fingerprint(file_path) + ENTRY_SUFFIX)
+
+    def lookup(self, file_path: str) -> str | None:
+        """
+        Path of the cached PCM copy, or None on a miss.
+        """
+        if not self.is_cacheable(file_path):
+            return None
+        try:
+            cached = self.path_for(file_path)
+        except OSError:
+            return None
+        if not os.path.exists(cached):
+            return None
+        # Mark as recently used for LRU eviction
+        try:
+            os.utime(cached, None)
+        except OSError:
+            pass
+        return cached
+
+    def load(self, file_path: str):
+        """
+        Returns (y, sr, cached_path) with y shaped like librosa.load(mono=False),
+        or None on a miss / unreadable entry.
+        """
+        cached = self.lookup(file_path)
+        if cached is None:
+            return None
+        try:
+            data, sr = sf.read(cached, dtype="float32", always_2d=True)
+        except Exception as e:
+            print(f"Dropping unreadable cache entry {cached}: {e}")
+            self._remove(cached)
+            return None
+        y = data.T
+        if y.shape[0] == 1:
+            y = y[0]
+        print(f"PCM cache hit: {os.path.basename(file_path)}")
+        return np.ascontiguousarray(y), sr, cached
+
+    # ----------------- STORE -----------------
+
+    def store(self, file_path: str, y, sr: int) -> str | None:
+        """
+        Write y (librosa layout: (channels, samples) or (samples,)) as 32-bit float.
+        Returns the cached path, or None if the track is not cacheable.
+        """
+        if not self.is_cacheable(file_path):
+            return None
+        try:
+            cached = self.path_for(file_path)
+            partial = cached + ".partial"
+            data = y.T if y.ndim > 1 else y
+            sf.write(partial, data, sr, subtype="FLOAT", format="WAV")
+            os.replace(partial, cached)
+            print(f"PCM cache stored: {cached}")
+            self.trim(keep=cached)
+            return cached
+        except Exception as e:
+            print(f"Could not write PCM cache entry: {e}")
+            return None
+
+    # ----------------- EVICTION / CLEANUP -----------------
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def total_bytes(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def trim(self, keep: str | None = None):
+        """
+        Evict least-recently-used entries until the cache fits in max_bytes.
+        `keep` is never evicted (the track currently playing).
+        """
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            if self._remove(path):
+                total -= size
+
+    def cleanup(self, keep: str | None = None):
+        """
+        Remove half-written entries and enforce the size limit (called on exit).
+        """
+        for _, _, path in self._entries():
+            if path.endswith(".partial"):
+                self._remove(path)
+        self.trim(keep=keep)
+
+    def clear(self):
+        for _, _, path in self._entries():
+            self._remove(path)
+
+    def _remove(self, path: str) -> bool:
+        try:
+            os.remove(path)
+            return True
+        except OSError as e:
+            print(f"Could not remove cache entry {path}: {e}")
+            return False
@@ -0,0 +1,91 @@
+# CAPO_app/pipeline.py
+
+import time
+from collections import OrderedDict
+
+
+class Stage:
+    def __init__(self, name, func, inputs=(), params=(), keep=4):
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)  # upstream stage names
+        self.params = tuple(params)  # pipeline parameter names this stage reads
+        self.keep = keep             # memoized results kept per stage
+
+
+class AnalysisPipeline:
+    """
+    DAG of memoized analysis stages.
+
+    A stage's cache key is built from its own parameters plus the keys of its
+    inputs, so changing a parameter only recomputes the stages downstream of
+    it. E.g. switching chord vocabulary reuses decode/chroma/beats and only
+    re-scores the beat-synced chroma.
+    """
+
+    def __init__(self, before_stage=None):
+        self.stages = {}
+        self.params = {}
+        self._memo = {}  # stage name -> OrderedDict(key -> value), LRU
+        self.before_stage = before_stage  # e.g. a cancellation checkpoint
+        self.timings = {}  # stage name -> seconds of the last computation
+
+    def add_stage(self, name, func, inputs=(), params=(), keep=4):
+        self.stages[name] = Stage(name, func, inputs, params, keep)
+        self._memo[name] = OrderedDict()
+
+    def set_params(self, **params):
+        self.params.update(params)
+
+    def key(self, name):
+        stage = self.stages[name]
+        own = tuple((p, self.params.get(p)) for p in stage.params)
+        return own, tuple(self.key(i) for i in stage.inputs)
+
+    def is_cached(self, name) -> bool:
+        return self.key(name) in self._memo[name]
+
+    def get(self, name):
+        stage = self.stages[name]
+        key = self.key(name)
+        memo = self._memo[name]
+        if key in memo:
+            memo.move_to_end(key)
+            return memo[key]
+
+        args = [self.get(i) for i in stage.inputs]
+        if self.before_stage is not None:
+            self.before_stage()
+
+        t0 = time.perf_counter()
+        value = stage.func(*args, **{p: self.params.get(p) for p in stage.params})
+        self.timings[name] = time.perf_counter() - t0
+        print(f"Stage {name}: {self.timings[name] * 1000:.1f} ms")
+
+        memo[key] = value
+        while len(memo) > stage.keep:
+            memo.popitem(last=False)
+        return value
+
+    def adopt_memo(self, other):
+        """
+        Merge another pipeline's memoized results (same stage names) into
+        this one, e.g. to hand analysis done on a twin engine back.
+        """
+        for name, memo in other._memo.items():
+            if name not in self._memo:
+                continue
+            mine = self._memo[name]
+            for key, value in memo.items():
+                mine[key] = value
+                mine.move_to_end(key)
+            while len(mine) > self.stages[name].keep:
+                mine.popitem(last=False)
+
+    def invalidate(self, name=None):
+        """
+        Drop memoized results for one stage (or all).
+        """
+        names = [name] if name else list(self._memo)
+        for n in names:
+            self._memo[n].clear()
@@ -0,0 +1,168 @@
+# CAPO_app/playback_clock.py
+
+import bisect
+import math
+import time
+from PyQt6.QtCore import QObject, QTimer, Qt, pyqtSignal
+
+
+class PlaybackClock(QObject):
+    """
+    Interpolated playback position with event scheduling.
+
+    The audio backend reports positions coarsely (QMediaPlayer.positionChanged,
+    or the loop sink's consumed-sample count). The clock anchors on each
+    report and interpolates with a monotonic timer in between. Instead of
+    polling, it schedules:
+      * `boundary` exactly at the next event time (chord changes), and
+      * `tick` at display rate, but only as often as the playhead can move
+        by a pixel (set_resolution), so a zoomed-out view barely redraws,
+        and no faster than set_min_interval allows (a scrolling view).
+    Nothing runs while stopped.
+    """
+    tick = pyqtSignal(float)      # playhead position (song seconds)
+    boundary = pyqtSignal(float)  # an event time has been reached
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.anchor_pos = 0.0
+        self.anchor_t = time.perf_counter()
+        self.rate = 1.0
+        self.running = False
+        self.events = []    # sorted event times (song seconds)
+        self.loop = None    # (start, end) while A/B looping: position wraps
+        self.source = None  # optional callable polled for drift correction
+
+        self.frame_ms = 16  # display refresh interval
+        self.min_frame_ms = 0  # floor set by the view (full redraws cost more than a frame)
+        self.seconds_per_pixel = 0.0
+
+        self.frame_timer = QTimer(self)
+        self.frame_timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self.frame_timer.timeout.connect(self._on_frame)
+
+        self.event_timer = QTimer(self)
+        self.event_timer.setSingleShot(True)
+        self.event_timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self.event_timer.timeout.connect(self._on_event)
+
+        self.resync_timer = QTimer(self)
+        self.resync_timer.setInterval(250)
+        self.resync_timer.timeout.connect(self._on_resync)
+
+        self._pending_event = None
+
+    # ----------------- POSITION -----------------
+
+    def now(self) -> float:
+        pos = self.anchor_pos
+        if self.running:
+            pos += (time.perf_counter() - self.anchor_t) * self.rate
+        if self.loop is not None:
+            a, b = self.loop
+            if pos >= b and b > a:
+                pos = a + (pos - a) % (b - a)
+        return pos
+
+    def sync(self, pos: float):
+        """Re-anchor on a position reported by the audio backend."""
+        self.anchor_pos = pos
+        self.anchor_t = time.perf_counter()
+        self._reschedule()
+
+    # ----------------- CONTROL -----------------
+
+    def start(self, pos: float | None = None):
+        if pos is not None:
+            self.anchor_pos = pos
+        self.anchor_t = time.perf_counter()
+        self.running = True
+        self._update_frame_interval()
+        self.frame_timer.start()
+        if self.source is not None:
+            self.resync_timer.start()
+        self._reschedule()
+
+    def stop(self):
+        self.anchor_pos = self.now()
+        self.running = False
+        self.frame_timer.stop()
+        self.event_timer.stop()
+        self.resync_timer.stop()
+
+    def set_rate(self, rate: float):
+        self.anchor_pos = self.now()
+        self.anchor_t = time.perf_counter()
+        self.rate = rate
+        self._update_frame_interval()
+        self._reschedule()
+
+    def set_events(self, times):
+        self.events = sorted(times)
+        self._reschedule()
+
+    def set_loop(self, start, end):
+        self.loop = (start, end) if start is not None and end is not None else None
+        self._reschedule()
+
+    def set_refresh_rate(self, hz: float):
+        if hz and hz > 0:
+            self.frame_ms = max(1, int(1000.0 / hz))
+            self._update_frame_interval()
+
+    def set_min_interval(self, ms: int):
+        """Never tick more often than every `ms` (0: display rate)."""
+        if ms != self.min_frame_ms:
+            self.min_frame_ms = ms
+            self._update_frame_interval()
+
+    def set_resolution(self, seconds_per_pixel: float):
+        """How many song seconds one pixel of the waveform covers."""
+        if abs(seconds_per_pixel - self.seconds_per_pixel) > 1e-9:
+            self.seconds_per_pixel = seconds_per_pixel
+            self._update_frame_interval()
+
+    # ----------------- SCHEDULING -----------------
+
+    def _update_frame_interval(self):
+        # No point redrawing faster than the playhead crosses a pixel
+        pixel_ms = self.seconds_per_pixel / max(self.rate, 1e-6) * 1000.0
+        self.frame_timer.setInterval(int(min(250, max(self.frame_ms, self.min_frame_ms, pixel_ms))))
+
+    def _next_event(self, pos):
+        i = bisect.bisect_right(self.events, pos + 1e-4)
+        nxt = self.events[i] if i < len(self.events) else None
+        if self.loop is not None:
+            a, b = self.loop
+            if nxt is None or nxt >= b:
+                return b, a  # fire at the loop end, report the wrap to A
+        if nxt is None:
+            return None
+        return nxt, nxt
+
+    def _reschedule(self):
+        self.event_timer.stop()
+        self._pending_event = None
+        if not self.running:
+            return
+        pos = self.now()
+        nxt = self._next_event(pos)
+        if nxt is None:
+            return
+        fire_at, report = nxt
+        delay_ms = (fire_at - pos) / max(self.rate, 1e-6) * 1000.0
+        self._pending_event = report
+        # Round up: firing a hair late is invisible, firing early shows the old chord
+        self.event_timer.start(max(0, math.ceil(delay_ms)))
+
+    def _on_event(self):
+        if self._pending_event is not None:
+            self.boundary.emit(self._pending_event)
+        self._reschedule()
+
+    def _on_frame(self):
+        self.tick.emit(self.now())
+
+    def _on_resync(self):
+        if self.source is not None:
+            self.sync(self.source())
@@ -0,0 +1,84 @@
+# CAPO_app/setlist.py
+
+import os
+
+
+class Setlist:
+    """
+    Ordered practice setlist with a prefetch window.
+
+    While track `index` plays, the next `prefetch` tracks are analyzed in the
+    background. Finished AnalysisJobs (engine, chords, BPM, waveform peaks)
+    are kept in `prepared`, so switching tracks only swaps in that state.
+    """
+
+    def __init__(self, paths, prefetch: int = 2):
+        self.paths = list(paths)
+        self.index = 0
+        self.prefetch = prefetch
+        self.prepared = {}  # path -> finished AnalysisJob
+        self.pending = {}   # path -> queued/running AnalysisJob
+
+    def __len__(self):
+        return len(self.paths)
+
+    def current_path(self) -> str | None:
+        if 0 <= self.index < len(self.paths):
+            return self.paths[self.index]
+        return None
+
+    def label(self) -> str:
+        path = self.current_path()
+        name = os.path.basename(path) if path else ""
+        return f"[{self.index + 1}/{len(self.paths)}] {name}"
+
+    def move(self, step: int) -> str | None:
+        new_index = self.index + step
+        if not 0 <= new_index < len(self.paths):
+            return None
+        self.index = new_index
+        return self.paths[self.index]
+
+    # ----------------- PREFETCH WINDOW -----------------
+
+    def window(self):
+        """
+        Paths worth keeping in memory: previous, current and the next N tracks.
+        """
+        start = max(0, self.index - 1)
+        return self.paths[start:self.index + 1 + self.prefetch]
+
+    def to_prefetch(self):
+        upcoming = self.paths[self.index + 1:self.index + 1 + self.prefetch]
+        return [p for p in upcoming if p not in self.prepared and p not in self.pending]
+
+    def add_pending(self, job):
+        self.pending[job.file_path] = job
+
+    def complete(self, job) -> bool:
+        """
+        Record a finished job. Returns True if it belonged to this setlist.
+        """
+        if self.pending.get(job.file_path) is not job:
+            return False
+        del self.pending[job.file_path]
+        if job.success and not job.cancelled:
+            self.prepared[job.file_path] = job
+        return True
+
+    def take_prepared(self, path: str):
+        return self.prepared.pop(path, None)
+
+    def prune(self):
+        """
+        Drop prepared results and pending jobs that fell out of the window.
+        Returns the pending jobs that should be cancelled.
+        """
+        keep = set(self.window())
+        for path in list(self.prepared):
+            if path not in keep:
+                del self.prepared[path]
+        stale = [job for path, job in self.pending.items() if path not in keep]
+        for job in stale:
+            del self.pending[job.file_path]
+        return stale
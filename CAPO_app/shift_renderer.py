@@ -0,0 +1,222 @@
+# CAPO_app/shift_renderer.py
+
+import threading
+import numpy as np
+import librosa
+import soundfile as sf
+
+
+class ChunkedShiftRenderer:
+    """
+    Pitch-shifts a track in fixed-size chunks, on demand.
+
+    Rendered chunks are cached by (semitones, chunk index), so the chunks
+    around the playhead / loop can be rendered first and the rest filled in
+    later. Each chunk is rendered with context padding; a short crossfade at
+    every join hides the seam between independently processed chunks.
+    """
+
+    def __init__(self, y, sr: int, chunk_sec: float = 10.0, pad_sec: float = 0.5,
+                 crossfade_sec: float = 0.02, max_keys: int = 2):
+        self.y = y if y.ndim > 1 else y[None, :]  # (channels, samples)
+        self.sr = sr
+        self.chunk_len = int(chunk_sec * sr)
+        self.pad = int(pad_sec * sr)
+        self.xf = min(int(crossfade_sec * sr), self.pad)
+        self.n_samples = self.y.shape[1]
+        self.n_chunks = max(1, -(-self.n_samples // self.chunk_len))
+        self.max_keys = max_keys
+
+        self.cache = {}  # (semitones, index) -> float32 (samples + xf, channels)
+        self.key_order = []  # semitone values, least recently used first
+        self.lock = threading.Lock()
+        self.rendering = {}  # (semitones, index) -> threading.Event, set when that render ends
+        self.file_lock = threading.Lock()  # one patch_file writer at a time
+
+    # ----------------- CHUNK GEOMETRY -----------------
+
+    def chunk_range(self, index: int):
+        a = index * self.chunk_len
+        return a, min(self.n_samples, a + self.chunk_len)
+
+    def chunk_index(self, time_sec: float) -> int:
+        return max(0, min(self.n_chunks - 1, int(time_sec * self.sr) // self.chunk_len))
+
+    def priority_order(self, focus_times=()):
+        """
+        All chunk indices, nearest to any focus time (playhead, loop points) first.
+        """
+        focus = [self.chunk_index(t) for t in focus_times if t is not None] or [0]
+        return sorted(range(self.n_chunks), key=lambda i: min(abs(i - f) for f in focus))
+
+    def playback_order(self, start_sec: float):
+        """
+        All chunk indices in the order playback from start_sec needs them:
+        the playhead chunk and everything after it, then the earlier ones
+        (nearest first, for seeking back).
+        """
+        first = self.chunk_index(start_sec)
+        return list(range(first, self.n_chunks)) + list(range(first - 1, -1, -1))
+
+    # ----------------- RENDERING -----------------
+
+    def has_chunk(self, semitones: int, index: int) -> bool:
+        return (semitones, index) in self.cache
+
+    def missing(self, semitones: int, focus_times=()):
+        return [i for i in self.priority_order(focus_times) if not self.has_chunk(semitones, i)]
+
+    def is_complete(self, semitones: int) -> bool:
+        return not self.missing(semitones)
+
+    def render_chunk(self, semitones: int, index: int, cancel_event=None):
+        """
+        The rendered chunk (from the cache, or rendered now), or None if
+        cancelled. A chunk another thread is already rendering is waited
+        for instead of rendered twice.
+        """
+        key = (semitones, index)
+        while True:
+            with self.lock:
+                data = self.cache.get(key)
+                if data is not None:
+                    return data
+                pending = self.rendering.get(key)
+                if pending is None:
+                    pending = self.rendering[key] = threading.Event()
+                    break
+            # Rendered elsewhere: wait, then look again (that render may have been cancelled)
+            while not pending.wait(0.1):
+                if cancel_event is not None and cancel_event.is_set():
+                    return None
+
+        data = None
+        try:
+            data = self._render(semitones, index, cancel_event)
+        finally:
+            with self.lock:
+                del self.rendering[key]
+                if data is not None:
+                    self.cache[key] = data
+                    self._touch(semitones)
+            pending.set()
+        return data
+
+    def _render(self, semitones: int, index: int, cancel_event=None):
+        a, b = self.chunk_range(index)
+        lo = max(0, a - self.pad)
+        hi = min(self.n_samples, b + self.pad)
+
+        rendered = []
+        for channel in self.y:
+            if cancel_event is not None and cancel_event.is_set():
+                return None
+            rendered.append(librosa.effects.pitch_shift(channel[lo:hi], sr=self.sr, n_steps=semitones))
+
+        # Keep the chunk body plus `xf` samples of tail for the crossfade
+        head = a - lo
+        tail = min(self.xf, hi - b)
+        length = min(b - a + tail, min(len(r) for r in rendered) - head)
+        return np.stack([r[head:head + length] for r in rendered], axis=1).astype(np.float32)
+
+    def _touch(self, semitones: int):
+        if semitones in self.key_order:
+            self.key_order.remove(semitones)
+        self.key_order.append(semitones)
+        # Bound memory: drop chunks of the least recently used keys
+        while len(self.key_order) > self.max_keys:
+            stale = self.key_order.pop(0)
+            for key in [k for k in self.cache if k[0] == stale]:
+                del self.cache[key]
+
+    # ----------------- OUTPUT -----------------
+
+    def write_file(self, semitones: int, path: str):
+        """
+        Stream the shifted track to `path` chunk by chunk. Chunks not rendered
+        yet are written as silence, so the file always has the full duration.
+        """
+        self._write(path, (self.cache.get((semitones, i)) for i in range(self.n_chunks)))
+
+    def render_file(self, semitones: int, path: str, cancel_event=None, gate=None) -> bool:
+        """
+        Render the whole shifted track straight to `path`, one chunk in
+        memory at a time and without touching the chunk cache (background
+        pre-rendering of many keys). Before each chunk it waits while `gate`
+        (a threading.Event) is cleared. Returns False if cancelled; the
+        partial file is then left for the caller to remove.
+        """
+        def chunks():
+            for index in range(self.n_chunks):
+                while gate is not None and not gate.wait(0.1):
+                    if cancel_event is not None and cancel_event.is_set():
+                        return
+                data = self.cache.get((semitones, index))
+                if data is None:
+                    data = self._render(semitones, index, cancel_event)
+                if data is None:
+                    return
+                yield data
+
+        self._write(path, chunks())
+        return not (cancel_event is not None and cancel_event.is_set())
+
+    def patch_file(self, semitones: int, path: str, index: int, data=None) -> bool:
+        """
+        Write chunk `index` into a file made by write_file, in place (the
+        player may be reading it). `data` is the chunk as render_chunk
+        returned it; without it the cache is used, where another key may
+        have evicted it. The join with the previous chunk is crossfaded as
+        write_file would, and so is the join into the next chunk if that one
+        is already in the file. Returns False if there is no chunk data.
+        """
+        if data is None:
+            data = self.cache.get((semitones, index))
+        if data is None:
+            return False
+        channels = self.y.shape[0]
+        with self.file_lock, sf.SoundFile(path, "r+") as f:
+            a, _ = self.chunk_range(index)
+            f.seek(a)
+            block = self._block(index, data, self.cache.get((semitones, index - 1)))
+            f.write(block if channels > 1 else block[:, 0])
+
+            following = self.cache.get((semitones, index + 1))
+            if following is not None and self.xf > 0:
+                a, _ = self.chunk_range(index + 1)
+                head = self._block(index + 1, following, data)[:self.xf]
+                f.seek(a)
+                f.write(head if channels > 1 else head[:, 0])
+        return True
+
+    def _block(self, index: int, data, previous):
+        """
+        Samples of chunk `index` as written to the file: its body, with the
+        tail of the `previous` chunk's render (if any) crossfaded into the head.
+        """
+        a, b = self.chunk_range(index)
+        block = data[:b - a].copy()
+        if previous is not None and self.xf > 0 and len(block) >= self.xf:
+            pa, pb = self.chunk_range(index - 1)
+            carry = previous[pb - pa:]
+            n = min(len(carry), self.xf)
+            fade_in = np.linspace(0.0, 1.0, self.xf, dtype=np.float32)[:n, None]
+            block[:n] = carry[:n] * (1.0 - fade_in) + block[:n] * fade_in
+        if len(block) < b - a:
+            block = np.vstack([block, np.zeros((b - a - len(block), block.shape[1]), np.float32)])
+        return block
+
+    def _write(self, path: str, chunks):
+        """Write chunk data (or None for silence) in order, crossfading the joins."""
+        channels = self.y.shape[0]
+        previous = None  # previous chunk's render; its tail fades into this chunk's head
+
+        with sf.SoundFile(path, "w", samplerate=self.sr, channels=channels, subtype="PCM_16") as f:
+            for index, data in enumerate(chunks):
+                a, b = self.chunk_range(index)
+                if data is None:
+                    block = np.zeros((b - a, channels), dtype=np.float32)
+                else:
+                    block = self._block(index, data, previous)
+                previous = data
+                f.write(block if channels > 1 else block[:, 0])
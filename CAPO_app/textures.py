@@ -0,0 +1,276 @@
+# CAPO_app/textures.py
+
+import os
+from collections import OrderedDict
+
+from PyQt6.QtWidgets import QFrame
+from PyQt6.QtCore import Qt, QObject, QSize, QRectF, QPoint, QTimer, pyqtSignal
+from PyQt6.QtGui import QImage, QPixmap, QPainter, QPainterPath, QColor, QPen
+
+TEXTURE_CACHE_BYTES = 64 * 1024 ** 2  # scaled pixmaps kept across resizes / repaints
+RESIZE_SETTLE_MS = 150  # after the last resize step, textures are re-rendered smoothly
+DRAFT_SOURCE_SIDE = 512  # resize drafts are scaled from a copy at most this big
+
+CENTER = "center"    # unscaled, centered, cropped to the rect (what background-image drew)
+STRETCH = "stretch"  # fill the rect, ignoring aspect ratio (CSS background-size: 100% 100%)
+COVER = "cover"      # keep aspect ratio, fill the rect, crop the overflow (centered)
+
+
+class TextureManager(QObject):
+    """
+    Decodes each texture file once and hands out pixmaps already scaled to
+    the size they're painted at, per device pixel ratio, so a repaint is a
+    plain blit instead of a decode + smooth scale. Rounded corners are baked
+    in too, so nothing is clipped at paint time.
+
+    Scaled pixmaps are kept in an LRU bounded by `max_bytes`. While the
+    window is being resized (note_resize), sizes that aren't cached get a
+    draft instead, kept only while it is still being painted (`drafts`).
+    CENTER drafts are a plain crop and already final, so settling moves
+    them into the cache. STRETCH / COVER drafts are a fast scale of a small
+    copy of the image; `settled` fires RESIZE_SETTLE_MS after the last step
+    so textured widgets repaint with the smooth, cached version.
+    """
+
+    settled = pyqtSignal()
+
+    def __init__(self, assets_path: str, max_bytes: int = TEXTURE_CACHE_BYTES, parent=None):
+        super().__init__(parent)
+        self.assets_path = assets_path
+        self.max_bytes = max_bytes
+        self.images = {}
+        self.small = {}  # name -> copy no bigger than DRAFT_SOURCE_SIDE, for drafts
+        self.cache = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+        self.resizing = False
+        self.step = 0     # resize steps seen; drafts not painted since the last one are dropped
+        self.drafts = {}  # key -> (step, pixmap) while resizing
+        self.settle_timer = QTimer(self)
+        self.settle_timer.setSingleShot(True)
+        self.settle_timer.setInterval(RESIZE_SETTLE_MS)
+        self.settle_timer.timeout.connect(self.settle)
+
+    def note_resize(self):
+        """A resize step is under way: use fast scaling until it settles."""
+        self.resizing = True
+        self.drafts = {key: draft for key, draft in self.drafts.items() if draft[0] == self.step}
+        self.step += 1
+        self.settle_timer.start()
+
+    def settle(self):
+        self.settle_timer.stop()
+        # CENTER drafts painted at the final size are exact: keep them instead of re-rendering,
+        # and only ask for a repaint if a fast-scaled draft is still on screen
+        rough = False
+        for key, (step, pixmap) in self.drafts.items():
+            if key[4] == CENTER:
+                if step == self.step:
+                    self._store(key, pixmap)
+            else:
+                rough = True
+        self.drafts.clear()
+        if self.resizing:
+            self.resizing = False
+            if rough:
+                self.settled.emit()
+
+    def image(self, name: str) -> QImage:
+        """Decoded source image (null if the file is missing or unreadable)."""
+        img = self.images.get(name)
+        if img is None:
+            img = QImage(os.path.join(self.assets_path, name))
+            if img.isNull():
+                print(f"Could not load texture {name}")
+            else:
+                img = img.convertToFormat(QImage.Format.Format_ARGB32_Premultiplied)
+            self.images[name] = img
+        return img
+
+    def small_image(self, name: str) -> QImage:
+        """`name` smooth-scaled down once to fit DRAFT_SOURCE_SIDE, for resize drafts."""
+        img = self.small.get(name)
+        if img is None:
+            img = self.image(name)
+            if max(img.width(), img.height()) > DRAFT_SOURCE_SIDE:
+                img = img.scaled(DRAFT_SOURCE_SIDE, DRAFT_SOURCE_SIDE, Qt.AspectRatioMode.KeepAspectRatio,
+                                 Qt.TransformationMode.SmoothTransformation)
+            self.small[name] = img
+        return img
+
+    def pixmap(self, name: str, size: QSize, dpr: float = 1.0, mode: str = CENTER,
+               radius: float = 0.0) -> QPixmap | None:
+        """`name` scaled to `size` (logical pixels) at `dpr`; None without the texture."""
+        if size.isEmpty():
+            return None
+        key = (name, size.width(), size.height(), dpr, mode, radius)
+        pixmap = self.cache.get(key)
+        if pixmap is not None:
+            self.hits += 1
+            self.cache.move_to_end(key)
+            return pixmap
+
+        img = self.image(name)
+        if img.isNull():
+            return None
+        if self.resizing:
+            draft = self.drafts.get(key)
+            if draft is None:
+                source = img if mode == CENTER else self.small_image(name)
+                pixmap = self._render(source, size, dpr, mode, radius, Qt.TransformationMode.FastTransformation)
+            else:
+                pixmap = draft[1]
+            self.drafts[key] = (self.step, pixmap)
+            return pixmap
+        self.misses += 1
+        pixmap = self._render(img, size, dpr, mode, radius, Qt.TransformationMode.SmoothTransformation)
+        self._store(key, pixmap)
+        return pixmap
+
+    def paint(self, p: QPainter, name: str, size: QSize, dpr: float = 1.0, mode: str = CENTER,
+              radius: float = 0.0) -> bool:
+        """
+        Paint `name` over (0, 0, size) with `p`; False without the texture.
+        CENTER is drawn straight from the source, the way the stylesheet drew
+        it: a clipped blit costs no more than blitting a cached copy, and a
+        window-sized copy per ratio would crowd the scaled textures out.
+        """
+        if mode == CENTER:
+            if size.isEmpty():
+                return False
+            img = self.image(name)
+            if img.isNull():
+                return False
+            self._draw_center(p, img, size, radius)
+            return True
+        pixmap = self.pixmap(name, size, dpr, mode, radius)
+        if pixmap is None:
+            return False
+        p.drawPixmap(0, 0, pixmap)
+        return True
+
+    def covers(self, name: str, size: QSize, mode: str = CENTER) -> bool:
+        """Whether `name` paints every pixel of `size`, so a fill under it would be wasted."""
+        img = self.image(name)
+        if img.isNull():
+            return False
+        return mode != CENTER or (img.width() >= size.width() and img.height() >= size.height())
+
+    def _store(self, key, pixmap: QPixmap):
+        if key in self.cache:
+            return
+        self.cache[key] = pixmap
+        self.bytes += _pixmap_bytes(pixmap)
+        while self.bytes > self.max_bytes and len(self.cache) > 1:
+            _, old = self.cache.popitem(last=False)
+            self.bytes -= _pixmap_bytes(old)
+
+    def clear(self):
+        self.cache.clear()
+        self.drafts.clear()
+        self.small.clear()
+        self.bytes = 0
+
+    @staticmethod
+    def _render(img: QImage, size: QSize, dpr: float, mode: str, radius: float,
+                transform: Qt.TransformationMode) -> QPixmap:
+        target = QSize(max(1, round(size.width() * dpr)), max(1, round(size.height() * dpr)))
+        if mode == CENTER:
+            return TextureManager._render_center(img, size, dpr, target, radius)
+        if mode == COVER:
+            scaled = img.scaled(target, Qt.AspectRatioMode.KeepAspectRatioByExpanding, transform)
+            x = (scaled.width() - target.width()) // 2
+            y = (scaled.height() - target.height()) // 2
+            scaled = scaled.copy(x, y, target.width(), target.height())
+        else:
+            scaled = img.scaled(target, Qt.AspectRatioMode.IgnoreAspectRatio, transform)
+
+        if radius > 0:
+            rounded = QImage(target, QImage.Format.Format_ARGB32_Premultiplied)
+            rounded.fill(Qt.GlobalColor.transparent)
+            p = QPainter(rounded)
+            p.setRenderHint(QPainter.RenderHint.Antialiasing)
+            path = QPainterPath()
+            path.addRoundedRect(QRectF(0, 0, target.width(), target.height()), radius * dpr, radius * dpr)
+            p.setClipPath(path)
+            p.drawImage(0, 0, scaled)
+            p.end()
+            scaled = rounded
+
+        pixmap = QPixmap.fromImage(scaled)
+        pixmap.setDevicePixelRatio(dpr)
+        return pixmap
+
+    @staticmethod
+    def _render_center(img: QImage, size: QSize, dpr: float, target: QSize, radius: float) -> QPixmap:
+        pixmap = QPixmap(target)
+        pixmap.fill(Qt.GlobalColor.transparent)
+        p = QPainter(pixmap)
+        p.scale(dpr, dpr)
+        TextureManager._draw_center(p, img, size, radius)
+        p.end()
+        pixmap.setDevicePixelRatio(dpr)
+        return pixmap
+
+    @staticmethod
+    def _draw_center(p: QPainter, img: QImage, size: QSize, radius: float):
+        # The image at its own size, centered, clipped to the rounded rect. Like the
+        # stylesheet, a 1x image is drawn at 1 logical pixel per image pixel.
+        p.save()
+        if radius > 0:
+            p.setRenderHint(QPainter.RenderHint.Antialiasing)
+            path = QPainterPath()
+            path.addRoundedRect(QRectF(0, 0, size.width(), size.height()), radius, radius)
+            p.setClipPath(path)
+        p.drawImage(QPoint((size.width() - img.width()) // 2, (size.height() - img.height()) // 2), img)
+        p.restore()
+
+
+def _pixmap_bytes(pixmap: QPixmap) -> int:
+    return pixmap.width() * pixmap.height() * 4
+
+
+class TexturedFrame(QFrame):
+    """
+    QFrame with a texture background, an optional rounded border and a
+    fill color under it, painted from a TextureManager instead of a
+    stylesheet background-image. The contents margins leave room for the
+    border plus `padding`, as the stylesheet box model did. The top-level
+    window is expected to call textures.note_resize() from its resizeEvent.
+    """
+
+    def __init__(self, textures: TextureManager, texture: str, mode: str = CENTER, radius: float = 0.0,
+                 border: int = 0, border_color: str = "#d2ad61", background: str | None = None,
+                 padding: int = 0, parent=None):
+        super().__init__(parent)
+        self.textures = textures
+        self.texture = texture
+        self.mode = mode
+        self.radius = radius
+        self.border = border
+        self.border_color = QColor(border_color)
+        self.background = QColor(background) if background else None
+        margin = border + padding
+        self.setContentsMargins(margin, margin, margin, margin)
+        textures.settled.connect(self.update)
+
+    def paintEvent(self, event):
+        p = QPainter(self)
+        p.setRenderHint(QPainter.RenderHint.Antialiasing)
+        rect = QRectF(self.rect())
+        if self.background is not None and not self.textures.covers(self.texture, self.size(), self.mode):
+            p.setPen(Qt.PenStyle.NoPen)
+            p.setBrush(self.background)
+            p.drawRoundedRect(rect, self.radius, self.radius)
+
+        self.textures.paint(p, self.texture, self.size(), self.devicePixelRatioF(), self.mode, self.radius)
+
+        if self.border:
+            half = self.border / 2
+            p.setPen(QPen(self.border_color, self.border))
+            p.setBrush(Qt.BrushStyle.NoBrush)
+            p.drawRoundedRect(rect.adjusted(half, half, -half, -half),
+                              max(0.0, self.radius - half), max(0.0, self.radius - half))
+        p.end()
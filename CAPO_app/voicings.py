@@ -0,0 +1,263 @@
+# CAPO_app/voicings.py
+
+import os
+from collections import OrderedDict
+import numpy as np
+
+from .audio_engine import PITCHES, CHORD_QUALITIES, split_chord_name
+from .paths import user_cache_dir
+
+# Open-string pitches, string 6 (low E) -> string 1 (high E)
+STANDARD_TUNING = (40, 45, 50, 55, 59, 64)
+
+# Everything the detector emits plus common chart symbols
+VOICING_QUALITIES = dict(CHORD_QUALITIES, **{
+    "sus2": (0, 2, 7),
+    "sus4": (0, 5, 7),
+    "dim":  (0, 3, 6),
+    "aug":  (0, 4, 8),
+    "6":    (0, 4, 7, 9),
+    "m6":   (0, 3, 7, 9),
+    "dim7": (0, 3, 6, 9),
+    "m7b5": (0, 3, 6, 10),
+    "7sus4": (0, 5, 7, 10),
+    "add9": (0, 2, 4, 7),
+    "9":    (0, 2, 4, 7, 10),
+})
+
+# Alternative spellings -> canonical suffix
+QUALITY_ALIASES = {
+    "maj": "", "M": "", "min": "m", "-": "m", "sus": "sus4", "+": "aug",
+    "°": "dim", "o": "dim", "ø": "m7b5", "M7": "maj7", "min7": "m7", "-7": "m7",
+}
+
+MUTED = -1
+
+# Bump when generate_voicings changes, so stale cached tables are rebuilt
+TABLE_VERSION = 1
+
+
+FLATS = {"Db": "C#", "Eb": "D#", "Gb": "F#", "Ab": "G#", "Bb": "A#", "Cb": "B", "Fb": "E"}
+
+
+def pitch_class(note: str):
+    note = FLATS.get(note, note)
+    return PITCHES.index(note) if note in PITCHES else None
+
+
+def parse_chord(name: str):
+    """
+    "C#m7/G#" -> (root pc, canonical suffix, bass pc); None if unknown.
+    """
+    name = name.strip()
+    bass = None
+    if "/" in name:
+        name, bass_name = name.split("/", 1)
+        bass = pitch_class(bass_name)
+        if bass is None:
+            return None
+    if name[1:2] == "b":
+        root_name, suffix = name[:2], name[2:]
+    else:
+        root_name, suffix = split_chord_name(name)
+    root = pitch_class(root_name)
+    suffix = QUALITY_ALIASES.get(suffix, suffix)
+    if root is None or suffix not in VOICING_QUALITIES:
+        return None
+    return root, suffix, root if bass is None else bass
+
+
+def chord_mask(root: int, suffix: str, bass: int) -> int:
+    mask = 1 << bass
+    for interval in VOICING_QUALITIES[suffix]:
+        mask |= 1 << ((root + interval) % 12)
+    return mask
+
+
+# ----------------- GENERATION -----------------
+
+def generate_voicings(tuning=STANDARD_TUNING, max_fret: int = 15, span: int = 4):
+    """
+    Every playable fingering, vectorized.
+
+    Each string is muted, open, or fretted inside a `span`-fret window; all
+    6^6 combinations are enumerated once per window position and filtered
+    with array ops. Returns (frets (n, 6) int8 with MUTED for unplayed
+    strings, pitch-class masks (n,), bass pitch classes (n,), stretch costs (n,)).
+    """
+    n_strings = len(tuning)
+    tuning = np.array(tuning)
+    # Option per string: 0 = muted, 1 = open, 2.. = window fret 0..span-1
+    options = np.indices((span + 2,) * n_strings).reshape(n_strings, -1).T
+
+    # Each fingering belongs to the window starting at its lowest fretted
+    # note (fully open/muted ones to the first window), so none repeats
+    in_first = (options == 2).any(axis=1)
+    in_none = (options < 2).all(axis=1)
+    all_frets = []
+    for start in range(1, max_fret - span + 2):
+        keep = in_first | in_none if start == 1 else in_first
+        all_frets.append(np.where(options >= 2, options - 2 + start, options - 1)[keep])
+    frets = np.concatenate(all_frets)
+
+    muted = frets == MUTED
+    fretted = frets > 0
+    sounding = ~muted
+
+    # Muted strings only on the bass side, and at least four strings sounding
+    first_sounding = np.argmax(sounding, axis=1)
+    ok = (sounding.sum(axis=1) >= 4) & sounding.any(axis=1)
+    ok &= (sounding == (np.arange(n_strings)[None, :] >= first_sounding[:, None])).all(axis=1)
+
+    big = np.iinfo(np.int16).max
+    lowest = np.where(fretted, frets, big).min(axis=1)
+    highest = np.where(fretted, frets, 0).max(axis=1)
+    lowest = np.where(fretted.any(axis=1), lowest, 0)
+
+    # Fingers: past four fretted notes, one finger has to barre the lowest fret
+    at_lowest = fretted & (frets == lowest[:, None])
+    barre = fretted.sum(axis=1) > 4
+    fingers = fretted.sum(axis=1) - np.where(barre, at_lowest.sum(axis=1) - 1, 0)
+    ok &= fingers <= 4
+
+    # A barre can't leave an open string above its lowest string
+    barre_from = np.argmax(at_lowest, axis=1)
+    open_above = ((frets == 0) & (np.arange(n_strings)[None, :] > barre_from[:, None])).any(axis=1)
+    ok &= ~(barre & open_above)
+
+    frets, muted, fretted = frets[ok], muted[ok], fretted[ok]
+    lowest, highest, fingers, barre = lowest[ok], highest[ok], fingers[ok], barre[ok]
+    first_sounding = first_sounding[ok]
+
+    pcs = (frets + tuning[None, :]) % 12
+    masks = np.where(muted, 0, 1 << pcs).astype(np.int64)
+    masks = np.bitwise_or.reduce(masks, axis=1)
+    bass = pcs[np.arange(len(frets)), first_sounding]
+
+    stretch = np.where(fretted.any(axis=1), highest - lowest, 0)
+    cost = (0.8 * stretch + 0.4 * fingers + 0.8 * barre
+            + 0.3 * np.maximum(lowest - 3, 0)
+            - 0.35 * (~muted).sum(axis=1))
+    return frets.astype(np.int8), masks, bass, cost
+
+
+# ----------------- INDEX -----------------
+
+class VoicingIndex:
+    """
+    Voicings grouped by (pitch-class mask, bass), each group sorted by
+    stretch cost. A chord symbol maps to exactly one such key, so every root,
+    quality and slash bass is a dict lookup. Choosing between the best few
+    candidates by distance to the previous voicing is memoized too.
+    """
+
+    def __init__(self, frets, masks, bass, cost, candidates: int = 8, memo_size: int = 4096):
+        order = np.argsort(cost, kind="stable")
+        self.frets = frets[order]
+        self.cost = cost[order]
+
+        self.groups = {}  # (mask, bass) -> voicing ids, cheapest first
+        keys = masks[order] * 12 + bass[order]
+        uniq, counts = np.unique(keys, return_counts=True)
+        by_key = np.argsort(keys, kind="stable")
+        for key, start, count in zip(uniq.tolist(), np.cumsum(counts) - counts, counts):
+            self.groups[(key // 12, key % 12)] = by_key[start:start + count][:candidates].tolist()
+
+        self.masks = masks[order]
+        self.bass = bass[order]
+
+        self.memo = OrderedDict()
+        self.memo_size = memo_size
+
+    @classmethod
+    def build(cls):
+        return cls(*generate_voicings())
+
+    @classmethod
+    def load(cls, path: str):
+        with np.load(path) as table:
+            return cls(table["frets"], table["masks"], table["bass"], table["cost"])
+
+    def save(self, path: str):
+        tmp = path + ".partial.npz"
+        np.savez_compressed(tmp, frets=self.frets, masks=self.masks.astype(np.int16),
+                            bass=self.bass.astype(np.int8), cost=self.cost.astype(np.float32))
+        os.replace(tmp, path)
+
+    def candidates(self, name: str):
+        parsed = parse_chord(name)
+        if parsed is None:
+            return []
+        root, suffix, bass = parsed
+        ids = self.groups.get((chord_mask(root, suffix, bass), bass))
+        if not ids and len(VOICING_QUALITIES[suffix]) > 3:
+            # Extended chords: the fifth is the usual note to leave out
+            ids = self.groups.get((chord_mask(root, suffix, bass) & ~(1 << ((root + 7) % 12)) | (1 << bass), bass))
+        return ids or []
+
+    def position(self, voicing_id: int) -> float:
+        frets = self.frets[voicing_id]
+        fretted = frets[frets > 0]
+        return float(fretted.mean()) if len(fretted) else 0.0
+
+    def best(self, name: str, near: float | None = None, max_fret: int | None = None):
+        """
+        Voicing id for `name`, preferring low stretch and (if given) a hand
+        position close to `near` (mean fretted fret of the previous chord).
+        """
+        key = (name, None if near is None else round(near), max_fret)
+        if key in self.memo:
+            self.memo.move_to_end(key)
+            return self.memo[key]
+
+        ids = self.candidates(name)
+        if max_fret is not None:
+            ids = [i for i in ids if self.frets[i].max() <= max_fret] or ids
+        best = None
+        if ids:
+            if near is None:
+                best = ids[0]
+            else:
+                best = min(ids, key=lambda i: self.cost[i] + 0.5 * abs(self.position(i) - near))
+
+        self.memo[key] = best
+        while len(self.memo) > self.memo_size:
+            self.memo.popitem(last=False)
+        return best
+
+    def shape(self, voicing_id):
+        """
+        Diagram positions [(string number, fret), ...]; open strings as fret 0.
+        """
+        if voicing_id is None:
+            return []
+        frets = self.frets[voicing_id]
+        return [(6 - i, int(f)) for i, f in enumerate(frets) if f != MUTED]
+
+
+_index = None
+
+
+def get_voicing_index() -> VoicingIndex:
+    """
+    Shared index: loaded from the compact table in the user cache, or
+    generated (and saved there) on first run.
+    """
+    global _index
+    if _index is not None:
+        return _index
+
+    path = os.path.join(user_cache_dir(), f"voicings-v{TABLE_VERSION}.npz")
+    if os.path.exists(path):
+        try:
+            _index = VoicingIndex.load(path)
+            return _index
+        except Exception as e:
+            print(f"Voicing table unreadable, rebuilding: {e}")
+
+    _index = VoicingIndex.build()
+    try:
+        _index.save(path)
+    except Exception as e:
+        print(f"Could not save voicing table: {e}")
+    return _index
@@ -5,6 +5,85 @@ from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
 import matplotlib.patches as mpatches
 
+
+def compute_peaks(y, sr, target_points=10000):
+    """
+    Downsampled, normalized waveform for display: (times, values, duration).
+    Pure NumPy, so workers can precompute it off the GUI thread.
+    """
+    if y.ndim > 1:
+        y = np.mean(y, axis=0)
+
+    duration = len(y) / sr
+
+    # Downsample
+    step = max(1, len(y) // target_points)
+    y_fast = y[::step]
+
+    # --- FIX: NORMALIZE SMALLER TO PREVENT OVERLAP ---
+    # Scale to 0.75 so the bottom of the wave doesn't touch the chords
+    max_val = np.max(np.abs(y_fast)) if len(y_fast) > 0 else 0
+    if max_val > 0:
+        y_fast = y_fast / max_val * 0.75
+
+    times = np.arange(len(y_fast)) * step / sr
+    return times, y_fast, duration
+
+
+WAVE_BG = '#0b0a08'    # Dark Almost-Black background
+WAVE_LINE = '#00ffcc'  # Bright Cyan
+
+
+# ----------------- DRAWING (shared with offscreen rendering) -----------------
+
+def draw_waveform(ax, times, values, duration, line_color=WAVE_LINE, bg_color=WAVE_BG):
+    """Waveform on a bare axis, with room below it for the chord lane."""
+    ax.set_facecolor(bg_color)
+    ax.axis('off')
+    line, = ax.plot(times, values, color=line_color, linewidth=1.2)
+    # --- FIX: EXPAND Y LIMITS ---
+    # By setting bottom to -1.5, we create 'empty space' below -0.75 for the chords
+    ax.set_xlim(0, duration)
+    ax.set_ylim(-1.5, 1.0)
+    return line
+
+
+def draw_chord_lane(ax, segments, fontsize=9):
+    """Chord boxes and labels for (start_sec, end_sec, name) segments; returns the artists."""
+    artists = []
+    for start, end, chord_name in segments:
+        duration = end - start
+        width = max(duration - 0.05, 0.01)
+        center_x = start + (duration / 2)
+
+        # --- FIX: MOVE CHORDS LOWER ---
+        # y = -1.35 puts them safely in the margin we created
+        box = mpatches.FancyBboxPatch(
+            (start, -1.45), width, 0.35,
+            boxstyle="round,pad=0.02,rounding_size=0.1",
+            facecolor="#e0b168",
+            edgecolor="#d2ad61",
+            mutation_scale=1
+        )
+        ax.add_patch(box)
+        artists.append(box)
+
+        if fontsize:
+            text = ax.text(center_x, -1.28, chord_name,
+                           color='#1a0e05', fontsize=fontsize, fontweight='bold',
+                           ha='center', va='center', clip_on=True)
+            artists.append(text)
+    return artists
+
+
+SCROLL_REDRAW_MS = 50  # zoomed in, the view scrolls with the playhead: full redraws at most this often
+
+
+def draw_beat_ticks(ax, beat_times):
+    """Small beat ticks just above the chord lane."""
+    return ax.vlines(beat_times, -1.08, -0.98, color='#8d6e63', linewidth=1)
+
+
 class WaveformView(QWidget):
     time_clicked = pyqtSignal(float) 
 
@@ -15,9 +94,8 @@ class WaveformView(QWidget):
         layout.setContentsMargins(0, 0, 0, 0)
         self.setLayout(layout)
         
-        # Dark Almost-Black background
-        self.bg_color = '#0b0a08'
-        self.line_color = '#00ffcc' # Bright Cyan
+        self.bg_color = WAVE_BG
+        self.line_color = WAVE_LINE
         
         self.figure = Figure(figsize=(5, 2), dpi=100, facecolor=self.bg_color)
         
@@ -33,11 +111,17 @@ class WaveformView(QWidget):
         self.ax.axis('off') 
         
         self.canvas.mpl_connect('button_press_event', self.on_click)
+        # The playhead is animated (left out of full draws) and blitted over
+        # a copy of everything else, taken after each full draw
+        self.canvas.mpl_connect('draw_event', self.on_draw)
+        self.background = None
 
         self.duration = 0 
         self.visible_duration = 10 
         self.current_start = 0 
         self.chord_artists = [] 
+        self.beat_artist = None
+        self.loop_artist = None
         self.playhead = None
         
         self.canvas.draw()
@@ -46,108 +130,110 @@ class WaveformView(QWidget):
         pass
 
     def plot_audio(self, y, sr):
+        self.plot_peaks(*compute_peaks(y, sr))
+
+    def plot_peaks(self, times, values, duration):
+        """Draw precomputed peaks (see compute_peaks)."""
         self.ax.clear()
         self.ax.set_facecolor(self.bg_color)
         self.ax.axis('off')
-        
-        if y.ndim > 1:
-            y = np.mean(y, axis=0)
-            
-        self.duration = len(y) / sr
+        self.chord_artists.clear()
+        self.beat_artist = None
+        self.loop_artist = None
+
+        self.duration = duration
         self.visible_duration = self.duration 
         self.current_start = 0
         
-        # Downsample
-        target_points = 10000 
-        step = max(1, len(y) // target_points)
-        y_fast = y[::step] 
-        
-        # --- FIX: NORMALIZE SMALLER TO PREVENT OVERLAP ---
-        # Scale to 0.75 so the bottom of the wave doesn't touch the chords
-        max_val = np.max(np.abs(y_fast)) if len(y_fast) > 0 else 0
-        if max_val > 0:
-            y_fast = y_fast / max_val * 0.75
-            
-        times = np.arange(len(y_fast)) * step / sr
-        
-        self.line, = self.ax.plot(times, y_fast, color=self.line_color, linewidth=1.2)
+        self.line = draw_waveform(self.ax, times, values, duration, self.line_color, self.bg_color)
         
         # Playhead (Full height)
-        self.playhead, = self.ax.plot([0, 0], [-1.5, 1.5], color='white', linewidth=2)
-        
-        # --- FIX: EXPAND Y LIMITS ---
-        # By setting bottom to -1.5, we create 'empty space' below -0.75 for the chords
-        self.ax.set_xlim(0, self.visible_duration)
-        self.ax.set_ylim(-1.5, 1.0) 
+        self.playhead, = self.ax.plot([0, 0], [-1.5, 1.5], color='white', linewidth=2, animated=True)
         
         self.canvas.draw()
 
-    def plot_chords(self, chords):
+    def plot_chords(self, segments):
+        """
+        Draw chord boxes from (start_sec, end_sec, name) segments.
+        Segments follow the beat grid, so boxes line up with the music.
+        """
         for artist in self.chord_artists:
             try: artist.remove()
             except: pass
         self.chord_artists.clear() 
 
-        if not chords:
+        if not segments:
             self.canvas.draw()
             return
 
-        segments = self.group_chords(chords)
-        
-        for chord_name, start, duration in segments:
-            width = duration - 0.05 
-            center_x = start + (duration / 2)
-            
-            # --- FIX: MOVE CHORDS LOWER ---
-            # y = -1.35 puts them safely in the margin we created
-            box = mpatches.FancyBboxPatch(
-                (start, -1.45), width, 0.35, 
-                boxstyle="round,pad=0.02,rounding_size=0.1",
-                facecolor="#e0b168", 
-                edgecolor="#d2ad61",
-                mutation_scale=1
-            )
-            self.ax.add_patch(box)
-            self.chord_artists.append(box) 
-            
-            text = self.ax.text(center_x, -1.28, chord_name, 
-                         color='#1a0e05', fontsize=9, fontweight='bold',
-                         ha='center', va='center')
-            self.chord_artists.append(text) 
-        
+        self.chord_artists.extend(draw_chord_lane(self.ax, segments))
+        self.canvas.draw()
+
+    def plot_beats(self, beat_times):
+        """Small beat ticks just above the chord lane."""
+        if self.beat_artist is not None:
+            try: self.beat_artist.remove()
+            except: pass
+            self.beat_artist = None
+
+        if beat_times is None or len(beat_times) == 0:
+            return
+
+        self.beat_artist = draw_beat_ticks(self.ax, beat_times)
         self.canvas.draw()
 
+    def set_loop_region(self, start, end):
+        """Shade the A/B loop region (end=None marks just the A point)."""
+        if self.loop_artist is not None:
+            try: self.loop_artist.remove()
+            except: pass
+            self.loop_artist = None
+
+        if start is not None:
+            if end is None:
+                self.loop_artist = self.ax.axvline(start, color='#f2d48a', linewidth=1.5)
+            else:
+                self.loop_artist = self.ax.axvspan(start, end, color='#f2d48a', alpha=0.18)
+        self.canvas.draw()
+
+    def on_draw(self, event):
+        self.background = self.canvas.copy_from_bbox(self.figure.bbox)
+        if self.playhead:
+            self.ax.draw_artist(self.playhead)
+
     def move_playhead(self, current_time_sec):
         if self.playhead:
             self.playhead.set_data([current_time_sec, current_time_sec], [-1.5, 1.5])
             
+            start = self.current_start
             if self.visible_duration < self.duration:
                 half_view = self.visible_duration / 2
                 target_start = current_time_sec - half_view
                 
-                if target_start < 0: self.current_start = 0
+                if target_start < 0: start = 0
                 elif target_start > self.duration - self.visible_duration:
-                    self.current_start = self.duration - self.visible_duration
-                else: self.current_start = target_start
-                    
+                    start = self.duration - self.visible_duration
+                else: start = target_start
+
+            if start != self.current_start or self.background is None:
+                # The view scrolls: full redraw, coalesced with any other pending repaint
+                self.current_start = start
                 self.ax.set_xlim(self.current_start, self.current_start + self.visible_duration)
-                
-            self.canvas.draw()
+                self.canvas.draw_idle()
+                return
+
+            # Static view: repaint only the playhead over the cached background
+            self.canvas.restore_region(self.background)
+            self.ax.draw_artist(self.playhead)
+            self.canvas.blit(self.figure.bbox)
+
+    def redraw_interval_ms(self) -> int:
+        """Shortest useful interval between playhead updates (see PlaybackClock.set_min_interval)."""
+        return SCROLL_REDRAW_MS if 0 < self.visible_duration < self.duration else 0
+
+    def seconds_per_pixel(self):
+        return self.visible_duration / max(1, self.canvas.width())
 
-    def group_chords(self, chords):
-        if not chords: return []
-        grouped = []
-        current_chord = chords[0]
-        current_start = 0
-        for i in range(1, len(chords)):
-            if chords[i] != current_chord:
-                duration = i - current_start
-                grouped.append((current_chord, current_start, duration))
-                current_chord = chords[i]
-                current_start = i
-        grouped.append((current_chord, current_start, len(chords) - current_start))
-        return grouped
-    
     def zoom_in(self):
         self.visible_duration *= 0.8
         if self.visible_duration < 1: self.visible_duration = 1
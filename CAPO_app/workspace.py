@@ -0,0 +1,147 @@
+# CAPO_app/workspace.py
+
+import os
+import shutil
+import socket
+import threading
+import uuid
+
+from .paths import user_cache_dir
+
+LOCK_NAME = "session.lock"
+
+
+def pid_alive(pid: int) -> bool:
+    if pid <= 0:
+        return False
+    if os.name == "nt":
+        import ctypes
+        PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+        handle = ctypes.windll.kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+        if not handle:
+            return False
+        ctypes.windll.kernel32.CloseHandle(handle)
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # exists, owned by someone else
+    return True
+
+
+class Workspace:
+    """
+    Per-session scratch folder on local disk (the user cache, never the
+    song's folder, which may be read-only or a network share).
+
+    Every Capo instance gets its own folder with a lock file holding its pid,
+    so two instances never collide. Files handed out are tracked with their
+    sizes; cleanup() removes the whole folder on exit, and recover_stale()
+    removes folders left behind by sessions that crashed.
+    """
+
+    def __init__(self, root: str | None = None, max_bytes: int = 4 * 1024 ** 3):
+        self.root = root or user_cache_dir("sessions")
+        os.makedirs(self.root, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.path = os.path.join(self.root, f"session-{os.getpid()}-{uuid.uuid4().hex[:8]}")
+        os.makedirs(self.path)
+        with open(os.path.join(self.path, LOCK_NAME), "w") as f:
+            f.write(f"{os.getpid()}\n{socket.gethostname()}\n")
+        self.files = {}  # path -> bytes on disk
+        self.counter = 0
+        self.lock = threading.Lock()  # guards counter and files; worker threads write here too
+
+    # ----------------- FILES -----------------
+
+    def new_path(self, prefix: str, suffix: str = "") -> str:
+        with self.lock:
+            self.counter += 1
+            return os.path.join(self.path, f"{prefix}_{self.counter}{suffix}")
+
+    def register(self, path: str):
+        """Account for a file written into the workspace."""
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            size = None
+        with self.lock:
+            if size is None:
+                self.files.pop(path, None)
+            else:
+                self.files[path] = size
+
+    def release(self, path: str) -> bool:
+        """Delete a workspace file. Returns False if it is still locked (e.g. by the player)."""
+        try:
+            if os.path.exists(path):
+                os.remove(path)
+        except OSError as e:
+            print(f"Could not remove workspace file: {e}")
+            return False
+        with self.lock:
+            self.files.pop(path, None)
+        return True
+
+    def total_bytes(self) -> int:
+        with self.lock:
+            return sum(self.files.values())
+
+    def has_room(self, nbytes: int) -> bool:
+        """
+        Whether `nbytes` more fit in the session budget and on the disk
+        (keeping a small safety margin free).
+        """
+        if self.total_bytes() + nbytes > self.max_bytes:
+            return False
+        try:
+            free = shutil.disk_usage(self.path).free
+        except OSError:
+            return True
+        return nbytes < free - 256 * 1024 ** 2
+
+    # ----------------- LIFETIME -----------------
+
+    def cleanup(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+        with self.lock:
+            self.files.clear()
+
+    @staticmethod
+    def recover_stale(root: str | None = None) -> int:
+        """
+        Remove session folders whose owning process is gone (crashes, kills).
+        Returns the number of bytes reclaimed.
+        """
+        root = root or user_cache_dir("sessions")
+        host = socket.gethostname()
+        reclaimed = 0
+        for name in os.listdir(root):
+            folder = os.path.join(root, name)
+            if not os.path.isdir(folder):
+                continue
+            try:
+                with open(os.path.join(folder, LOCK_NAME)) as f:
+                    lines = f.read().split()
+                pid = int(lines[0])
+                lock_host = lines[1] if len(lines) > 1 else host
+            except (OSError, ValueError, IndexError):
+                # No readable lock (yet): fall back to the pid in the folder name
+                parts = name.split("-")
+                pid = int(parts[1]) if len(parts) > 2 and parts[1].isdigit() else 0
+                lock_host = host
+            # Other machines' sessions (shared home folders) are left alone
+            if lock_host != host or pid == os.getpid() or pid_alive(pid):
+                continue
+            for dirpath, _, filenames in os.walk(folder):
+                for filename in filenames:
+                    try:
+                        reclaimed += os.path.getsize(os.path.join(dirpath, filename))
+                    except OSError:
+                        pass
+            shutil.rmtree(folder, ignore_errors=True)
+        if reclaimed:
+            print(f"Recovered {reclaimed / 1e6:.1f} MB from stale Capo sessions")
+        return reclaimed
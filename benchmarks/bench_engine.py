@@ -0,0 +1,264 @@
+# benchmarks/bench_engine.py
+#
+# Engine micro-benchmarks. Run from the repo root:
+#   python -m benchmarks.bench_engine song.mp3 other.flac ...
+
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+import librosa
+import numpy as np
+import soundfile as sf
+
+from CAPO_app import cqt
+from CAPO_app.audio_engine import (
+    DECODERS, RECOGNIZERS, AudioEngine, HOP_LENGTH, chroma_chunked, decode_audio,
+)
+from CAPO_app.chord_chart import ChordChart
+from CAPO_app.export import export_batch, export_practice
+
+
+def best_of(func, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+# ----------------- DECODE -----------------
+
+def bench_decode(paths, repeat):
+    print("== Decode throughput ==")
+    for path in paths:
+        size_mb = os.path.getsize(path) / 1e6
+        print(f"{os.path.basename(path)} ({size_mb:.1f} MB)")
+        for decoder in DECODERS:
+            if not decoder.can_decode(path):
+                print(f"  {decoder.name:<10} unsupported")
+                continue
+            try:
+                seconds, (y, sr) = best_of(lambda: decoder.decode(path), repeat)
+            except Exception as e:
+                print(f"  {decoder.name:<10} failed: {e}")
+                continue
+            duration = y.shape[-1] / sr
+            print(f"  {decoder.name:<10} {seconds * 1000:8.1f} ms  "
+                  f"{duration / seconds:7.1f}x realtime  {size_mb / seconds:7.1f} MB/s")
+
+
+# ----------------- HPSS -----------------
+
+def label_grid(segments, duration, step=0.01):
+    """Chord name at every `step` seconds (None outside all segments)."""
+    grid = [None] * int(duration / step)
+    for start, end, name in segments:
+        for i in range(int(start / step), min(len(grid), int(end / step))):
+            grid[i] = name
+    return grid
+
+
+def overlap(segments, reference, duration):
+    """Fraction of time where both label the same chord."""
+    a, b = label_grid(segments, duration), label_grid(reference, duration)
+    scored = [x == y for x, y in zip(a, b) if y is not None]
+    return sum(scored) / max(1, len(scored))
+
+
+def analyze(path, hpss):
+    engine = AudioEngine()
+    engine.set_analysis_params(hpss=hpss)
+    engine.load_track(path)
+    t0 = time.perf_counter()
+    bpm = engine.get_tempo()
+    segments = engine.get_chords()
+    elapsed = time.perf_counter() - t0
+    return engine, bpm, segments, elapsed
+
+
+def bench_hpss(paths):
+    """
+    Chord analysis with and without HPSS. Accuracy is measured against
+    `<audio>.lab` when it exists, otherwise the two runs are compared.
+    """
+    print("== HPSS preprocessing ==")
+    analyze(paths[0], False)  # warm-up: numba JIT and filter caches
+    for path in paths:
+        print(os.path.basename(path))
+        lab = os.path.splitext(path)[0] + ".lab"
+        reference = None
+        if os.path.exists(lab):
+            with open(lab, encoding="utf-8") as f:
+                reference = ChordChart.from_lab(f.read()).segments
+
+        runs = {}
+        for hpss in (False, True):
+            engine, bpm, segments, elapsed = analyze(path, hpss)
+            runs[hpss] = segments
+            stages = ", ".join(f"{name} {engine.pipeline.timings[name] * 1000:.0f} ms"
+                               for name in ("hpss", "chroma_setup", "chroma", "onset")
+                               if name in engine.pipeline.timings)
+            line = f"  hpss={'on ' if hpss else 'off'} {elapsed * 1000:8.1f} ms  {bpm:6.1f} BPM  ({stages})"
+            if reference is not None:
+                line += f"  accuracy {overlap(segments, reference, engine.duration) * 100:5.1f}%"
+            print(line)
+        if reference is None:
+            duration = max(runs[False][-1][1] if runs[False] else 0.0, 0.01)
+            print(f"  agreement between runs: {overlap(runs[True], runs[False], duration) * 100:.1f}%"
+                  f" (add {os.path.basename(lab)} for accuracy)")
+
+
+# ----------------- CQT KERNELS -----------------
+
+def bench_cqt(paths, repeat):
+    """
+    Per-file CQT setup and transform: librosa (filters rebuilt every call)
+    vs. cached kernels, cold (built) and warm (in memory).
+    """
+    print("== CQT kernel cache ==")
+    for path in paths:
+        y, sr, _ = decode_audio(path)
+        y = librosa.to_mono(y) if y.ndim > 1 else y
+        print(f"{os.path.basename(path)} ({sr} Hz, {len(y) / sr:.0f} s)")
+
+        seconds, _ = best_of(lambda: librosa.feature.chroma_cqt(y=y, sr=sr, hop_length=HOP_LENGTH), repeat)
+        print(f"  librosa   total {seconds * 1000:8.1f} ms")
+
+        tuning_sec, tuning = best_of(lambda: cqt.estimate_tuning(y, sr), repeat)
+        print(f"  setup     tuning {tuning_sec * 1000:7.1f} ms")
+        cache = cqt.KernelCache()  # memory only, so the first lookup builds
+        build_sec, kernels = best_of(lambda: cqt.CQTKernels(sr, HOP_LENGTH, tuning=cache.quantize_tuning(tuning)), 1)
+        print(f"  setup     build  {build_sec * 1000:7.1f} ms  (first track at this rate/hop)")
+        cache.get(sr, HOP_LENGTH, tuning=tuning)
+        cache.get(sr, HOP_LENGTH, tuning=tuning)
+        print(f"  setup     lookup {cache.last_setup * 1000:7.3f} ms  (every later track)")
+        seconds, _ = best_of(lambda: kernels.chroma(y), repeat)
+        print(f"  transform        {seconds * 1000:7.1f} ms")
+
+
+# ----------------- CHROMA -----------------
+
+def bench_chroma(paths, repeat, workers=None):
+    """
+    Single-shot chroma_cqt vs. chunks across the process pool. The pool is
+    warmed up first: worker start-up is paid once per session, not per file.
+    """
+    workers = workers or os.cpu_count() or 1
+    print(f"== Chunked chroma ({workers} workers) ==")
+    y, sr, _ = decode_audio(paths[0])
+    chroma_chunked(librosa.to_mono(y)[:sr * 60], sr, workers=workers, min_chunk_sec=1.0)
+    for path in paths:
+        y, sr, _ = decode_audio(path)
+        y = librosa.to_mono(y) if y.ndim > 1 else y
+        tuning = cqt.estimate_tuning(y, sr)
+        single, reference = best_of(lambda: cqt.chroma_cqt(y, sr, HOP_LENGTH, tuning=tuning), repeat)
+        chunked, result = best_of(lambda: chroma_chunked(y, sr, HOP_LENGTH, workers=workers, tuning=tuning), repeat)
+        print(f"{os.path.basename(path)} ({len(y) / sr:.0f} s)")
+        print(f"  single   {single * 1000:8.1f} ms")
+        print(f"  chunked  {chunked * 1000:8.1f} ms  {single / chunked:5.2f}x  "
+              f"max |diff| {np.abs(result - reference).max():.4f}")
+
+
+# ----------------- RECOGNIZERS -----------------
+
+def bench_recognizers(paths, repeat):
+    """
+    Chord recognizers on the same chroma and beat grid: time of the scoring
+    stage alone, and accuracy against `<audio>.lab` when it exists.
+    """
+    print("== Chord recognizers ==")
+    names = [name for name, r in RECOGNIZERS.items() if r.available()]
+    for path in paths:
+        engine = AudioEngine(chroma_workers=1)
+        engine.load_track(path)
+        engine.get_tempo()
+        engine.get_chords()  # chroma and beat grid, shared by every run below
+        lab = os.path.splitext(path)[0] + ".lab"
+        reference = None
+        if os.path.exists(lab):
+            with open(lab, encoding="utf-8") as f:
+                reference = ChordChart.from_lab(f.read()).segments
+        print(f"{os.path.basename(path)} ({engine.duration:.0f} s)")
+        for vocabulary in ("beginner", "advanced"):
+            for name in names:
+                engine.set_analysis_params(recognizer=name, vocabulary=vocabulary)
+                best = float("inf")
+                for _ in range(repeat):
+                    engine.pipeline.invalidate("chord_scores")
+                    engine.pipeline.get("chord_scores")
+                    best = min(best, engine.pipeline.timings["chord_scores"])
+                segments = engine.get_chords()
+                line = (f"  {vocabulary:<9} {name:<10} {best * 1000:8.1f} ms  "
+                        f"{engine.duration / best:8.0f}x realtime")
+                if reference is not None:
+                    line += f"  accuracy {overlap(segments, reference, engine.duration) * 100:5.1f}%"
+                print(line)
+
+
+# ----------------- EXPORT -----------------
+
+def bench_export(paths, workers=None):
+    """
+    Streaming practice export (+2 semitones at 80 % tempo): speed and peak
+    Python heap per file, then every file at once through the batch queue.
+    """
+    print("== Practice export ==")
+    with tempfile.TemporaryDirectory() as tmp:
+        tasks = []
+        for i, path in enumerate(paths):
+            y, sr, backend = decode_audio(path)
+            sf_path = path
+            if backend != "soundfile":
+                sf_path = os.path.join(tmp, f"source{i}.wav")  # PCM copy, as the player uses
+                sf.write(sf_path, y.T if y.ndim > 1 else y, sr)
+            duration = y.shape[-1] / sr
+            out = os.path.join(tmp, f"export{i}.wav")
+            t0 = time.perf_counter()
+            export_practice(sf_path, out, semitones=2, rate=0.8)
+            seconds = time.perf_counter() - t0
+            tracemalloc.start()  # second, traced run (tracing slows it down)
+            export_practice(sf_path, out, semitones=2, rate=0.8)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"{os.path.basename(path)} ({duration:.0f} s, {y.nbytes / 1e6:.0f} MB decoded)")
+            print(f"  export   {seconds * 1000:8.1f} ms  {duration / seconds:6.1f}x realtime  "
+                  f"peak heap {peak / 1e6:5.1f} MB")
+            tasks.append(dict(source_path=sf_path, out_path=out, semitones=2, rate=0.8))
+
+        for n in sorted({1, workers or os.cpu_count() or 1}):
+            t0 = time.perf_counter()
+            results = export_batch(tasks, workers=n)
+            seconds = time.perf_counter() - t0
+            ok = sum(1 for _, success, _ in results if success)
+            print(f"  batch of {len(tasks)} with {n} worker(s): {seconds:6.2f} s ({ok} ok)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Capo engine benchmarks")
+    parser.add_argument("files", nargs="+", help="audio files to benchmark")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement (best is kept)")
+    parser.add_argument("--only", choices=("decode", "hpss", "cqt", "chroma", "recognizers", "export"), help="run a single benchmark")
+    parser.add_argument("--workers", type=int, help="chroma / export worker processes (default: all cores)")
+    args = parser.parse_args()
+
+    if args.only in (None, "decode"):
+        bench_decode(args.files, args.repeat)
+    if args.only in (None, "hpss"):
+        bench_hpss(args.files)
+    if args.only in (None, "cqt"):
+        bench_cqt(args.files, args.repeat)
+    if args.only in (None, "chroma"):
+        bench_chroma(args.files, args.repeat, args.workers)
+    if args.only in (None, "recognizers"):
+        bench_recognizers(args.files, args.repeat)
+    if args.only in (None, "export"):
+        bench_export(args.files, args.workers)
+
+
+if __name__ == "__main__":
+    main()
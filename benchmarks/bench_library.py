@@ -0,0 +1,83 @@
+# benchmarks/bench_library.py
+#
+# Library index benchmark on synthetic songs. Run from the repo root:
+#   python -m benchmarks.bench_library --tracks 20000
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from CAPO_app.chord_chart import ChordChart
+from CAPO_app.library import Library
+from CAPO_app.audio_engine import PITCHES
+
+# Common diatonic loops, as (semitones above tonic, quality suffix)
+LOOPS = [
+    [(0, ""), (7, ""), (9, "m"), (5, "")],     # I V vi IV
+    [(0, ""), (5, ""), (7, "")],               # I IV V
+    [(2, "m"), (7, ""), (0, "")],              # ii V I
+    [(9, "m"), (5, ""), (0, ""), (7, "")],     # vi IV I V
+    [(0, ""), (9, "m"), (5, ""), (7, "")],     # I vi IV V
+    [(0, ""), (10, ""), (5, ""), (0, "")],     # I bVII IV I
+]
+QUERIES = [
+    ("I V vi IV", None, None),
+    ("I V vi IV", "G", 100.0),
+    ("ii V I", None, 120.0),
+    ("I bVII IV", None, None),
+    ("I V vi IV I IV V", None, None),
+    ("G D Em C", "G", None),
+]
+
+
+def synthetic_chart(i, rng):
+    tonic = rng.randrange(12)
+    bpm = rng.uniform(70, 160)
+    bar = 240.0 / bpm
+    segments, t = [], 0.0
+    while t < 180.0:
+        for step, suffix in rng.choice(LOOPS):
+            segments.append((t, t + bar, PITCHES[(tonic + step) % 12] + suffix))
+            t += bar
+    return ChordChart(segments, bpm=bpm, title=f"Song {i}", fingerprint=f"{i:040x}", key=PITCHES[tonic])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Capo library index benchmark")
+    parser.add_argument("--tracks", type=int, default=20000, help="synthetic songs to index")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per query (best is kept)")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    charts = [synthetic_chart(i, rng) for i in range(args.tracks)]
+    with tempfile.TemporaryDirectory() as tmp:
+        library = Library(os.path.join(tmp, "library.sqlite"))
+
+        t0 = time.perf_counter()
+        for chart in charts:
+            library.upsert(chart, f"/music/song{chart.title}.mp3")
+        elapsed = time.perf_counter() - t0
+        size_mb = os.path.getsize(library.db_path) / 1e6
+        print(f"Indexed {len(library)} tracks in {elapsed:.1f} s "
+              f"({elapsed / len(charts) * 1000:.2f} ms/track, {size_mb:.1f} MB)")
+
+        t0 = time.perf_counter()
+        for chart in charts[:1000]:
+            library.upsert(chart)
+        print(f"Unchanged re-upsert: {(time.perf_counter() - t0) / 1000 * 1000:.3f} ms/track")
+
+        for progression, key, bpm in QUERIES:
+            best = float("inf")
+            for _ in range(args.repeat):
+                t0 = time.perf_counter()
+                results = library.search(progression, key=key, bpm=bpm)
+                best = min(best, time.perf_counter() - t0)
+            print(f"  {progression!r:<22} key={key or '-':<3} bpm={bpm or '-':<6} "
+                  f"{best * 1000:7.2f} ms  {len(results)} results")
+        library.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+# benchmarks/bench_ui.py
+#
+# Resize / repaint cost of the textured window chrome, two ways:
+#   stylesheet  the previous background-image rules (Qt ignores
+#               background-size, so the images were drawn unscaled)
+#   textures    TextureManager / TexturedFrame, same look (after)
+# Run from the repo root (QT_QPA_PLATFORM=offscreen works headless):
+#   python -m benchmarks.bench_ui
+#
+# The layout mirrors RiffStationWindow (shell, wood, three panels, bridge)
+# without QtMultimedia. Textures come from CAPO_app/assets; missing ones are
+# replaced by synthetic wood of a typical size.
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+from PyQt6.QtWidgets import QApplication, QMainWindow, QWidget, QFrame, QVBoxLayout, QHBoxLayout, QLabel
+from PyQt6.QtGui import QImage, QPainter
+
+from CAPO_app.chord_diagram import ChordDiagramWidget
+from CAPO_app.chord_timeline import ChordTimelineView
+from CAPO_app.textures import TextureManager, TexturedFrame
+
+TEXTURES = {
+    "border_shell.png": (2000, 1400),
+    "bg_main_wood.jpg": (1920, 1280),
+    "panel_wood.png": (1200, 900),
+    "chord_chip.png": (256, 96),
+    "transport_bar.png": (1600, 160),
+}
+# A resize drag from the minimum size to full HD, then toggling normal / maximized
+DRAG = [(1000 + 920 * i // 29, 720 + 360 * i // 29) for i in range(30)]
+NORMAL, MAXIMIZED = (1333, 937), (1920, 1080)
+CHORDS = ["C", "G", "Am", "F", "Dm", "E", "Em", "D"]
+
+STYLESHEET = """
+    QMainWindow {{
+        background-color: #0c0704;
+        background-image: url({a}/border_shell.png);
+        background-position: center;
+        background-repeat: no-repeat;
+        background-size: cover;
+    }}
+    QWidget#CentralWidget {{
+        background-color: #b86e28;
+        background-image: url({a}/bg_main_wood.jpg);
+        background-position: center;
+        background-repeat: no-repeat;
+        background-size: 100% 100%;
+        border: 5px solid #d9b15c;
+        border-radius: 30px;
+    }}
+    QFrame[class="panel"] {{
+        background-image: url({a}/panel_wood.png);
+        background-position: center;
+        background-repeat: no-repeat;
+        background-size: 100% 100%;
+        border: 3px solid #d2ad61;
+        border-radius: 15px;
+        padding: 4px;
+    }}
+    QFrame#BridgeFrame {{
+        background-image: url({a}/transport_bar.png);
+        background-position: center;
+        background-size: 100% 100%;
+        background-repeat: no-repeat;
+        border: none;
+    }}
+"""
+
+
+def synthetic_wood(path, width, height, seed):
+    rng = np.random.default_rng(seed)
+    y = np.arange(height)[:, None]
+    x = np.arange(width)[None, :]
+    grain = np.sin(y / 7.0 + 3 * np.sin(x / 90.0) + rng.random() * 6) * 0.5 + 0.5
+    noise = rng.random((height, width)) * 0.15
+    shade = (0.55 + 0.35 * grain + noise).clip(0, 1)
+    rgb = np.stack([shade * 184, shade * 110, shade * 40, np.full_like(shade, 255)], axis=-1)
+    bgra = np.ascontiguousarray(rgb[..., [2, 1, 0, 3]].astype(np.uint8))
+    img = QImage(bgra.data, width, height, width * 4, QImage.Format.Format_ARGB32)
+    img.save(path)
+
+
+def texture_dir(assets_path, tmp):
+    """assets_path if it has every texture, else a temp copy with synthetic stand-ins."""
+    if all(os.path.exists(os.path.join(assets_path, name)) for name in TEXTURES):
+        return assets_path, False
+    for i, (name, (w, h)) in enumerate(TEXTURES.items()):
+        src = os.path.join(assets_path, name)
+        dst = os.path.join(tmp, name)
+        if os.path.exists(src):
+            QImage(src).save(dst)
+        else:
+            synthetic_wood(dst, w, h, i)
+    return tmp, True
+
+
+class ShellWindow(QMainWindow):
+    def __init__(self, textures=None):
+        super().__init__()
+        self.textures = textures
+        if textures is not None:
+            textures.settled.connect(self.update)
+
+    def resizeEvent(self, event):
+        if self.textures is not None and self.isVisible():
+            self.textures.note_resize()
+        super().resizeEvent(event)
+
+    def paintEvent(self, event):
+        if self.textures is None:
+            return super().paintEvent(event)
+        p = QPainter(self)
+        self.textures.paint(p, "border_shell.png", self.size(), self.devicePixelRatioF())
+        p.end()
+
+
+def build_window(assets, style: str):
+    textured = style == "textures"
+    textures = TextureManager(assets) if textured else None
+    window = ShellWindow(textures)
+
+    def frame(texture, **kwargs):
+        if textured:
+            return TexturedFrame(textures, texture, **kwargs)
+        return QFrame()
+
+    if textured:
+        central = frame("bg_main_wood.jpg", radius=30, border=5, border_color="#d9b15c", background="#b86e28")
+        central.setContentsMargins(0, 0, 0, 0)
+    else:
+        central = QWidget()
+        window.setStyleSheet(STYLESHEET.format(a=assets))
+    central.setObjectName("CentralWidget")
+    window.setCentralWidget(central)
+    main = QVBoxLayout(central)
+    main.setContentsMargins(20, 15, 20, 15)
+    main.addWidget(QLabel("Capo"))
+
+    top = QFrame()
+    top.setFixedHeight(170)
+    main.addWidget(top)
+
+    middle = QHBoxLayout()
+    panels = []
+    for stretch in (4, 3, 5):
+        panel = frame("panel_wood.png", radius=15, border=3, border_color="#d2ad61", padding=4)
+        panel.setProperty("class", "panel")
+        panels.append(panel)
+        middle.addWidget(panel, stretch=stretch)
+    main.addLayout(middle, stretch=1)
+
+    diagram = ChordDiagramWidget()
+    QVBoxLayout(panels[0]).addWidget(diagram)
+    timeline = ChordTimelineView(textures)
+    timeline.set_chords([(i * 2.0, i * 2.0 + 2.0, CHORDS[i % len(CHORDS)]) for i in range(120)])
+    QVBoxLayout(panels[1]).addWidget(timeline)
+
+    bridge = frame("transport_bar.png")
+    bridge.setObjectName("BridgeFrame")
+    bridge.setFixedHeight(80)
+    main.addWidget(bridge)
+    return window, diagram, timeline, textures
+
+
+def timed(fn, n):
+    t0 = time.perf_counter()
+    for i in range(n):
+        fn(i)
+    return (time.perf_counter() - t0) / n * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Capo textured UI resize / repaint benchmark")
+    parser.add_argument("--assets", default="CAPO_app/assets", help="texture folder")
+    parser.add_argument("--repeat", type=int, default=100, help="repaints per measurement")
+    args = parser.parse_args()
+
+    app = QApplication([])
+    with tempfile.TemporaryDirectory() as tmp:
+        assets, synthetic = texture_dir(os.path.abspath(args.assets), tmp)
+        if synthetic:
+            print("Using synthetic textures for the missing assets")
+
+        for label in ("stylesheet", "textures"):
+            window, diagram, timeline, textures = build_window(assets, label)
+            window.resize(*NORMAL)
+            window.show()
+            app.processEvents()
+
+            def resize(size):
+                window.resize(*size)
+                app.processEvents()
+                window.repaint()
+
+            def settle():
+                if textures is not None:
+                    textures.settle()
+                app.processEvents()
+                window.repaint()
+
+            drag = timed(lambda i: resize(DRAG[i]), len(DRAG))
+            # Settle after a few short drags, back down to the start size
+            settles = []
+            for size in DRAG[-2::-3]:
+                resize(size)
+                settles.append(timed(lambda i: settle(), 1))
+            settled = sorted(settles)[len(settles) // 2]
+            # Settle both sizes once, then toggle between them
+            for size in (NORMAL, MAXIMIZED):
+                resize(size)
+                settle()
+            toggle = timed(lambda i: resize((NORMAL, MAXIMIZED)[i % 2]), 20)
+            resize(NORMAL)
+            settle()
+            full = timed(lambda i: window.repaint(), args.repeat)
+
+            def diagram_repaint(i):
+                diagram.set_chord(CHORDS[i % len(CHORDS)])
+                diagram.repaint()
+
+            dia = timed(diagram_repaint, args.repeat)
+            tl = timed(lambda i: timeline.set_position(i * 2.0 + 0.5) or timeline.viewport().repaint(),
+                       args.repeat)
+            print(f"{label:<11} drag step {drag:6.2f} ms  settle {settled:6.2f} ms  "
+                  f"maximize toggle {toggle:6.2f} ms  full repaint {full:6.2f} ms  "
+                  f"diagram {dia:5.2f} ms  timeline {tl:5.2f} ms")
+            if textures is not None:
+                print(f"{'':<11} texture cache: {len(textures.cache)} pixmaps, "
+                      f"{textures.bytes / 1e6:.1f} MB, {textures.hits} hits / {textures.misses} misses")
+            window.close()
+            app.processEvents()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,8 @@
 # CAPO/main.py
+import multiprocessing
+
 from CAPO_app.main_window import run_app
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # analysis worker processes in frozen builds
     run_app()